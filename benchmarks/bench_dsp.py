@@ -0,0 +1,204 @@
+"""
+Micro-benchmarks of the audio DSP engines.
+
+Times SweepGenerator, MarkerGenerator, ProtectionFilter (MIN and LIN), AlignmentEngine.sync_and_average
+(both alignment modes), DeconvolutionEngine.process_ir and DSPUtils.rfft_xcorr over a grid of sample
+rates, sweep durations and sweep counts, and records the best time and the peak memory per case.
+
+    python benchmarks/bench_dsp.py --out bench.json
+    python benchmarks/bench_dsp.py --quick --baseline bench.json --threshold 0.25
+
+With --baseline the run is compared case by case; the exit code is 1 when a case got slower (or
+used more memory) than the threshold allows.
+"""
+import argparse
+import gc
+import json
+import platform
+import sys
+import time
+import tracemalloc
+from pathlib import Path
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+import numpy as np
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[1] / "src"))
+
+from loguru import logger  # noqa: E402
+
+from nfs.audio import (AlignmentEngine, DeconvolutionEngine, MarkerGenerator, ProtectionFilter,  # noqa: E402
+                       SweepGenerator)
+from nfs.utils.dsp import DSPUtils  # noqa: E402
+
+SAMPLE_RATES = [44100, 48000, 96000, 192000]
+DURATIONS_S = [0.5, 2.0, 5.0, 10.0, 20.0]
+SWEEP_COUNTS = [1, 4, 8]
+
+QUICK_SAMPLE_RATES = [48000, 192000]
+QUICK_DURATIONS_S = [0.5, 5.0]
+QUICK_SWEEP_COUNTS = [1, 4]
+
+MARKER_MS = 100.0
+PRE_MS = 100.0
+POST_MS = 100.0
+TAIL_MS = 10.0
+
+
+def measure(fn: Callable[[], Any], repeats: int) -> Dict[str, float]:
+    """Best and median wall time over the repeats, and the peak traced memory of one extra call."""
+    fn()  # warm-up: caches, plans and scratch buffers as in a running scan
+    times = []
+    for _ in range(repeats):
+        gc.collect()
+        t0 = time.perf_counter()
+        fn()
+        times.append(time.perf_counter() - t0)
+
+    gc.collect()
+    tracemalloc.start()
+    fn()
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return {'time_s': min(times), 'median_s': float(np.median(times)), 'peak_mb': peak / 1e6}
+
+
+def sweep_timeline(fs: int, duration_s: float, num_sweeps: int) -> Tuple[np.ndarray, np.ndarray, np.ndarray,
+                                                                          np.ndarray, int, int, int]:
+    """A recording as the stream would deliver it: marker + sweep per slot on the loopback, a delayed sweep on the mic."""
+    sweep, _, inv = SweepGenerator(fs, duration_s, 20.0, -10.0).generate()
+    marker = MarkerGenerator(fs, MARKER_MS, (500.0, 5000.0), -10.0).generate()
+    pre = int(PRE_MS / 1000 * fs)
+    marker_len = len(marker)
+    slot_len = marker_len + len(sweep) + int(POST_MS / 1000 * fs)
+    total = pre + num_sweeps * slot_len
+
+    rng = np.random.default_rng(0)
+    rec_loop = (rng.standard_normal(total) * 1e-5).astype(np.float32)
+    rec_mic = (rng.standard_normal(total) * 1e-5).astype(np.float32)
+    for i in range(num_sweeps):
+        start = pre + i * slot_len
+        rec_loop[start:start + marker_len] += marker
+        rec_mic[start + marker_len + 50:start + marker_len + 50 + len(sweep)] += 0.3 * sweep
+    return rec_mic, rec_loop, marker, inv, pre, slot_len, len(sweep) + marker_len
+
+
+def build_cases(sample_rates: List[int], durations: List[float], counts: List[int]
+                ) -> List[Tuple[str, Dict[str, Any], Callable[[], Callable[[], Any]]]]:
+    """(name, parameters, setup) per case; setup builds the inputs and returns the call to time."""
+    cases = []
+    for fs in sample_rates:
+        cases.append(('MarkerGenerator.generate', {'fs': fs},
+                      lambda fs=fs: MarkerGenerator(fs, MARKER_MS, (500.0, 5000.0), -10.0).generate))
+        for dur in durations:
+            params = {'fs': fs, 'duration_s': dur}
+            cases.append(('SweepGenerator.generate', params,
+                          lambda fs=fs, dur=dur: SweepGenerator(fs, dur, 20.0, -10.0).generate))
+
+            for mode in ('MIN', 'LIN'):
+                def setup_filter(fs=fs, dur=dur, mode=mode):
+                    sweep = SweepGenerator(fs, dur, 20.0, -10.0).generate()[0].astype(np.float32)
+                    filt = ProtectionFilter(fs, 40.0, 4, mode)
+                    return lambda: filt.apply(sweep)
+                cases.append((f'ProtectionFilter.apply[{mode}]', params, setup_filter))
+
+            def setup_xcorr(fs=fs, dur=dur):
+                _, rec_loop, marker, *_ = sweep_timeline(fs, dur, 1)
+                return lambda: DSPUtils.rfft_xcorr(rec_loop, marker)
+            cases.append(('DSPUtils.rfft_xcorr', params, setup_xcorr))
+
+            def setup_deconv(fs=fs, dur=dur):
+                rec_mic, _, _, inv, pre, _, _ = sweep_timeline(fs, dur, 1)
+                engine = DeconvolutionEngine(fs)
+                capture = rec_mic[pre:pre + len(inv) + int(TAIL_MS / 1000 * fs)]
+                return lambda: engine.process_ir(capture, inv)
+            cases.append(('DeconvolutionEngine.process_ir', params, setup_deconv))
+
+            for n in counts:
+                for first_marker in (True, False):
+                    def setup_align(fs=fs, dur=dur, n=n, first_marker=first_marker):
+                        rec_mic, rec_loop, marker, _, pre, slot_len, sweep_len = sweep_timeline(fs, dur, n)
+                        engine = AlignmentEngine(fs, n, first_marker, TAIL_MS, MARKER_MS)
+                        return lambda: engine.sync_and_average(rec_mic, rec_loop, marker, pre, slot_len, sweep_len,
+                                                               keep_slices=False)
+                    mode = 'first_marker' if first_marker else 'per_sweep'
+                    cases.append((f'AlignmentEngine.sync_and_average[{mode}]', {**params, 'num_sweeps': n},
+                                  setup_align))
+    return cases
+
+
+def case_key(name: str, params: Dict[str, Any]) -> str:
+    return name + '|' + ','.join(f'{k}={v}' for k, v in sorted(params.items()))
+
+
+def run(cases, repeats: int, only: Optional[str] = None) -> Dict[str, Dict[str, Any]]:
+    results = {}
+    for name, params, setup in cases:
+        if only and only not in name:
+            continue
+        key = case_key(name, params)
+        fn = setup()
+        result = measure(fn, repeats)
+        results[key] = {'name': name, 'params': params, **result}
+        print(f"{key:<90} {result['time_s'] * 1e3:10.2f} ms {result['peak_mb']:10.1f} MB", flush=True)
+        del fn
+    return results
+
+
+def compare(results: Dict[str, Dict[str, Any]], baseline: Dict[str, Dict[str, Any]], threshold: float,
+            min_time_s: float = 1e-3) -> List[str]:
+    """
+    Cases that got slower or use more memory than (1 + threshold) times the baseline.
+    Cases faster than min_time_s in both runs are too noisy to judge on time.
+    """
+    regressions = []
+    for key, result in results.items():
+        base = baseline.get(key)
+        if base is None:
+            continue
+        if max(result['time_s'], base['time_s']) >= min_time_s and result['time_s'] > base['time_s'] * (1 + threshold):
+            regressions.append(f"{key}: time {base['time_s'] * 1e3:.2f} -> {result['time_s'] * 1e3:.2f} ms")
+        if result['peak_mb'] > base['peak_mb'] * (1 + threshold) + 0.1:
+            regressions.append(f"{key}: peak memory {base['peak_mb']:.1f} -> {result['peak_mb']:.1f} MB")
+    return regressions
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--out', type=Path, default=Path('bench_dsp.json'), help='JSON file for the results')
+    parser.add_argument('--baseline', type=Path, help='results of an earlier run to compare against')
+    parser.add_argument('--threshold', type=float, default=0.25,
+                        help='allowed relative slowdown / memory growth before a case fails (default 0.25)')
+    parser.add_argument('--repeats', type=int, default=5, help='timed calls per case (best is kept)')
+    parser.add_argument('--quick', action='store_true', help='reduced grid for CI')
+    parser.add_argument('--only', help='only run cases whose name contains this text')
+    args = parser.parse_args(argv)
+
+    logger.remove()  # the engines log per call
+    if args.quick:
+        cases = build_cases(QUICK_SAMPLE_RATES, QUICK_DURATIONS_S, QUICK_SWEEP_COUNTS)
+    else:
+        cases = build_cases(SAMPLE_RATES, DURATIONS_S, SWEEP_COUNTS)
+
+    results = run(cases, args.repeats, args.only)
+    report = {
+        'meta': {'python': platform.python_version(), 'numpy': np.__version__, 'machine': platform.machine(),
+                 'processor': platform.processor(), 'timestamp': time.strftime('%Y-%m-%dT%H:%M:%S')},
+        'results': results,
+    }
+    args.out.write_text(json.dumps(report, indent=2))
+    print(f'Wrote {len(results)} results to {args.out}')
+
+    if args.baseline is not None:
+        baseline = json.loads(args.baseline.read_text())['results']
+        regressions = compare(results, baseline, args.threshold)
+        for line in regressions:
+            print(f'REGRESSION {line}')
+        if regressions:
+            return 1
+        print(f'No regressions beyond {args.threshold:.0%} against {args.baseline}')
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
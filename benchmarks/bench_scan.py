@@ -0,0 +1,308 @@
+"""
+End-to-end scan throughput on a simulated rig.
+
+Runs complete scans through ScannerFactory and NearFieldScannerFactory against a simulated GRBL
+controller (type Simulated: every move takes as long as the trapezoidal velocity profile of the
+configured axis rates and accelerations) and MockInterfaceAudio in real-time mode (a capture takes
+as long as its timeline). Every measurement points plugin is scanned with the motion managers it
+supports. Per case the benchmark reports points per hour, the share of the scan spent moving,
+capturing, processing and writing, and the latency per point (median, p95 and max time from the
+start of one point to the next). The stage times come from the scanner's per-point stage timings
+(nfs.instrumentation). The scan time predicted before the scan (nfs.estimator) is reported next to
+the measured one.
+
+    python benchmarks/bench_scan.py --out bench_scan.json
+    python benchmarks/bench_scan.py --quick --axis x 11160 100 --axis z 700 10
+
+The axes default to the [grbl_*_axis] sections of --config (config.ini of the rig) when given, and
+to 5000 units/min and 600 units/s^2 otherwise. Processing and writing run on the measurement
+thread unless pipeline workers or writer threads are enabled; background work overlaps the
+other stages, so its shares can add up to more than 100 %.
+"""
+import argparse
+import configparser
+import json
+import os
+import platform
+import sys
+import tempfile
+import time
+from pathlib import Path
+from typing import Any, Dict, List, Optional, Tuple
+
+import numpy as np
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[1] / "src"))
+
+from nfs.nfs import NearFieldScannerFactory  # noqa: E402
+from nfs.scanner import ScannerFactory  # noqa: E402
+
+TEMPLATE = """
+[logging]
+level = WARNING
+file =
+
+[nfs]
+audio = audio
+plugins = plugins
+motion_manager = motion_manager
+pipeline_workers = 0
+estimate_duration = True
+
+[scanner]
+controller = grbl_simulated
+feed_rate = 35000
+
+[plugins]
+plugin_1 = nfs.plugins.cylindrical_measurement_points
+plugin_2 = nfs.plugins.spherical_measurement_points
+plugin_3 = nfs.plugins.spherical_measurement_points_sorted
+plugin_4 = nfs.plugins.spherical_measurement_points_arcs
+plugin_5 = nfs.plugins.spherical_measurement_points_arcs_random
+plugin_6 = nfs.plugins.file_measurement_points
+
+[grbl_simulated]
+type = Simulated
+realtime = True
+grbl_x_axis_config = grbl_x_axis
+grbl_y_axis_config = grbl_y_axis
+grbl_z_axis_config = grbl_z_axis
+
+[grbl_x_axis]
+steps_per_millimeter = 1
+maximum_rate = 5000
+acceleration = 600
+
+[grbl_y_axis]
+steps_per_millimeter = 1
+maximum_rate = 5000
+acceleration = 600
+
+[grbl_z_axis]
+steps_per_millimeter = 1
+maximum_rate = 5000
+acceleration = 600
+
+[audio]
+mode = mock_interface
+mock_realtime = True
+fs = 48000
+in_dev = 0
+out_dev = 0
+in_ch_mic = 1
+in_ch_loop = 0
+out_ch_spkr = 0
+out_ch_ref = 1
+blocksize = 1024
+wasapi_exclusive = False
+persistent_stream = True
+writer_threads = 0
+output_format = wav
+fft_workers = 1
+
+[sweep]
+sweep_dur_s = 1.0
+sweep_level_dbfs = -10
+num_sweeps = 2
+pre_sil_ms = 50
+post_sil_ms = 50
+mic_tail_taper_ms = 10
+align_to_first_marker = True
+debug_saves = False
+h2_test_db = None
+h3_test_db = None
+protect_hpf_hz = 0
+protect_hpf_order = 4
+protect_hpf_phase = min
+
+[marker]
+marker_dur_ms = 50
+marker_f_lo = 1000
+marker_f_hi = 5000
+marker_level_dbfs = -6
+
+[motion_manager]
+measurement_points = measurement_points
+safe_radius = 250
+"""
+
+CYLINDRICAL = 'CylindricalMeasurementMotionManager'
+SPHERICAL = 'SphericalMeasurementMotionManager'
+
+# (measurement points type, parameters, (quick parameters), motion managers that can drive it)
+CASES: List[Tuple[str, Dict[str, Any], Dict[str, Any], List[str]]] = [
+    ('CylindricalMeasurementPoints',
+     {'nr_of_angular_points': 6, 'nr_of_radial_cap_points': 2, 'nr_of_vertical_points': 2, 'cap_spacing': 40,
+      'wall_spacing': 20, 'radius': 200, 'height': 300},
+     {'nr_of_angular_points': 2, 'nr_of_radial_cap_points': 1, 'nr_of_vertical_points': 1, 'cap_spacing': 40,
+      'wall_spacing': 20, 'radius': 200, 'height': 300},
+     [CYLINDRICAL]),
+    ('SphericalMeasurementPoints', {'nr_of_points': 40, 'wall_spacing': 20, 'radius': 200},
+     {'nr_of_points': 6, 'wall_spacing': 20, 'radius': 200}, [CYLINDRICAL]),
+    ('SphericalMeasurementPointsSorted',
+     {'nr_of_points': 40, 'wall_spacing': 20, 'radius': 250, 'speaker_height': 300, 'speaker_width': 200,
+      'speaker_depth': 250},
+     {'nr_of_points': 6, 'wall_spacing': 20, 'radius': 250, 'speaker_height': 300, 'speaker_width': 200,
+      'speaker_depth': 250},
+     [CYLINDRICAL]),
+    ('SphericalMeasurementPointsArcs', {'nr_of_points': 40, 'wall_spacing': 20, 'radius': 200},
+     {'nr_of_points': 6, 'wall_spacing': 20, 'radius': 200}, [CYLINDRICAL, SPHERICAL]),
+    ('SphericalMeasurementPointsArcsRandom',
+     {'nr_of_points': 40, 'wall_spacing': 20, 'radius': 200, 'homing_gap': 10, 'pole_gap': 10},
+     {'nr_of_points': 6, 'wall_spacing': 20, 'radius': 200, 'homing_gap': 10, 'pole_gap': 10},
+     [CYLINDRICAL, SPHERICAL]),
+    ('FileMeasurementPoints', {'filename': 'scan_path.csv', 'homing_gap': 10, 'pole_gap': 10},
+     {'filename': 'scan_path.csv', 'homing_gap': 10, 'pole_gap': 10}, [CYLINDRICAL]),
+]
+
+# Benchmark stage: the instrumentation stages it is made of
+STAGES = {
+    'moving': ('motion',),
+    'capturing': ('stream_open', 'capture'),
+    'processing': ('sync_and_average', 'process_ir', 'calculate_metrics'),
+    'writing': ('write',),
+}
+
+
+def write_scan_path(path: Path, n_points: int) -> None:
+    """A helix around the speaker for FileMeasurementPoints: angle steps with small height changes."""
+    with open(path, 'w') as f:
+        f.write('r_xy_mm,phi_deg,z_mm\n')
+        for i in range(n_points):
+            f.write(f'{200 + 10 * (i % 3)},{(i * 37.0) % 340 + 15:.1f},{-150 + 300 * i / max(1, n_points - 1):.1f}\n')
+
+
+def stage_busy_s(nfs) -> Dict[str, float]:
+    """
+    Total time per benchmark stage from the scan's per-point stage timings. Moving is taken from
+    the simulated controller instead, which also counts the moves to the start and back home.
+    """
+    totals = {stage: s['total'] for stage, s in nfs.timings.stage_stats().items()}
+    busy_s = {name: sum(totals.get(stage, 0.0) for stage in stages) for name, stages in STAGES.items()}
+    busy_s['moving'] = nfs._scanner._grbl_controller.elapsed_s
+    return busy_s
+
+
+def build_config(directory: Path, points_type: str, params: Dict[str, Any], motion_manager: str,
+                 args: argparse.Namespace) -> Path:
+    config = configparser.ConfigParser()
+    config.read_string(TEMPLATE)
+    if args.config is not None:
+        rig = configparser.ConfigParser(inline_comment_prefixes=('#', ';'))
+        rig.read(args.config)
+        for axis in ('x', 'y', 'z'):
+            section = f'grbl_{axis}_axis'
+            for key in ('maximum_rate', 'acceleration'):
+                if rig.has_option(section, key):
+                    config.set(section, key, rig.get(section, key))
+    for axis, rate, acceleration in args.axis or []:
+        config.set(f'grbl_{axis.lower()}_axis', 'maximum_rate', rate)
+        config.set(f'grbl_{axis.lower()}_axis', 'acceleration', acceleration)
+
+    config.set('nfs', 'pipeline_workers', str(args.pipeline_workers))
+    config.set('audio', 'writer_threads', str(args.writer_threads))
+    config.set('audio', 'output_format', args.output_format)
+    config.set('sweep', 'sweep_dur_s', str(args.sweep_dur))
+    config.set('sweep', 'num_sweeps', str(args.num_sweeps))
+    config.set('motion_manager', 'type', motion_manager)
+    config.add_section('measurement_points')
+    config.set('measurement_points', 'type', points_type)
+    for key, value in params.items():
+        config.set('measurement_points', key, str(value))
+
+    path = directory / 'bench_scan.ini'
+    with open(path, 'w') as f:
+        config.write(f)
+    return path
+
+
+def percentile(values: List[float], q: float) -> float:
+    return float(np.percentile(values, q)) if values else float('nan')
+
+
+def run_case(points_type: str, params: Dict[str, Any], motion_manager: str, args: argparse.Namespace
+             ) -> Dict[str, Any]:
+    """Runs one scan in a scratch directory and returns its throughput figures."""
+    cwd = os.getcwd()
+    with tempfile.TemporaryDirectory(prefix='nfs_bench_scan_') as tmp:
+        directory = Path(tmp)
+        os.chdir(directory)
+        try:
+            if points_type == 'FileMeasurementPoints':
+                write_scan_path(directory / params['filename'], 6 if args.quick else 40)
+            config_file = build_config(directory, points_type, params, motion_manager, args)
+            scanner = ScannerFactory.create(str(config_file))
+            nfs = NearFieldScannerFactory.create(scanner, str(config_file))
+            t0 = time.perf_counter()
+            nfs.take_measurement_set()
+            scan_s = time.perf_counter() - t0
+            nfs.shutdown()
+        finally:
+            os.chdir(cwd)
+
+    points = len(nfs.timings.points)
+    busy_s = stage_busy_s(nfs)
+    # Point latency: from the start of the move to one point to the start of the move to the next
+    latency = list(np.diff([p.started for p in nfs.timings.points]))
+    return {
+        'points_type': points_type,
+        'motion_manager': motion_manager,
+        'points': points,
+        'scan_s': scan_s,
+        'points_per_hour': points / scan_s * 3600 if scan_s > 0 else 0.0,
+        'share': {stage: busy_s[stage] / scan_s for stage in STAGES},
+        'busy_s': busy_s,
+        'latency_s': {'median': percentile(latency, 50), 'p95': percentile(latency, 95),
+                      'max': float(max(latency)) if latency else float('nan')},
+        'predicted_s': nfs.estimate.total_s,
+    }
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--out', type=Path, default=Path('bench_scan.json'), help='JSON file for the results')
+    parser.add_argument('--config', type=Path, help='rig config whose [grbl_*_axis] rates and accelerations to use')
+    parser.add_argument('--axis', nargs=3, action='append', metavar=('AXIS', 'RATE', 'ACCELERATION'),
+                        help='override an axis (x, y or z): rate in units/min, acceleration in units/s^2')
+    parser.add_argument('--sweep-dur', type=float, default=1.0, help='sweep duration in s (default 1.0)')
+    parser.add_argument('--num-sweeps', type=int, default=2, help='sweeps per point (default 2)')
+    parser.add_argument('--pipeline-workers', type=int, default=0, help='[nfs] pipeline_workers (default 0)')
+    parser.add_argument('--writer-threads', type=int, default=0, help='[audio] writer_threads (default 0)')
+    parser.add_argument('--output-format', default='wav', choices=('wav', 'dataset', 'both'))
+    parser.add_argument('--quick', action='store_true', help='fewer points per scan')
+    parser.add_argument('--only', help='only run cases whose points type or motion manager contains this text')
+    args = parser.parse_args(argv)
+    if args.config is not None:
+        args.config = args.config.resolve()
+
+    print(f"{'case':<72} {'points':>6} {'pts/h':>8} " + ' '.join(f'{s:>10}' for s in STAGES)
+          + f" {'median':>8} {'p95':>8} {'max':>8} {'scan':>8} {'predicted':>9}")
+    results = {}
+    for points_type, params, quick_params, motion_managers in CASES:
+        for motion_manager in motion_managers:
+            key = f'{points_type}|{motion_manager}'
+            if args.only and args.only not in key:
+                continue
+            result = run_case(points_type, quick_params if args.quick else params, motion_manager, args)
+            results[key] = result
+            latency = result['latency_s']
+            print(f"{key:<72} {result['points']:>6} {result['points_per_hour']:>8.0f} "
+                  + ' '.join(f"{result['share'][s]:>10.1%}" for s in STAGES)
+                  + f" {latency['median']:>7.2f}s {latency['p95']:>7.2f}s {latency['max']:>7.2f}s"
+                  + f" {result['scan_s']:>7.1f}s {result['predicted_s']:>8.1f}s", flush=True)
+
+    report = {
+        'meta': {'python': platform.python_version(), 'machine': platform.machine(),
+                 'processor': platform.processor(), 'timestamp': time.strftime('%Y-%m-%dT%H:%M:%S'),
+                 'sweep_dur_s': args.sweep_dur, 'num_sweeps': args.num_sweeps,
+                 'pipeline_workers': args.pipeline_workers, 'writer_threads': args.writer_threads,
+                 'output_format': args.output_format},
+        'results': results,
+    }
+    args.out.write_text(json.dumps(report, indent=2))
+    print(f'Wrote {len(results)} results to {args.out}')
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
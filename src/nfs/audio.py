@@ -26,22 +26,27 @@ Key Features:
 """
 
 import configparser
+import functools
 import os
+import queue
 import threading
 import time
 from abc import ABC, abstractmethod
+from collections import OrderedDict
 from pathlib import Path
-from typing import Optional, Dict, Any, List, Tuple
+from typing import Optional, Dict, Any, List, Tuple, Callable
 from nfs import registry
 
 import numpy as np
 import scipy.signal
-import scipy.fft
-import soundfile as sf
 
 from loguru import logger
 
 from .datatypes import CylindricalPosition
+from .dataset import ScanDataset
+from .instrumentation import count, current_point, recording, span
+from .result_writer import ResultWriter
+from .virtual_source import VirtualSource, VirtualSourceFactory
 
 # Enable ASIO build of PortAudio in python-sounddevice (Windows).
 # This environment variable triggers the loading of ASIO drivers if available.
@@ -53,6 +58,7 @@ import sounddevice as sd  # noqa: E402
 # ─────────────────────────────────────────────────────────────────────────────
 
 from .utils.dsp import DSPUtils
+from .utils.fft import FFT
 
 
 class DSPVerificationTool:
@@ -147,9 +153,9 @@ class MarkerGenerator:
 
         # Frequency Domain Band-Limiting
         # Ensures the marker doesn't excite resonances outside the measurement band
-        Nfft = int(2 ** np.ceil(np.log2(n * 2)))
-        M = np.fft.rfft(marker_raw, n=Nfft)
-        freqs = np.fft.rfftfreq(Nfft, 1 / self.fs)
+        Nfft = FFT.fast_len(n * 2)
+        M = FFT.rfft(marker_raw, n=Nfft)
+        freqs = FFT.rfftfreq(Nfft, 1 / self.fs)
         f_lo, f_hi = self.bw_hz
         mask = np.ones_like(freqs, dtype=np.float32)
 
@@ -164,7 +170,7 @@ class MarkerGenerator:
                     1 - np.cos(np.pi * np.clip((self.fs / 2 - freqs[idx]) / max(1e-9, (self.fs / 2 - f_hi)), 0, 1)))
             mask[idx] = ramp ** 2
 
-        marker_bl = np.fft.irfft(M * mask, n=Nfft)[:n].astype(np.float32)
+        marker_bl = FFT.irfft(M * mask, n=Nfft)[:n].astype(np.float32)
         marker_bl *= DSPUtils.db_to_lin(self.level_dbfs) / (np.max(np.abs(marker_bl)) + 1e-12)
         return marker_bl
 
@@ -205,10 +211,10 @@ class SweepGenerator:
 
         # Normalize Inverse in Frequency Domain to ensure unity gain convolution
         target_amp = DSPUtils.db_to_lin(self.level_dbfs)
-        Nfft = int(2 ** np.ceil(np.log2(len(s_fund) + len(inv) - 1)))
-        S_fft = np.fft.rfft(s_fund, n=Nfft)
-        I_fft = np.fft.rfft(inv, n=Nfft)
-        peak_val = np.max(np.abs(np.fft.irfft(S_fft * I_fft, n=Nfft)))
+        Nfft = FFT.fast_len(len(s_fund) + len(inv) - 1)
+        S_fft = FFT.rfft(s_fund, n=Nfft)
+        I_fft = FFT.rfft(inv, n=Nfft)
+        peak_val = np.max(np.abs(FFT.irfft(S_fft * I_fft, n=Nfft, overwrite_x=True)))
 
         inv /= (peak_val * target_amp + 1e-15)
         return s_fund, phase, inv
@@ -270,9 +276,9 @@ class ProtectionFilter:
             # This ensures the slope order is exactly as requested (e.g., 1st order = 6dB/oct).
             # Note: Standard sosfiltfilt would double the effective order; this method does not.
             n = len(sig)
-            Nfft = int(2 ** np.ceil(np.log2(n + self.fs)))  # Pad generously to avoid time-domain wrap-around artifacts
-            X = np.fft.rfft(sig, n=Nfft)
-            freqs = np.fft.rfftfreq(Nfft, d=1.0 / self.fs)
+            Nfft = FFT.fast_len(n + self.fs)  # Pad generously to avoid time-domain wrap-around artifacts
+            X = FFT.rfft(sig, n=Nfft)
+            freqs = FFT.rfftfreq(Nfft, d=1.0 / self.fs)
 
             safe_f = np.maximum(freqs, 1e-9)
 
@@ -282,7 +288,7 @@ class ProtectionFilter:
 
             # Apply Magnitude Mask (Phase remains 0 for the filter -> Linear Phase overall)
             X_filtered = X * mag
-            y = np.fft.irfft(X_filtered, n=Nfft)
+            y = FFT.irfft(X_filtered, n=Nfft, overwrite_x=True)
             return y[:n].astype(np.float32)
 
         else:
@@ -290,33 +296,334 @@ class ProtectionFilter:
             return sig
 
 
+class ExcitationBundle:
+    """
+    Complete playback material for one measurement: the conditioned sweep, its inverse filter,
+    the alignment marker and the assembled multi-sweep timeline.
+
+    All arrays are read-only; they are shared between every measurement that uses the same settings.
+
+    With overlapped sweeps (MESM) the slots are shorter than a sweep; ir_frame_len and harmonic_len
+    then give the part of each sweep's deconvolved response that is free of its neighbours, and
+    playback_gain the level reduction applied to keep the summed sweeps at the configured peak.
+
+    With several speaker channels tx_sweep_long is (n_drivers, n_samples): every driver plays the
+    sweep driver_offsets[d] samples into each slot, and the drivers are separated the same way.
+    """
+
+    def __init__(self, s_play: np.ndarray, inv_sweep: np.ndarray, marker: np.ndarray,
+                 tx_sweep_long: np.ndarray, tx_ref_long: np.ndarray, out_frames: np.ndarray,
+                 pre_samps_settle: int, slot_len: int, ir_frame_len: Optional[int] = None,
+                 harmonic_len: int = 0, playback_gain: float = 1.0, driver_offsets: Optional[List[int]] = None):
+        self.s_play = s_play
+        self.inv_sweep = inv_sweep
+        self.marker = marker
+        self.tx_sweep_long = tx_sweep_long
+        self.tx_ref_long = tx_ref_long
+        self.out_frames = out_frames
+        self.pre_samps_settle = pre_samps_settle
+        self.slot_len = slot_len
+        self.sweep_len = len(s_play)
+        self.total_len = len(tx_ref_long)
+        self.ir_frame_len = ir_frame_len
+        self.harmonic_len = harmonic_len
+        self.playback_gain = playback_gain
+        self.driver_offsets = driver_offsets or [0]
+
+        for arr in (s_play, inv_sweep, marker, tx_sweep_long, tx_ref_long, out_frames):
+            arr.flags.writeable = False
+
+    @property
+    def overlapped(self) -> bool:
+        """True when the sweeps (of one or more drivers) overlap and are separated after one long deconvolution."""
+        return self.ir_frame_len is not None
+
+
+class ExcitationCache:
+    """
+    Memoizes ExcitationBundles so the sweep, inverse filter, marker and playback timeline
+    are synthesized once per configuration instead of once per measurement point.
+    """
+
+    def __init__(self, max_entries: int = 4):
+        self.max_entries = max_entries
+        self._bundles: "OrderedDict[tuple, ExcitationBundle]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def _key(sweep_gen: SweepGenerator, marker_gen: MarkerGenerator,
+             harmonic_injector: Optional[HarmonicInjector], protection_filter: Optional[ProtectionFilter],
+             hw: Dict[str, Any], cap: Dict[str, Any]) -> tuple:
+        injector_key = (harmonic_injector.h2_db, harmonic_injector.h3_db) if harmonic_injector else None
+        hpf_key = (protection_filter.freq_hz, protection_filter.order, protection_filter.phase_mode) \
+            if protection_filter else None
+        return (
+            sweep_gen.fs, sweep_gen.T, sweep_gen.f1, sweep_gen.level_dbfs, cap['sweep_level_dbfs'],
+            hpf_key, injector_key,
+            marker_gen.fs, marker_gen.dur_ms, tuple(marker_gen.bw_hz), marker_gen.level_dbfs,
+            cap['pre_sil_ms'], cap['post_sil_ms'], cap['num_sweeps'],
+            tuple(speaker_channels(hw)), hw['ch_out_ref'],
+            cap.get('overlapped_sweeps', False), cap.get('ir_len_ms'), cap.get('max_harmonic'),
+        )
+
+    def get(self, sweep_gen: SweepGenerator, marker_gen: MarkerGenerator,
+            harmonic_injector: Optional[HarmonicInjector], protection_filter: Optional[ProtectionFilter],
+            hw: Dict[str, Any], cap: Dict[str, Any]) -> ExcitationBundle:
+        """Returns the bundle for the current settings, building it on first use."""
+        key = self._key(sweep_gen, marker_gen, harmonic_injector, protection_filter, hw, cap)
+        with self._lock:
+            bundle = self._bundles.get(key)
+            if bundle is not None:
+                self._bundles.move_to_end(key)
+                return bundle
+
+            bundle = self._build(sweep_gen, marker_gen, harmonic_injector, protection_filter, hw, cap)
+            self._bundles[key] = bundle
+            while len(self._bundles) > self.max_entries:
+                self._bundles.popitem(last=False)
+            return bundle
+
+    def clear(self) -> None:
+        """Drops all cached bundles."""
+        with self._lock:
+            self._bundles.clear()
+
+    @staticmethod
+    def _build(sweep_gen: SweepGenerator, marker_gen: MarkerGenerator,
+               harmonic_injector: Optional[HarmonicInjector], protection_filter: Optional[ProtectionFilter],
+               hw: Dict[str, Any], cap: Dict[str, Any]) -> ExcitationBundle:
+        fs = hw['fs']
+        logger.debug("Building excitation bundle (sweep, inverse, marker, timeline)")
+
+        # 1. Generate Signals
+        s_fund, phase, inv_sweep = sweep_gen.generate()
+
+        s_composite = s_fund.copy()
+        if harmonic_injector:
+            s_composite = harmonic_injector.inject(s_fund, phase)
+
+        # 2. + 3. Normalize, fade and protect the playback signal
+        target_amp = DSPUtils.db_to_lin(cap['sweep_level_dbfs'])
+        s_play = ExcitationCache.playback_sweep(s_composite, cap['sweep_level_dbfs'], fs, protection_filter)
+
+        # 4. Generate Alignment Marker
+        # Goal: Generate band-limited marker. Pushing the fundamental frequency well
+        # below the HPF ensures only phase-flipped transient edges remain for sharp alignment.
+        marker_single = marker_gen.generate()
+
+        # 5. Construct Timeline
+        pre_samps_settle = int(round(cap['pre_sil_ms'] / 1000.0 * fs))
+        post_samps = int(round(cap['post_sil_ms'] / 1000.0 * fs))
+        sweep_len = len(s_play)
+        marker_len = len(marker_single)
+
+        drivers = speaker_channels(hw)
+        disjoint_slot_len = max(sweep_len, marker_len) + post_samps
+        slot_len = disjoint_slot_len
+        ir_frame_len, harmonic_len, driver_step = None, 0, 0
+        if cap.get('overlapped_sweeps') or len(drivers) > 1:
+            ir_frame_len, harmonic_len = ExcitationCache.overlap_lengths(sweep_gen, cap['ir_len_ms'],
+                                                                         cap['max_harmonic'])
+            # Every driver starts its sweep one IR separation after the previous driver
+            driver_step = ir_frame_len + harmonic_len
+            slot_len = max(sweep_len + (len(drivers) - 1) * driver_step, marker_len) + post_samps
+            if cap.get('overlapped_sweeps'):
+                slot_len = min(slot_len, max(len(drivers) * driver_step, marker_len))
+        driver_offsets = [d * driver_step for d in range(len(drivers))]
+        # The last slot always holds full sweeps and their tail
+        total_len = (pre_samps_settle + slot_len * (cap['num_sweeps'] - 1)
+                     + max(sweep_len + driver_offsets[-1], marker_len) + post_samps)
+
+        tx_sweep_long = np.zeros((len(drivers), total_len), dtype=np.float32)
+        tx_ref_long = np.zeros(total_len, dtype=np.float32)
+
+        # Populate buffers with repeated (staggered) sweeps, summed where they overlap
+        cursor = pre_samps_settle
+        for _ in range(cap['num_sweeps']):
+            for d, offset in enumerate(driver_offsets):
+                tx_sweep_long[d, cursor + offset: cursor + offset + sweep_len] += s_play
+            tx_ref_long[cursor: cursor + marker_len] = marker_single
+            cursor += slot_len
+
+        # Overlapping sweeps add up; scale the timeline back to the configured peak level
+        playback_gain = 1.0
+        peak = float(np.max(np.abs(tx_sweep_long)))
+        if ir_frame_len is not None and peak > target_amp:
+            playback_gain = target_amp / peak
+            tx_sweep_long *= playback_gain
+            logger.info(f"Overlapped sweeps: slot {slot_len / fs * 1000:.0f} ms instead of "
+                        f"{disjoint_slot_len / fs * 1000:.0f} ms, "
+                        f"level {20 * np.log10(playback_gain):.1f} dB to stay at the peak level")
+
+        # 6. Interleave into device frames
+        out_ch_count = max(drivers + [hw['ch_out_ref']]) + 1
+        out_frames = np.zeros((total_len, out_ch_count), dtype=np.float32)
+        out_frames[:, drivers] = tx_sweep_long.T
+        out_frames[:, hw['ch_out_ref']] = tx_ref_long
+        if len(drivers) == 1:
+            tx_sweep_long = tx_sweep_long[0]
+
+        return ExcitationBundle(s_play, inv_sweep, marker_single, tx_sweep_long, tx_ref_long, out_frames,
+                                pre_samps_settle, slot_len, ir_frame_len, harmonic_len, playback_gain,
+                                driver_offsets)
+
+    @staticmethod
+    def playback_sweep(s_composite: np.ndarray, level_dbfs: float, fs: int,
+                       protection_filter: Optional[ProtectionFilter]) -> np.ndarray:
+        """The sweep as the speaker plays it: peaked at level_dbfs, faded and protection filtered."""
+        # Normalize Playback Signal
+        target_amp = DSPUtils.db_to_lin(level_dbfs)
+        max_val = np.max(np.abs(s_composite)) + 1e-12
+        s_play = (s_composite * (target_amp / max_val)).astype(np.float32)
+
+        # Apply a 1ms Hann fade to prevent the step discontinuity "BLIP" at the end
+        s_play = DSPUtils.hann_fade(s_play, 1.0, fs, side="both")
+
+        # Apply Protection Filter (Playback Only)
+        # This modifies what the speaker plays, but NOT the inverse filter.
+        # The resulting IR will inherently show the rolloff of this filter.
+        if protection_filter:
+            s_play = protection_filter.apply(s_play)
+            # Re-peak to ensure we hit the target DBFS in the passband.
+            # This prevents the HPF from essentially quieting the whole sweep if fundamental is low.
+            new_max = np.max(np.abs(s_play)) + 1e-12
+            s_play *= (target_amp / new_max)
+        return s_play
+
+    @staticmethod
+    def overlap_lengths(sweep_gen: SweepGenerator, ir_len_ms: float, max_harmonic: int) -> Tuple[int, int]:
+        """
+        Separation of overlapped sweeps (MESM), from the sweep rate and the IR length.
+
+        Harmonic n of an exponential sweep appears L * ln(n) before the linear IR, with
+        L = T / ln(f2 / f1). Sweep k + 1 can therefore start once the linear IR of sweep k has
+        decayed before harmonic max_harmonic of sweep k + 1 arrives: a spacing of
+        ir_frame_len + harmonic_len.
+
+        :return: Samples kept on either side of each linear IR (at least the IR length) and the
+                 harmonic span L * ln(max_harmonic).
+        """
+        fs = sweep_gen.fs
+        rate = sweep_gen.T / np.log((fs * 0.5) / sweep_gen.f1)
+        harmonic_len = int(np.ceil(rate * np.log(max(max_harmonic, 1)) * fs))
+        ir_len = int(round(ir_len_ms / 1000.0 * fs))
+        return max(ir_len, harmonic_len), harmonic_len
+
+
 # ─────────────────────────────────────────────────────────────────────────────
 #  PROCESSING ENGINES
 # ─────────────────────────────────────────────────────────────────────────────
 
+class AlignmentDebugDumper:
+    """
+    Writes matched-filter debug data (loopback segment, reference, lags, correlation, PSR) to
+    per-point .npz files for analysis with analyze_marker_alignment.py.
+
+    Dumping is explicit: only points selected through select() are dumped, optionally just every
+    Nth point, and the files are written by a background ResultWriter so the alignment itself
+    never waits on disk I/O.
+
+    Without a directory the dumper writes into the output tree of the Audio it is given to
+    (Recordings/debug/alignment), see use_directory().
+    """
+
+    def __init__(self, directory: Optional[Path] = None, every_nth: int = 1, compress: bool = True,
+                 writer: Optional[ResultWriter] = None):
+        self.directory: Optional[Path] = None
+        if directory is not None:
+            self.use_directory(directory)
+        self.every_nth = max(1, every_nth)
+        self.compress = compress
+        self.writer = writer if writer is not None else ResultWriter(num_threads=1)
+        self._point_count = 0
+        self._lock = threading.Lock()
+
+    def use_directory(self, directory: Path) -> None:
+        """Writes the following dumps to directory."""
+        self.directory = Path(directory)
+        self.directory.mkdir(parents=True, exist_ok=True)
+
+    def select(self, point_name: str) -> Optional[str]:
+        """Counts a point and returns its debug tag if it is sampled, otherwise None."""
+        with self._lock:
+            index = self._point_count
+            self._point_count += 1
+        return point_name if index % self.every_nth == 0 else None
+
+    def dump(self, tag: str, **arrays: Any) -> None:
+        """Queues the arrays for writing to '<tag>_alignment.npz'."""
+        save = np.savez_compressed if self.compress else np.savez
+        self.writer.submit(self.directory / f"{tag}_alignment.npz", lambda p: save(p, **arrays))
+
+    def flush(self) -> None:
+        self.writer.flush()
+
+    def close(self) -> None:
+        self.writer.close()
+
+
 class AlignmentEngine:
-    """Handles cross-correlation and synchronous averaging."""
+    """
+    Handles cross-correlation and synchronous averaging.
+
+    Averages are accumulated in `dtype`: float64 by default, float32 to halve the memory of the
+    running sums for long high-rate captures.
+    """
 
     def __init__(self, fs: int, num_sweeps: int, align_to_first_marker: bool, mic_tail_taper_ms: float,
-                 marker_dur_ms: float):
+                 marker_dur_ms: float, debug_dumper: Optional["AlignmentDebugDumper"] = None,
+                 dtype: Any = np.float64):
         self.fs = fs
+        self.dtype = np.dtype(dtype)
         self.num_sweeps = num_sweeps
         self.align_to_first_marker = align_to_first_marker
         self.mic_tail_taper_ms = mic_tail_taper_ms
         self.marker_dur_ms = marker_dur_ms
+        self.debug_dumper = debug_dumper
+        # (id(ref), Nfft) -> (ref, rfft(ref)); the marker is fixed for a whole scan
+        self._ref_spectra: "OrderedDict[Tuple[int, int], Tuple[np.ndarray, np.ndarray]]" = OrderedDict()
+        self._ref_lock = threading.Lock()
+
+    def _ref_spectrum(self, ref: np.ndarray, n: int) -> np.ndarray:
+        """Returns the (cached) rfft of the reference marker at length n."""
+        key = (id(ref), n)
+        with self._ref_lock:
+            entry = self._ref_spectra.get(key)
+            if entry is not None and entry[0] is ref:
+                self._ref_spectra.move_to_end(key)
+                return entry[1]
+            spectrum = FFT.rfft(ref, n=n)
+            self._ref_spectra[key] = (ref, spectrum)
+            while len(self._ref_spectra) > 4:
+                self._ref_spectra.popitem(last=False)
+            return spectrum
 
     def _matched_filter_detect(self, x: np.ndarray, ref: np.ndarray, search_start: int = None,
-                               search_end: int = None) -> Tuple[int, float, float]:
+                               search_end: int = None, debug_tag: Optional[str] = None) -> Tuple[int, float, float]:
         """
         Finds the best match of signal 'ref' within 'x' using a matched filter.
         Returns the lag (index), the correlation coefficient, and the PSR.
+        With a debug dumper attached and a debug_tag given, the correlation data is dumped under that tag.
+
+        Only the part of 'x' that can contribute to lags inside [search_start, search_end] is
+        correlated: the search window plus one marker length. Narrow re-sync windows therefore
+        cost a small FFT instead of one over the full recording.
         """
-        lags, corr = DSPUtils.rfft_xcorr(x, ref)
         if search_start is None:
             search_start = 0
         if search_end is None:
             search_end = len(x) - 1
 
+        seg_start = max(0, search_start)
+        seg_end = min(len(x), search_end + len(ref))
+        segment = x[seg_start:seg_end]
+        if len(segment) == 0:
+            return 0, 0.0, 0.0
+
+        n = DSPUtils.xcorr_fft_len(len(segment), len(ref))
+        lags, corr = DSPUtils.rfft_xcorr(segment, ref, B=self._ref_spectrum(ref, n))
+        lags = lags + seg_start
+
         m = (lags >= search_start) & (lags <= search_end)
         lags_sel, corr_sel = lags[m], corr[m]
 
@@ -345,51 +652,87 @@ class AlignmentEngine:
         # --- END QUALITY / PSR CHECK ---
 
         # --- BEGIN DEBUG DATA SAVE BLOCK ---
-        try:
-            debug_dir = Path("./Recordings/debug")
-            if debug_dir.exists():
-                norm_x = np.linalg.norm(x[max(0, lags_sel[i]):max(0, lags_sel[i]) + len(ref)])
-                norm_ref = np.linalg.norm(ref)
-                match_pct = float(corr_sel[i]) / (norm_x * norm_ref + 1e-12) if (norm_x * norm_ref) > 0 else 0.0
-
-                np.savez(
-                    debug_dir / "alignment_debug.npz",
-                    x=x,
-                    ref=ref,
-                    lags=lags,
-                    corr=corr,
-                    peak_idx=int(lags_sel[i]),
-                    match_pct=match_pct,
-                    psr=psr
-                )
-        except Exception as e:
-            logger.warning(f"Failed to save alignment debug data: {e}")
+        if self.debug_dumper is not None and debug_tag is not None:
+            peak_idx = int(lags_sel[i])
+            norm_x = np.linalg.norm(x[max(0, peak_idx):max(0, peak_idx) + len(ref)])
+            norm_ref = np.linalg.norm(ref)
+            match_pct = float(corr_sel[i]) / (norm_x * norm_ref + 1e-12) if (norm_x * norm_ref) > 0 else 0.0
+
+            self.debug_dumper.dump(
+                debug_tag,
+                x=segment,
+                x_offset=seg_start,
+                ref=ref,
+                lags=lags,
+                corr=corr,
+                peak_idx=peak_idx,
+                match_pct=match_pct,
+                psr=psr
+            )
         # --- END DEBUG DATA SAVE BLOCK ---
 
         return int(lags_sel[i]), peak_val, psr
 
     def sync_and_average(self, rec_mic: np.ndarray, rec_loop: np.ndarray, marker_single: np.ndarray,
-                         pre_samps_settle: int, slot_len: int, sweep_len: int) -> Tuple[
-        np.ndarray, np.ndarray, List[np.ndarray], float]:
+                         pre_samps_settle: int, slot_len: int, sweep_len: int, keep_slices: bool = True,
+                         debug_tag: Optional[str] = None) -> Tuple[np.ndarray, np.ndarray, List[np.ndarray], float]:
+        """
+        Aligns every sweep of the recording on its marker and averages them.
 
+        Sweeps are never copied out of the recording: with a constant slot spacing the average is
+        taken over a strided 2-D view in one pass, otherwise aligned windows are accumulated into
+        a running sum in the engine's dtype.
+
+        :param rec_mic: Mic recording, (n_samples,) or (n_mics, n_samples) for a mic array.
+        :param keep_slices: Also return the per-sweep mic windows (as views), e.g. for debug saves.
+        :param debug_tag: Dump the marker detections of this point under this name (needs a debug dumper).
+        :return: Averaged mic (same leading shape as rec_mic), averaged loopback, per-sweep mic windows
+                 (empty unless kept) and PSR.
+        """
         # --- Alignment & Averaging ---
-        mic_slices = []
-        loop_slices = []
-        capture_len = sweep_len + int(round(self.mic_tail_taper_ms / 1000.0 * self.fs))
+        capture_len = self.capture_len(sweep_len)
+        starts, psr = self.locate_sweeps(rec_loop, marker_single, pre_samps_settle, slot_len, capture_len,
+                                         debug_tag=debug_tag)
 
+        # Synchronous Averaging to lower the noise floor
+        avg_mic = self._average_windows(rec_mic, starts, capture_len, slot_len, self.dtype)
+        avg_loop = self._average_windows(rec_loop, starts, capture_len, slot_len, self.dtype)
+
+        # Per-sweep windows are only materialised (as views) when asked for
+        mic_slices = [rec_mic[..., s: s + capture_len] for s in starts] if keep_slices else []
+
+        # Fade out tail using the unified _hann_fade (approx 10ms)
+        avg_mic = DSPUtils.hann_fade(avg_mic, 10.0, self.fs, side="out")
+
+        return avg_mic.astype(np.float32, copy=False), avg_loop.astype(np.float32, copy=False), mic_slices, psr
+
+    def locate_sweeps(self, rec_loop: np.ndarray, marker_single: np.ndarray, pre_samps_settle: int, slot_len: int,
+                      window_len: int, debug_tag: Optional[str] = None) -> Tuple[List[int], float]:
+        """
+        Finds the start of every sweep on the loopback markers.
+
+        :param window_len: Samples needed from each start; sweeps whose window runs past the recording are dropped.
+        :return: Sweep start indices and the PSR of the (first) marker detection.
+        :raises RuntimeError: If no sweep window lies inside the recording.
+        """
         # --- FIXED ALIGNMENT LOGIC ---
         # 1. Find a global anchor (first marker) using Matched Filter
         search_limit = pre_samps_settle + slot_len
-        k_first_marker, _, psr = self._matched_filter_detect(rec_loop, marker_single, search_end=search_limit)
+        k_first_marker, _, psr = self._matched_filter_detect(
+            rec_loop, marker_single, search_end=search_limit,
+            debug_tag=f"{debug_tag}_first" if debug_tag else None)
 
         # The correlation peak IS the start.
         t0_first_sweep = k_first_marker
         logger.debug(f"Marker found at {k_first_marker}. Using this as T0. PSR={psr:.1f}")
 
-        window_samps = int(0.005 * self.fs)  # 5ms search window for re-sync
+        window_samps = self.resync_window()
 
+        starts = []
         for i in range(self.num_sweeps):
             expected_t0 = t0_first_sweep + (i * slot_len)
+            if expected_t0 >= len(rec_loop):
+                break  # Capture was ended early (adaptive averaging)
 
             if self.align_to_first_marker:
                 # Sample-based cut: Rely on the first marker and constant sample rate
@@ -399,60 +742,84 @@ class AlignmentEngine:
                 # Corrects for minor clock drift in very long sequences
                 s_start = max(0, expected_t0 - window_samps)
                 s_end = min(len(rec_loop), expected_t0 + window_samps)
-                k_local, _, psr_local = self._matched_filter_detect(rec_loop, marker_single, search_start=s_start,
-                                                                    search_end=s_end)
+                k_local, _, psr_local = self._matched_filter_detect(
+                    rec_loop, marker_single, search_start=s_start, search_end=s_end,
+                    debug_tag=f"{debug_tag}_sweep{i + 1:02d}" if debug_tag else None)
                 start_idx = k_local
                 if i == 0: psr = psr_local  # Use first sweep PSR as representative if per-sweep
 
-            end_idx = start_idx + capture_len
-            # Stores aligned capture window copies into accumulation lists
-            if end_idx <= len(rec_mic) and start_idx >= 0:
-                mic_slices.append(rec_mic[start_idx: end_idx].copy())
-                loop_slices.append(rec_loop[start_idx: end_idx].copy())
+            # Keeps only capture windows that lie completely inside the recording
+            if start_idx + window_len <= len(rec_loop) and start_idx >= 0:
+                starts.append(start_idx)
 
-        if not mic_slices:
+        if not starts:
             raise RuntimeError("No valid sweeps captured (Alignment failed).")
+        return starts, psr
 
-        # Synchronous Averaging to lower the noise floor
-        avg_mic = np.mean(mic_slices, axis=0)
-        avg_loop = np.mean(loop_slices, axis=0)
+    def capture_len(self, sweep_len: int) -> int:
+        """Length of the window cut out per sweep: the sweep plus the mic tail."""
+        return sweep_len + int(round(self.mic_tail_taper_ms / 1000.0 * self.fs))
 
-        # Fade out tail using the unified _hann_fade (approx 10ms)
-        avg_mic = DSPUtils.hann_fade(avg_mic, 10.0, self.fs, side="out")
+    def resync_window(self) -> int:
+        """Half width of the per-sweep marker search window (5 ms)."""
+        return int(0.005 * self.fs)
 
-        return avg_mic.astype(np.float32), avg_loop.astype(np.float32), mic_slices, psr
+    @staticmethod
+    def _average_windows(rec: np.ndarray, starts: List[int], length: int, slot_len: int,
+                         dtype: Any = np.float64) -> np.ndarray:
+        """Mean of rec[..., s:s + length] over all starts, without copying the windows, accumulated in dtype."""
+        rec = np.ascontiguousarray(rec)
+        if len(starts) > 1 and np.all(np.diff(starts) == slot_len):
+            # Evenly spaced sweeps: (..., n_sweeps, length) view with a stride of one slot
+            step = rec.strides[-1]
+            view = np.lib.stride_tricks.as_strided(rec[..., starts[0]:],
+                                                   shape=rec.shape[:-1] + (len(starts), length),
+                                                   strides=rec.strides[:-1] + (slot_len * step, step),
+                                                   writeable=False)
+            return view.mean(axis=-2, dtype=dtype)
+
+        acc = np.zeros(rec.shape[:-1] + (length,), dtype=dtype)
+        for s in starts:
+            acc += rec[..., s: s + length]
+        acc /= len(starts)
+        return acc
 
 
 class DeconvolutionEngine:
-    """Handles FFT deconvolution, spectral masking, and Farina separation."""
+    """
+    Handles FFT deconvolution, spectral masking, and Farina separation.
 
-    def __init__(self, fs: int):
-        self.fs = fs
+    Recordings are transformed in `dtype` (float64 by default). With float32 the recording
+    spectra, the cached inverse spectra and the deconvolved signal are complex64/float32, which
+    halves the peak memory of a deconvolution. The masks are designed in float64 either way.
+    """
 
-    def process_ir(self, mic_data: np.ndarray, inv_data: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+    def __init__(self, fs: int, max_cache_entries: int = 4, dtype: Any = np.float64):
+        self.fs = fs
+        self.dtype = np.dtype(dtype)
+        self.complex_dtype = np.result_type(self.dtype, np.complex64)
+        self.max_cache_entries = max_cache_entries
+        # (Nfft) -> H_min_phase and (Nfft, id(inverse)) -> (inverse, I * H_min_phase)
+        self._mask_cache: "OrderedDict[int, np.ndarray]" = OrderedDict()
+        self._inverse_cache: "OrderedDict[Tuple[int, int], Tuple[np.ndarray, np.ndarray]]" = OrderedDict()
+        # (Nfft, block, capture_len, id(inverse)) -> (inverse, partition spectra) for streaming deconvolution
+        self._partition_cache: "OrderedDict[Tuple[int, int, int, int], Tuple[np.ndarray, np.ndarray]]" = OrderedDict()
+        self._cache_lock = threading.Lock()
+
+    def invalidate(self) -> None:
+        """Drops all cached masks and inverse spectra, e.g. after the sweep configuration changed."""
+        with self._cache_lock:
+            self._mask_cache.clear()
+            self._partition_cache.clear()
+            self._inverse_cache.clear()
+
+    def _min_phase_mask(self, Nfft: int) -> np.ndarray:
         """
-        Performs deconvolution to extract the Impulse Response.
-        
-        Implements:
-          1. Frequency Domain Deconvolution (Y / X).
-          2. Spectral Masking (Butterworth DC protection & HF taming).
-          3. Minimum Phase Reconstruction (Cepstrum method) for the filter mask.
-          4. Weighted Farina Separation: Splitting the linear IR from the 
-             distortion products which appear at negative time.
-             
-        Returns:
-            ir_full:   The full time-domain result containing linear IR + distortion echoes.
-            ir_linear: The cropped linear response (causal part).
+        Builds the complex spectral mask for a transform length of Nfft:
+        a Butterworth DC guard and a cosine HF taper, made minimum phase via the cepstrum method.
         """
-        n_conv = len(mic_data) + len(inv_data) - 1
-        Nfft = int(2 ** np.ceil(np.log2(n_conv)))
-
-        # Go to Frequency Domain
-        Y = np.fft.rfft(mic_data, n=Nfft)
-        I = np.fft.rfft(inv_data, n=Nfft)
-
         # --- Spectral Mask Generation ---
-        freqs = np.fft.rfftfreq(Nfft, d=1.0 / self.fs)
+        freqs = FFT.rfftfreq(Nfft, d=1.0 / self.fs)
 
         # LF Mask - Standard Butterworth @ 5Hz (Fixed per requirement)
         safe_freqs = np.maximum(freqs, 1e-9)
@@ -487,7 +854,7 @@ class DeconvolutionEngine:
         else:
             log_mag_full = np.concatenate([log_mag, log_mag[-1:0:-1]])
 
-        cepstrum = np.fft.ifft(log_mag_full).real
+        cepstrum = FFT.ifft(log_mag_full).real
         w = np.zeros(Nfft)
         w[0] = 1.0
         mid = Nfft // 2
@@ -497,30 +864,697 @@ class DeconvolutionEngine:
         else:
             w[1:mid + 1] = 2.0
 
-        H_min_phase = np.exp(np.fft.fft(cepstrum * w))[:len(mag_spec)]
+        return np.exp(FFT.fft(cepstrum * w))[:len(mag_spec)]
+
+    def _filtered_inverse_spectrum(self, inv_data: np.ndarray, Nfft: int) -> np.ndarray:
+        """
+        Returns I * H_min_phase for the given inverse filter and transform length.
+
+        Entries are keyed on the identity of the inverse filter array, which the excitation cache
+        keeps stable for the lifetime of a sweep configuration. The array itself is held in the
+        entry so its id cannot be recycled while cached.
+        """
+        key = (Nfft, id(inv_data))
+        with self._cache_lock:
+            entry = self._inverse_cache.get(key)
+            if entry is not None and entry[0] is inv_data:
+                self._inverse_cache.move_to_end(key)
+                return entry[1]
+
+            H_min_phase = self._mask_cache.get(Nfft)
+            if H_min_phase is None:
+                H_min_phase = self._min_phase_mask(Nfft)
+                self._mask_cache[Nfft] = H_min_phase
+                while len(self._mask_cache) > self.max_cache_entries:
+                    self._mask_cache.popitem(last=False)
+            else:
+                self._mask_cache.move_to_end(Nfft)
+
+            I_filtered = (FFT.rfft(inv_data.astype(np.float64), n=Nfft) * H_min_phase).astype(self.complex_dtype)
+            self._inverse_cache[key] = (inv_data, I_filtered)
+            while len(self._inverse_cache) > self.max_cache_entries:
+                self._inverse_cache.popitem(last=False)
+            return I_filtered
+
+    @staticmethod
+    def fft_len(capture_len: int, inv_len: int) -> int:
+        """Transform length used to deconvolve a capture window of capture_len samples."""
+        return FFT.fast_len(capture_len + inv_len - 1)
+
+    def partitioned_inverse_spectrum(self, inv_data: np.ndarray, capture_len: int, block: int) -> np.ndarray:
+        """
+        Splits the masked inverse filter into partitions of `block` samples for uniformly
+        partitioned overlap-save convolution, and returns their 2*block point spectra.
+
+        The filter is the time-domain equivalent of the (circular) batch deconvolution of a
+        capture_len window, shifted by D = ceil(capture_len / block) * block samples so its
+        wrapped-around negative lags become causal. Convolving a window with it reproduces
+        process_ir's first 2 * len(inv_data) output samples, delayed by D.
+
+        :return: (n_partitions, block + 1) array of partition spectra.
+        """
+        Nfft = self.fft_len(capture_len, len(inv_data))
+        key = (Nfft, block, capture_len, id(inv_data))
+        with self._cache_lock:
+            entry = self._partition_cache.get(key)
+            if entry is not None and entry[0] is inv_data:
+                self._partition_cache.move_to_end(key)
+                return entry[1]
+
+        shift = -(-capture_len // block) * block
+        n_taps = shift + 2 * len(inv_data)
+        n_partitions = -(-n_taps // block)
+        h_eff = FFT.irfft(self._filtered_inverse_spectrum(inv_data, Nfft), n=Nfft)
+        taps = np.zeros(n_partitions * block)
+        taps[:n_taps] = h_eff[(np.arange(n_taps) - shift) % Nfft]
+        H_parts = FFT.rfft(taps.reshape(n_partitions, block), n=2 * block, axis=-1).astype(self.complex_dtype)
+
+        with self._cache_lock:
+            self._partition_cache[key] = (inv_data, H_parts)
+            while len(self._partition_cache) > self.max_cache_entries:
+                self._partition_cache.popitem(last=False)
+        return H_parts
+
+    def process_ir(self, mic_data: np.ndarray, inv_data: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+        """
+        Performs deconvolution to extract the Impulse Response.
+        
+        Implements:
+          1. Frequency Domain Deconvolution (Y / X).
+          2. Spectral Masking (Butterworth DC protection & HF taming).
+          3. Minimum Phase Reconstruction (Cepstrum method) for the filter mask.
+          4. Weighted Farina Separation: Splitting the linear IR from the 
+             distortion products which appear at negative time.
+
+        The masked inverse spectrum only depends on the inverse filter and Nfft, so it is cached;
+        a deconvolution then costs one forward rfft, a multiply and one irfft. A mic array block of
+        shape (n_mics, n_samples) goes through a single batched rfft/irfft along the last axis.
+             
+        Returns:
+            ir_full:   The full time-domain result containing linear IR + distortion echoes.
+            ir_linear: The cropped linear response (causal part).
+        """
+        Nfft = self.fft_len(mic_data.shape[-1], len(inv_data))
 
         # Deconvolve & Apply Mask
-        I_filtered = I * H_min_phase
-        H_complex = Y * I_filtered
-        h_full = np.fft.irfft(H_complex, n=Nfft).astype(np.float32)
+        I_filtered = self._filtered_inverse_spectrum(inv_data, Nfft)
+        H_complex = FFT.rfft(np.asarray(mic_data, dtype=self.dtype), n=Nfft, axis=-1)
+        H_complex *= I_filtered
+        h_full = FFT.irfft(H_complex, n=Nfft, axis=-1, overwrite_x=True).astype(np.float32, copy=False)
+
+        return self.window_and_split(h_full, len(inv_data))
 
+    def process_overlapped(self, mic_data: np.ndarray, inv_data: np.ndarray, starts: List[int], capture_len: int,
+                           ir_frame_len: int, harmonic_len: int, playback_gain: float = 1.0,
+                           driver_offsets: Optional[List[int]] = None) -> Tuple[np.ndarray, np.ndarray]:
+        """
+        Deconvolves a recording of overlapped sweeps (MESM) in one transform and windows every
+        sweep's response out of it.
+
+        The recording from the first sweep to the end of the last sweep window is deconvolved once.
+        Around each linear IR a frame of ir_frame_len samples on either side is cut out and the
+        frames are averaged. Within a frame only the harmonic_len samples before the linear IR
+        belong to this sweep; the rest of the leading half holds the previous sweep's IR and is
+        zeroed. The result has the layout of process_ir with ir_frame_len in place of the sweep
+        length.
+
+        :param mic_data: Mic recording, (n_samples,) or (n_mics, n_samples).
+        :param starts: Sweep start indices in the recording (from AlignmentEngine.locate_sweeps).
+        :param capture_len: Length of one sweep window (sweep plus mic tail).
+        :param playback_gain: Level reduction of the overlapped timeline; the IRs are scaled back by it.
+        :param driver_offsets: Start of each driver's sweep within a slot, for staggered multi-driver
+                               sweeps. The IRs of all drivers come out of the same deconvolution.
+        :return: ir_full and ir_linear, averaged over the sweeps. With driver_offsets they get a
+                 leading driver axis.
+        """
+        offsets = [0] if driver_offsets is None else list(driver_offsets)
+        inv_len = len(inv_data)
+        seg_start, seg_end = starts[0], starts[-1] + offsets[-1] + capture_len
+        segment = DSPUtils.hann_fade(np.asarray(mic_data[..., seg_start:seg_end], dtype=self.dtype), 10.0, self.fs,
+                                     side="out")
+
+        Nfft = self.fft_len(segment.shape[-1], inv_len)
+        I_filtered = self._filtered_inverse_spectrum(inv_data, Nfft)
+        H_long = FFT.rfft(segment, n=Nfft, axis=-1)
+        H_long *= I_filtered
+        h_long = FFT.irfft(H_long, n=Nfft, axis=-1, overwrite_x=True)
+
+        # The linear IR of a sweep starting at s lands at s - seg_start + inv_len - 1; frames put it at ir_frame_len - 1
+        slot_len = starts[1] - starts[0] if len(starts) > 1 else 0
+        irs = []
+        for driver_offset in offsets:
+            frame_starts = [s - seg_start + driver_offset + inv_len - ir_frame_len for s in starts]
+            h_full = AlignmentEngine._average_windows(h_long, frame_starts, 2 * ir_frame_len, slot_len, self.dtype)
+            h_full[..., :ir_frame_len - harmonic_len] = 0.0
+            h_full /= playback_gain
+            irs.append(self.window_and_split(h_full.astype(np.float32, copy=False), ir_frame_len))
+
+        if driver_offsets is None:
+            return irs[0]
+        return np.stack([ir_full for ir_full, _ in irs]), np.stack([ir_linear for _, ir_linear in irs])
+
+    def window_and_split(self, h_full: np.ndarray, inv_len: int) -> Tuple[np.ndarray, np.ndarray]:
+        """Truncates and fades the deconvolved signal, and separates the linear IR from the distortion."""
         # --- WINDOWING & SEPARATION of Linear and Distortion IRs ---
 
         # Truncate to remove ghost IR from length > sweep duration (inv_data) *2 
-        h_full = h_full[:len(inv_data) * 2]
+        h_full = h_full[..., :inv_len * 2]
 
         # Calculate fade: 10% of one sweep in ms
-        fade_ms = (len(inv_data) / self.fs) * 100.0
+        fade_ms = (inv_len / self.fs) * 100.0
         # Send to hann_fade util
         h_full = DSPUtils.hann_fade(h_full, fade_ms, self.fs, side="out")
 
         # Slice the Linear IR from the full IR
-        split_idx = len(inv_data) - 5
-        h_linear = h_full[split_idx: split_idx + len(inv_data)]
+        split_idx = inv_len - 5
+        h_linear = h_full[..., split_idx: split_idx + inv_len]
 
         return h_full, h_linear
 
 
+# ─────────────────────────────────────────────────────────────────────────────
+#  STREAMING
+# ─────────────────────────────────────────────────────────────────────────────
+
+def mic_channels(hw: Dict[str, Any]) -> List[int]:
+    """Input channels of the mic(s); hw['ch_in_mic'] is a single channel or a list for a mic array."""
+    return [int(ch) for ch in np.atleast_1d(hw['ch_in_mic'])]
+
+
+def speaker_channels(hw: Dict[str, Any]) -> List[int]:
+    """Output channels of the driver(s); hw['ch_out_spkr'] is a single channel or a list for a multi-way speaker."""
+    return [int(ch) for ch in np.atleast_1d(hw['ch_out_spkr'])]
+
+
+class _PlaybackJob:
+    """A single play & record request handed from the measurement thread to the stream callback."""
+
+    def __init__(self, out_frames: np.ndarray, num_mics: int = 1):
+        self.out_frames = out_frames
+        self.total_len = len(out_frames)
+        self.rec_mic = np.zeros((num_mics, self.total_len), dtype=np.float32)
+        self.rec_loop = np.zeros(self.total_len, dtype=np.float32)
+        self.idx_play = 0
+        self.idx_rec = 0
+        self.consumer: Optional["CaptureConsumer"] = None
+        # Where the capture ends when the consumer allows an early stop
+        self.stop_at: Optional[int] = None
+        self.done = threading.Event()
+
+
+class AudioStreamSession:
+    """
+    A full-duplex sounddevice stream that stays open across measurements.
+
+    While idle the callback plays silence and discards input. A measurement hands over a
+    preallocated timeline by publishing a _PlaybackJob reference; the callback picks it up at
+    the next block boundary and signals completion through the job's event. Publishing and
+    clearing a single attribute is atomic, so the real-time callback never takes a lock.
+
+    Device and host-API lookups are resolved once at construction. Keeping the stream running
+    avoids per-point driver negotiation (ASIO/WASAPI) and start-up transients in the first buffers.
+
+    :ivar xruns: Number of callbacks that reported an over- or underflow while a job was playing.
+    :type xruns: int
+    """
+    # Time a job may run past its own length before the stream is considered dead
+    CALLBACK_TIMEOUT_MARGIN_S = 5.0
+
+    def __init__(self, hw: Dict[str, Any]):
+        self.hw = hw
+        self._job: Optional[_PlaybackJob] = None
+        self._stream = None
+        self.xruns = 0
+
+        out_api = self._get_api_name(hw['dev_out'])
+        in_api = self._get_api_name(hw['dev_in'])
+        self.use_asio_in, self.use_asio_out = ("ASIO" in in_api), ("ASIO" in out_api)
+
+        self.mic_channels = mic_channels(hw)
+        # Speaker channel(s) followed by the reference channel
+        self.out_channels = speaker_channels(hw) + [hw['ch_out_ref']]
+        out_ch_count = max(self.out_channels) + 1
+        in_ch_count = max(self.mic_channels + [hw['ch_in_loop']]) + 1
+
+        # Configure SoundDevice Settings (ASIO vs WASAPI logic)
+        if self.use_asio_in:
+            self.in_args = (1 + len(self.mic_channels),
+                            sd.AsioSettings(channel_selectors=[hw['ch_in_loop']] + self.mic_channels))
+        else:
+            self.in_args = (in_ch_count,
+                            sd.WasapiSettings(exclusive=hw['wasapi_exclusive']) if "WASAPI" in in_api else None)
+
+        if self.use_asio_out:
+            self.out_args = (len(self.out_channels), sd.AsioSettings(channel_selectors=self.out_channels))
+        else:
+            self.out_args = (out_ch_count,
+                             sd.WasapiSettings(exclusive=hw['wasapi_exclusive']) if "WASAPI" in out_api else None)
+
+    @staticmethod
+    def _get_api_name(dev_index: int) -> str:
+        try:
+            d = sd.query_devices(dev_index)
+            return sd.query_hostapis()[d['hostapi']]['name'].upper()
+        except:
+            return "UNKNOWN"
+
+    @property
+    def is_open(self) -> bool:
+        return self._stream is not None
+
+    def open(self) -> None:
+        """Opens and starts the stream. Does nothing if it is already running."""
+        if self._stream is not None:
+            return
+        stream = sd.Stream(device=(self.hw['dev_in'], self.hw['dev_out']), samplerate=self.hw['fs'],
+                           blocksize=self.hw['blocksize'],
+                           dtype="float32", channels=(self.in_args[0], self.out_args[0]), dither_off=True,
+                           extra_settings=(self.in_args[1], self.out_args[1]), callback=self._callback)
+        stream.start()
+        self._stream = stream
+
+    def close(self) -> None:
+        """Stops and closes the stream."""
+        stream, self._stream = self._stream, None
+        if stream is not None:
+            stream.stop()
+            stream.close()
+
+    def play_and_record(self, out_frames: np.ndarray,
+                        consumer: Optional["CaptureConsumer"] = None) -> Tuple[np.ndarray, np.ndarray]:
+        """
+        Plays the given device frames and records the mic and loopback channels for the same duration.
+
+        :param out_frames: (n_samples, n_out_channels) playback timeline.
+        :param consumer: Optional worker that processes the recording while it is captured. It may
+                         end the capture early (see CaptureConsumer.stop_index).
+        :return: Recorded mic and loopback signals. The mic signal is (n_mics, n_samples) when
+                 several mic channels are configured, 1-D otherwise.
+        """
+        job = _PlaybackJob(out_frames, len(self.mic_channels))
+        rec_mic = job.rec_mic if len(self.mic_channels) > 1 else job.rec_mic[0]
+        if consumer is not None:
+            consumer.start(rec_mic, job.rec_loop)
+            job.consumer = consumer
+        xruns = self.xruns
+        self._job = job
+        # Bounded, so a stream that stops calling back (device unplugged, driver reset) cannot hang the scan
+        timeout = job.total_len / self.hw['fs'] + self.CALLBACK_TIMEOUT_MARGIN_S
+        finished = job.done.wait(timeout)
+        self._job = None
+        count('xruns', self.xruns - xruns)
+        if not finished:
+            if consumer is not None:
+                # Let the consumer's worker finish with what was recorded
+                consumer.end(job.idx_rec)
+            raise RuntimeError(f"Audio stream stopped delivering data: {job.idx_rec} of {job.total_len} samples "
+                               f"recorded after {timeout:.1f} s")
+        if job.stop_at is not None:
+            consumer.end(job.stop_at)
+            return rec_mic[..., :job.stop_at], job.rec_loop[:job.stop_at]
+        return rec_mic, job.rec_loop
+
+    # Real-time Callback
+    def _callback(self, indata, outdata, frames, time_info, status):
+        job = self._job
+        if status:
+            logger.warning(f"Audio Status: {status}")
+            if job is not None:
+                # Only the callback thread writes the counter
+                self.xruns += 1
+
+        if job is None or job.done.is_set():
+            outdata.fill(0)
+            return
+
+        out_frames, idx_play, idx_rec = job.out_frames, job.idx_play, job.idx_rec
+        if job.consumer is not None and job.stop_at is None:
+            job.stop_at = job.consumer.stop_index(idx_play)
+        total_len = job.total_len if job.stop_at is None else job.stop_at
+
+        # Output
+        n_out = min(frames, total_len - idx_play)
+        if self.use_asio_out:
+            outdata[:n_out, :len(self.out_channels)] = out_frames[idx_play:idx_play + n_out, self.out_channels]
+        else:
+            outdata[:n_out, :self.out_args[0]] = out_frames[idx_play:idx_play + n_out, :self.out_args[0]]
+        if frames > n_out:
+            outdata[n_out:] = 0
+
+        # Input
+        n_in = min(frames, total_len - idx_rec)
+        if n_in > 0:
+            if self.use_asio_in:
+                job.rec_loop[idx_rec:idx_rec + n_in] = indata[:n_in, 0]
+                job.rec_mic[:, idx_rec:idx_rec + n_in] = indata[:n_in, 1:1 + len(self.mic_channels)].T
+            else:
+                job.rec_loop[idx_rec:idx_rec + n_in] = indata[:n_in, self.hw['ch_in_loop']]
+                job.rec_mic[:, idx_rec:idx_rec + n_in] = indata[:n_in, self.mic_channels].T
+
+        job.idx_play = idx_play + n_out
+        job.idx_rec = idx_rec + n_in
+        if job.consumer is not None and n_in > 0:
+            job.consumer.feed(job.idx_rec)
+        if job.idx_play >= total_len and job.idx_rec >= total_len:
+            job.done.set()
+
+
+class CaptureConsumer(ABC):
+    """
+    Base for workers that process a recording while it is being captured.
+
+    The recorder calls ``feed`` with the number of valid samples in the (preallocated) record
+    buffers; a worker thread locates the sweep windows on the loopback markers as soon as the
+    loopback covers their search windows, and hands progress to ``_advance`` of the subclass.
+    The recorder also asks ``stop_index`` whether the capture may end early.
+
+    With a debug_tag (and a debug dumper on the alignment engine) the marker detections are
+    dumped under that tag, like AlignmentEngine.sync_and_average does.
+    """
+
+    def __init__(self, alignment_engine: AlignmentEngine, bundle: ExcitationBundle,
+                 debug_tag: Optional[str] = None):
+        self.alignment_engine = alignment_engine
+        self.bundle = bundle
+        self.debug_tag = debug_tag
+        self.capture_len = alignment_engine.capture_len(bundle.sweep_len)
+
+        self._progress: "queue.SimpleQueue[int]" = queue.SimpleQueue()
+        self._thread: Optional[threading.Thread] = None
+        self._processed = 0
+        self._processed_cond = threading.Condition()
+        self._done = threading.Event()
+        self._result: Optional[Dict[str, Any]] = None
+        self._error: Optional[BaseException] = None
+
+    def start(self, rec_mic: np.ndarray, rec_loop: np.ndarray) -> None:
+        """
+        Starts processing the given (still filling) recording buffers.
+
+        :param rec_mic: Mic buffer, (n_samples,) or (n_mics, n_samples).
+        :param rec_loop: Loopback buffer.
+        """
+        self._rec_mic, self._rec_loop = rec_mic, rec_loop
+        self._total_len = rec_loop.shape[-1]
+        self._t0: Optional[int] = None
+        self._psr = 0.0
+        self._next_sweep = 0
+        self._starts: List[int] = []
+        self._on_start()
+
+        self._thread = threading.Thread(target=self._run, name=f'nfs-{type(self).__name__}', daemon=True)
+        self._thread.start()
+
+    def feed(self, n_recorded: int) -> None:
+        """Reports that the first n_recorded samples of the buffers are valid. Safe to call from the audio callback."""
+        self._progress.put(n_recorded)
+
+    def stop_index(self, idx_play: int) -> Optional[int]:
+        """Sample index at which the capture may end, at or after idx_play, or None to record everything."""
+        return None
+
+    def wait_until(self, n_recorded: int, timeout: Optional[float] = None) -> bool:
+        """Blocks until the worker has handled the first n_recorded samples (or has finished)."""
+        with self._processed_cond:
+            return self._processed_cond.wait_for(lambda: self._processed >= n_recorded or self._done.is_set(),
+                                                 timeout)
+
+    def result(self, timeout: Optional[float] = None) -> Dict[str, Any]:
+        """
+        Waits for the worker to finish and returns its result.
+
+        :raises RuntimeError: If alignment failed or the recording ended early.
+        """
+        if not self._done.wait(timeout):
+            raise TimeoutError(f"{type(self).__name__} did not finish in time")
+        if self._error is not None:
+            raise self._error
+        return self._result
+
+    def end(self, n_recorded: int) -> None:
+        """Reports that the capture was stopped early, after n_recorded samples."""
+        self._total_len = n_recorded
+        self._progress.put(n_recorded)
+
+    # --- Worker ---
+
+    def _run(self) -> None:
+        try:
+            n = 0
+            while n < self._total_len:
+                n = max(n, self._progress.get())
+                # Only the latest fill level matters
+                while True:
+                    try:
+                        n = max(n, self._progress.get_nowait())
+                    except queue.Empty:
+                        break
+                n = min(n, self._total_len)
+                self._detect_markers(n)
+                self._advance(n)
+                with self._processed_cond:
+                    self._processed = n
+                    self._processed_cond.notify_all()
+            self._result = self._finish()
+        except BaseException as e:
+            self._error = e
+        finally:
+            with self._processed_cond:
+                self._done.set()
+                self._processed_cond.notify_all()
+
+    def _detect_markers(self, n: int) -> None:
+        """Finds the start of every sweep window whose marker search window has been recorded."""
+        engine, marker, slot_len = self.alignment_engine, self.bundle.marker, self.bundle.slot_len
+        if self._t0 is None:
+            search_limit = self.bundle.pre_samps_settle + slot_len
+            if n < min(self._total_len, search_limit + len(marker)):
+                return
+            self._t0, _, self._psr = engine._matched_filter_detect(
+                self._rec_loop, marker, search_end=search_limit,
+                debug_tag=f"{self.debug_tag}_first" if self.debug_tag else None)
+            logger.debug(f"Marker found at {self._t0}. Using this as T0. PSR={self._psr:.1f}")
+
+        window_samps = engine.resync_window()
+        while self._next_sweep < engine.num_sweeps:
+            i = self._next_sweep
+            expected_t0 = self._t0 + i * slot_len
+            if expected_t0 >= self._total_len:
+                self._next_sweep = engine.num_sweeps
+                return
+            if engine.align_to_first_marker:
+                start_idx = expected_t0
+            else:
+                s_start = max(0, expected_t0 - window_samps)
+                s_end = min(self._total_len, expected_t0 + window_samps)
+                if n < min(self._total_len, s_end + len(marker)):
+                    return
+                start_idx, _, psr_local = engine._matched_filter_detect(
+                    self._rec_loop, marker, search_start=s_start, search_end=s_end,
+                    debug_tag=f"{self.debug_tag}_sweep{i + 1:02d}" if self.debug_tag else None)
+                if i == 0:
+                    self._psr = psr_local
+
+            if start_idx + self.capture_len <= self._total_len and start_idx >= 0:
+                self._starts.append(start_idx)
+            self._next_sweep += 1
+
+    def _on_start(self) -> None:
+        """Allocates per-capture state."""
+
+    @abstractmethod
+    def _advance(self, n: int) -> None:
+        """Handles the first n recorded samples; sweep windows found so far are in self._starts."""
+        pass
+
+    @abstractmethod
+    def _finish(self) -> Dict[str, Any]:
+        pass
+
+
+class StreamingDeconvolver(CaptureConsumer):
+    """
+    Deconvolves a multi-sweep recording while it is still being captured.
+
+    Every sweep window is summed block by block as its samples arrive, and each completed block
+    of the average runs through a uniformly partitioned overlap-save (UPOLS) convolution with the
+    masked inverse filter. All spectral work is done by the time the last sweep window has been
+    recorded, so the IR is ready right after capture.
+
+    The result matches AlignmentEngine.sync_and_average followed by DeconvolutionEngine.process_ir.
+    """
+
+    def __init__(self, alignment_engine: AlignmentEngine, deconv_engine: DeconvolutionEngine,
+                 bundle: ExcitationBundle, block: Optional[int] = None, keep_slices: bool = False,
+                 debug_tag: Optional[str] = None):
+        super().__init__(alignment_engine, bundle, debug_tag)
+        self.deconv_engine = deconv_engine
+        self.keep_slices = keep_slices
+
+        inv_len = len(bundle.inv_sweep)
+        # Keep the number of partitions bounded (~100) for long sweeps
+        self.block = block or max(256, int(2 ** np.ceil(np.log2(inv_len / 32))))
+        self.n_blocks = -(-self.capture_len // self.block)
+        self.n_out_blocks = -(-2 * inv_len // self.block)
+        self._H = deconv_engine.partitioned_inverse_spectrum(bundle.inv_sweep, self.capture_len, self.block)
+
+        # Fade out of the averaged window, as applied by sync_and_average
+        gain = np.zeros(self.n_blocks * self.block, dtype=deconv_engine.dtype)
+        gain[:self.capture_len] = DSPUtils.hann_fade(np.ones(self.capture_len), 10.0, alignment_engine.fs, side="out")
+        self._fade = gain
+
+    def result(self, timeout: Optional[float] = None) -> Dict[str, Any]:
+        """
+        Waits for the deconvolution to finish.
+
+        :return: The aligned averages (as returned by Audio._align) plus 'ir_full' and 'ir_linear'.
+        :raises RuntimeError: If alignment failed or the recording ended early.
+        """
+        return super().result(timeout)
+
+    def _on_start(self) -> None:
+        lead = self._rec_mic.shape[:-1]
+        dtype = self.deconv_engine.dtype
+        self._mic_sum = np.zeros(lead + (self.n_blocks * self.block,), dtype=dtype)
+        self._loop_sum = np.zeros(self.n_blocks * self.block, dtype=dtype)
+        self._Y = np.zeros((self.n_out_blocks,) + lead + (self.block + 1,), dtype=self.deconv_engine.complex_dtype)
+        self._frame = np.zeros(lead + (2 * self.block,), dtype=dtype)
+        self._added: List[int] = []
+        self._next_block = 0
+        self._h_full: Optional[np.ndarray] = None
+
+    def _advance(self, n: int) -> None:
+        self._added.extend([0] * (len(self._starts) - len(self._added)))
+        self._accumulate(n)
+        # Blocks of the average are complete once every sweep window has contributed to them
+        if self._next_sweep < self.alignment_engine.num_sweeps:
+            return
+        if not self._starts:
+            raise RuntimeError("No valid sweeps captured (Alignment failed).")
+        ready = min(self._added)
+        while self._next_block < ready:
+            self._add_block(self._next_block)
+            self._next_block += 1
+            if self._next_block == self.n_blocks:
+                self._add_block(self.n_blocks)  # the last input block overlapped with silence
+                self._h_full = self._output()
+
+    def _accumulate(self, n: int) -> None:
+        for k, start in enumerate(self._starts):
+            while self._added[k] < self.n_blocks:
+                lo = self._added[k] * self.block
+                hi = min(lo + self.block, self.capture_len)
+                if start + hi > n:
+                    break
+                self._mic_sum[..., lo:hi] += self._rec_mic[..., start + lo:start + hi]
+                self._loop_sum[lo:hi] += self._rec_loop[start + lo:start + hi]
+                self._added[k] += 1
+
+    def _add_block(self, j: int) -> None:
+        """Adds input block j of the averaged window to every output block it contributes to."""
+        B = self.block
+        self._frame[..., :B] = self._frame[..., B:]
+        if j < self.n_blocks:
+            avg = self._mic_sum[..., j * B:(j + 1) * B] / len(self._starts) * self._fade[j * B:(j + 1) * B]
+            self._frame[..., B:] = avg.astype(np.float32)
+        else:
+            self._frame[..., B:] = 0.0
+        X = FFT.rfft(self._frame, axis=-1)
+
+        # Output block m (of the delayed result) receives X_j * H_(m + n_blocks - j)
+        p0 = self.n_blocks - j
+        H = self._H[p0:p0 + self.n_out_blocks]
+        self._Y += X[np.newaxis] * H.reshape((len(H),) + (1,) * (X.ndim - 1) + (B + 1,))
+
+    def _output(self) -> np.ndarray:
+        B = self.block
+        y = FFT.irfft(self._Y, n=2 * B, axis=-1)[..., B:]
+        y = np.moveaxis(y, 0, -2).reshape(y.shape[1:-1] + (self.n_out_blocks * B,))
+        return y[..., :2 * len(self.bundle.inv_sweep)].astype(np.float32)
+
+    def _finish(self) -> Dict[str, Any]:
+        if self._h_full is None:
+            raise RuntimeError("Recording ended before all sweep windows were captured")
+        ir_full, ir_linear = self.deconv_engine.window_and_split(self._h_full, len(self.bundle.inv_sweep))
+
+        count, L = len(self._starts), self.capture_len
+        avg_mic = (self._mic_sum[..., :L] / count * self._fade[:L]).astype(np.float32)
+        avg_loop = (self._loop_sum[:L] / count).astype(np.float32)
+        slices = [self._rec_mic[..., s: s + L] for s in self._starts] if self.keep_slices else []
+        return {
+            "inv_sweep": self.bundle.inv_sweep,
+            "tx_ref_signal": self.bundle.tx_ref_long[:L],
+            "rx_mic_conditioned": avg_mic,
+            "rx_loop_aligned": avg_loop,
+            "debug_mic_slices": slices,
+            "psr": self._psr,
+            "ir_full": ir_full,
+            "ir_linear": ir_linear,
+        }
+
+
+class AdaptiveAveragingMonitor(CaptureConsumer):
+    """
+    Ends a capture early once the averaged sweeps reach a target SNR.
+
+    After every completed sweep window (from min_sweeps on) the running average is deconvolved
+    with the cached inverse filter and DSPVerificationTool's SNR estimate is compared with the
+    target (the lowest SNR counts for a mic array). Once it is met, the recorder stops at the next
+    slot boundary, i.e. in the silence before the next sweep, so no sweep is cut off. The first
+    check waits for the first marker search window (one slot), so at least two sweeps are
+    usually played.
+    """
+
+    def __init__(self, alignment_engine: AlignmentEngine, deconv_engine: DeconvolutionEngine,
+                 verifier: DSPVerificationTool, bundle: ExcitationBundle, target_snr_db: float,
+                 min_sweeps: int = 1):
+        super().__init__(alignment_engine, bundle)
+        self.deconv_engine = deconv_engine
+        self.verifier = verifier
+        self.target_snr_db = target_snr_db
+        self.min_sweeps = max(1, min_sweeps)
+
+    def stop_index(self, idx_play: int) -> Optional[int]:
+        if self._stop_after is None:
+            return None
+        # First slot boundary at or after both the playback position and the last sweep used
+        pre, slot_len = self.bundle.pre_samps_settle, self.bundle.slot_len
+        slots_played = max(self._stop_after, -(-(idx_play - pre) // slot_len))
+        return min(self._total_len, pre + slots_played * slot_len)
+
+    def _on_start(self) -> None:
+        self._evaluated = 0
+        self._snr_db: Optional[float] = None
+        self._stop_after: Optional[int] = None
+
+    def _advance(self, n: int) -> None:
+        if self._stop_after is not None:
+            return
+        # Sweep windows recorded completely so far
+        complete = sum(1 for s in self._starts if s + self.capture_len <= n)
+        if complete <= self._evaluated or complete < self.min_sweeps:
+            return
+        self._evaluated = complete
+
+        avg_mic = self.alignment_engine._average_windows(self._rec_mic, self._starts[:complete], self.capture_len,
+                                                         self.bundle.slot_len, self.alignment_engine.dtype)
+        avg_mic = DSPUtils.hann_fade(avg_mic, 10.0, self.alignment_engine.fs, side="out").astype(np.float32)
+        ir_full, ir_linear = self.deconv_engine.process_ir(avg_mic, self.bundle.inv_sweep)
+        ir_full, ir_linear = np.atleast_2d(ir_full), np.atleast_2d(ir_linear)
+        self._snr_db = min(self.verifier.calculate_metrics(f, lin, self._psr)['snr_db']
+                           for f, lin in zip(ir_full, ir_linear))
+        logger.debug(f"Adaptive averaging: SNR {self._snr_db:.1f} dB after {complete} sweep(s)")
+
+        if self._snr_db >= self.target_snr_db:
+            # Index of the slot after the last sweep used
+            self._stop_after = (self._starts[complete - 1] - self._t0) // self.bundle.slot_len + 1
+
+    def _finish(self) -> Dict[str, Any]:
+        # Sweeps that made it into the recording; the stop can come a slot after the SNR check passed
+        sweeps = sum(1 for s in self._starts if s + self.capture_len <= self._total_len)
+        return {"sweeps": sweeps, "snr_db": self._snr_db, "stopped_early": self._stop_after is not None}
+
+
 # ─────────────────────────────────────────────────────────────────────────────
 #  INTERFACES
 # ─────────────────────────────────────────────────────────────────────────────
@@ -530,6 +1564,26 @@ class IAudio(ABC):
     def measure_ir(self, position: CylindricalPosition, order_id: str = "NA") -> None:
         pass
 
+    def capture_ir(self, position: CylindricalPosition, order_id: str = "NA") -> Callable[[], None]:
+        """
+        Captures the raw audio for a point and returns the remaining post-processing as a job.
+
+        The rig may move on as soon as this returns; the job can run on another thread.
+        Implementations without a separable processing stage measure synchronously.
+        """
+        self.measure_ir(position, order_id)
+        return lambda: None
+
+    def capture_duration(self) -> float:
+        """Expected time in s to capture one point, for scan time estimates. Unknown (0) by default."""
+        return 0.0
+
+    def flush(self) -> None:
+        """Blocks until all results of earlier measurements are stored. Nothing is buffered by default."""
+
+    def close(self) -> None:
+        """Releases audio hardware resources. Nothing to release by default."""
+
 
 # ─────────────────────────────────────────────────────────────────────────────
 #  ORCHESTRATOR
@@ -546,7 +1600,10 @@ class Audio(IAudio):
                  alignment_engine: AlignmentEngine,
                  deconv_engine: DeconvolutionEngine,
                  harmonic_injector: Optional[HarmonicInjector] = None,
-                 protection_filter: Optional[ProtectionFilter] = None):
+                 protection_filter: Optional[ProtectionFilter] = None,
+                 excitation_cache: Optional[ExcitationCache] = None,
+                 writer: Optional[ResultWriter] = None,
+                 output_dir: Optional[Path] = None):
 
         self.hw = hw_config
         self.cap = capture_config
@@ -557,305 +1614,492 @@ class Audio(IAudio):
         self.deconv_engine = deconv_engine
         self.harmonic_injector = harmonic_injector
         self.protection_filter = protection_filter
+        self.excitation_cache = excitation_cache if excitation_cache is not None else ExcitationCache()
         self.verifier = DSPVerificationTool(self.hw['fs'])
+        self.stream_session: Optional[AudioStreamSession] = None
+        self.writer = writer if writer is not None else ResultWriter()
 
         # Directories
-        self.rec_dir = Path("./Recordings")
-        self.rec_dir.mkdir(exist_ok=True)
-
-        self.dist_dir = Path("./Distortion")
-        self.dist_dir.mkdir(exist_ok=True)
+        output_dir = Path(output_dir) if output_dir is not None else Path(".")
+        # A multi-way speaker gets one output tree per driver, each laid out like a single driver scan
+        driver_dirs = self.driver_dirs(output_dir, self.hw)
+        self.rec_dirs = [d / "Recordings" for d in driver_dirs]
+        self.dist_dirs = [d / "Distortion" for d in driver_dirs]
+        for directory in self.rec_dirs + self.dist_dirs:
+            directory.mkdir(parents=True, exist_ok=True)
+
+        if self.cap.get('save_raw'):
+            self.raw_dir = output_dir / "RawRecordings"
+            self.raw_dir.mkdir(parents=True, exist_ok=True)
+
+        # Scan-level dataset per driver, created when the first point is stored (IR lengths are known then)
+        self.dataset_paths = [d / self.cap.get('dataset_file', 'scan.nfsd') for d in driver_dirs]
+        self.datasets: List[Optional[ScanDataset]] = [None] * len(driver_dirs)
+        self._dataset_lock = threading.Lock()
+        if self.cap.get('output_format') in ('dataset', 'both') and not self.cap.get('dataset_resume'):
+            # Refuse before the scan starts rather than when its first point is stored
+            for path in self.dataset_paths:
+                if path.exists():
+                    raise FileExistsError(f"Scan dataset {path} already exists. Move it away, or set "
+                                          f"[audio] dataset_resume = True to continue it.")
 
         if self.cap['debug_saves']:
-            self.debug_dir = self.rec_dir / "debug"
-            self.debug_dir.mkdir(exist_ok=True)
+            self.debug_dir = output_dir / "Recordings" / "debug"
+            self.debug_dir.mkdir(parents=True, exist_ok=True)
+
+        dumper = self.alignment_engine.debug_dumper
+        if dumper is not None and dumper.directory is None:
+            dumper.use_directory(output_dir / "Recordings" / "debug" / "alignment")
 
         self._log_config()
 
+    @staticmethod
+    def driver_dirs(output_dir: Path, hw: Dict[str, Any]) -> List[Path]:
+        """The output tree of every driver: output_dir itself, or output_dir/DriverN for a multi-way speaker."""
+        num_drivers = len(speaker_channels(hw))
+        return [output_dir] if num_drivers == 1 else [output_dir / f"Driver{d + 1}" for d in range(num_drivers)]
+
     def _log_config(self):
         logger.info(
             f"Audio Config: FS={self.hw['fs']}, Sweeps={self.cap['num_sweeps']}, Dur={self.cap['sweep_dur_s']}s")
         logger.info(f"Devices: In={self.hw['dev_in']}, Out={self.hw['dev_out']}")
 
-    def _get_api_name(self, dev_index: int) -> str:
+    def open_stream(self) -> None:
+        """Opens the long-lived audio stream used by every following measurement."""
+        if self.stream_session is None:
+            self.stream_session = AudioStreamSession(self.hw)
+        with span('stream_open'):
+            self.stream_session.open()
+
+    def close(self) -> None:
+        """Writes outstanding result files and closes the long-lived audio stream, if any."""
         try:
-            d = sd.query_devices(dev_index)
-            return sd.query_hostapis()[d['hostapi']]['name'].upper()
-        except:
-            return "UNKNOWN"
+            self.writer.close()
+            if self.alignment_engine.debug_dumper is not None:
+                self.alignment_engine.debug_dumper.close()
+            for dataset in self.datasets:
+                if dataset is not None:
+                    dataset.close()
+        finally:
+            if self.stream_session is not None:
+                self.stream_session.close()
+
+    def invalidate_caches(self) -> None:
+        """Drops cached excitation and deconvolution data. Call after changing sweep settings."""
+        self.excitation_cache.clear()
+        self.deconv_engine.invalidate()
+
+    def excitation_settings(self) -> Dict[str, Any]:
+        """The sweep and marker settings the excitation is built from, including changes made after start-up."""
+        return {
+            'sweep_dur_s': float(self.sweep_gen.T),
+            'sweep_level_dbfs': float(self.cap['sweep_level_dbfs']),
+            'sweep_f1': float(self.sweep_gen.f1),
+            'marker_dur_ms': float(self.marker_gen.dur_ms),
+            'marker_bw_hz': tuple(float(f) for f in self.marker_gen.bw_hz),
+            'marker_level_dbfs': float(self.marker_gen.level_dbfs),
+        }
+
+    def configure_excitation(self, **settings: Any) -> None:
+        """
+        Changes the excitation (any keys of excitation_settings) and drops the caches of the old one.
+
+        :raises KeyError: For an unknown setting.
+        """
+        unknown = set(settings) - set(self.excitation_settings())
+        if unknown:
+            raise KeyError(f"Unknown excitation setting(s): {', '.join(sorted(unknown))}")
+        if 'sweep_dur_s' in settings:
+            self.cap['sweep_dur_s'] = self.sweep_gen.T = settings['sweep_dur_s']
+        if 'sweep_level_dbfs' in settings:
+            self.cap['sweep_level_dbfs'] = self.sweep_gen.level_dbfs = settings['sweep_level_dbfs']
+        if 'sweep_f1' in settings:
+            self.sweep_gen.f1 = settings['sweep_f1']
+        if 'marker_dur_ms' in settings:
+            self.marker_gen.dur_ms = settings['marker_dur_ms']
+        if 'marker_bw_hz' in settings:
+            self.marker_gen.bw_hz = tuple(settings['marker_bw_hz'])
+        if 'marker_level_dbfs' in settings:
+            self.marker_gen.level_dbfs = settings['marker_level_dbfs']
+        self.invalidate_caches()
+
+    def _get_excitation(self) -> ExcitationBundle:
+        """Returns the playback bundle for the current sweep settings, building it only once."""
+        return self.excitation_cache.get(self.sweep_gen, self.marker_gen, self.harmonic_injector,
+                                         self.protection_filter, self.hw, self.cap)
+
+    def capture_duration(self) -> float:
+        """Length of the playback timeline of one point in s."""
+        return self._get_excitation().total_len / self.hw['fs']
 
     def _save_wav_with_metadata(self, filepath: Path, data: np.ndarray, title: str,
                                 subtype: Optional[str] = None) -> None:
-        """Saves a WAV file and embeds metadata into standard RIFF chunks."""
-        channels = data.shape[1] if len(data.shape) > 1 else 1
-
-        kwargs = {'mode': 'w', 'samplerate': self.hw['fs'], 'channels': channels}
-        if subtype:
-            kwargs['subtype'] = subtype
+        """Saves a WAV file (through the result writer) and embeds metadata into standard RIFF chunks."""
+        self.writer.write_wav(filepath, data, self.hw['fs'], title, subtype)
 
-        with sf.SoundFile(str(filepath), **kwargs) as f:
-            # f.title writes the INAM chunk
-            f.title = title
-            # f.comment writes the ICMT chunk; Windows is more likely to show this
-            f.comment = title
-            f.write(data)
+    def flush(self) -> None:
+        """Waits until all queued result files are written. Raises ResultWriteError on failures."""
+        self.writer.flush()
+        if self.alignment_engine.debug_dumper is not None:
+            self.alignment_engine.debug_dumper.flush()
 
     def _run_sweep(self) -> Dict[str, Any]:
         """
         Executes the playback and recording of the composite signal.
         Handles stream synchronization, multiple sweep averaging, and loopback alignment.
         """
-        # 1. Generate Signals
-        s_fund, phase, inv_sweep = self.sweep_gen.generate()
+        return self._align(self._capture())
 
-        s_composite = s_fund.copy()
-        if self.harmonic_injector:
-            s_composite = self.harmonic_injector.inject(s_fund, phase)
-
-        # 2. Normalize Playback Signal
-        target_amp = DSPUtils.db_to_lin(self.cap['sweep_level_dbfs'])
-        max_val = np.max(np.abs(s_composite)) + 1e-12
-        s_play = (s_composite * (target_amp / max_val)).astype(np.float32)
-
-        # Apply a 1ms Hann fade to prevent the step discontinuity "BLIP" at the end
-        s_play = DSPUtils.hann_fade(s_play, 1.0, self.hw['fs'], side="both")
-
-        # 3. Apply Protection Filter (Playback Only)
-        # This modifies what the speaker plays, but NOT the inverse filter. 
-        # The resulting IR will inherently show the rolloff of this filter.
-        if self.protection_filter:
-            s_play = self.protection_filter.apply(s_play)
-            # Re-peak to ensure we hit the target DBFS in the passband.
-            # This prevents the HPF from essentially quieting the whole sweep if fundamental is low.
-            new_max = np.max(np.abs(s_play)) + 1e-12
-            s_play *= (target_amp / new_max)
-
-        # 4. Generate Alignment Marker
-        # Goal: Generate band-limited marker. Pushing the fundamental frequency well 
-        # below the HPF ensures only phase-flipped transient edges remain for sharp alignment.
-        marker_single = self.marker_gen.generate()
-
-        # 5. Construct Stream
-        pre_samps_settle = int(round(self.cap['pre_sil_ms'] / 1000.0 * self.hw['fs']))
-        post_samps = int(round(self.cap['post_sil_ms'] / 1000.0 * self.hw['fs']))
-        sweep_len = len(s_play)
-        marker_len = len(marker_single)
-
-        # Calculate timeline
-        slot_len = max(sweep_len, marker_len) + post_samps
-        total_len = pre_samps_settle + (slot_len * self.cap['num_sweeps'])
-
-        # Pre-allocate large buffers
-        tx_sweep_long = np.zeros(total_len, dtype=np.float32)
-        tx_ref_long = np.zeros(total_len, dtype=np.float32)
+    def _capture(self, debug_tag: Optional[str] = None) -> Dict[str, Any]:
+        """
+        Plays the excitation timeline and records the raw mic and loopback channels.
+        Only the time-critical streaming part; no alignment or processing happens here.
 
-        # Populate buffers with repeated sweeps
-        cursor = pre_samps_settle
-        for _ in range(self.cap['num_sweeps']):
-            tx_sweep_long[cursor: cursor + sweep_len] = s_play
-            tx_ref_long[cursor: cursor + marker_len] = marker_single
-            cursor += slot_len
+        :param debug_tag: Alignment dump name of the point, for a capture that is aligned while recording.
+        """
+        # 1. Fetch the (cached) excitation: sweep, inverse, marker and playback timeline
+        bundle = self._get_excitation()
+        consumer = self._capture_consumer(bundle, debug_tag)
 
-        # 6. Setup Buffers & Devices
-        out_ch_count = max(self.hw['ch_out_spkr'], self.hw['ch_out_ref']) + 1
-        in_ch_count = max(self.hw['ch_in_mic'], self.hw['ch_in_loop']) + 1
+        # 2. Play & Record
+        rec_mic, rec_loop = self.play_and_record(bundle.out_frames, consumer)
+        return self._capture_result(bundle, rec_mic, rec_loop, consumer)
 
-        out_frames = np.zeros((total_len, out_ch_count), dtype=np.float32)
-        out_frames[:, self.hw['ch_out_spkr']] = tx_sweep_long
-        out_frames[:, self.hw['ch_out_ref']] = tx_ref_long
+    def play_and_record(self, out_frames: np.ndarray,
+                        consumer: Optional[CaptureConsumer] = None) -> Tuple[np.ndarray, np.ndarray]:
+        """
+        Plays device frames and records the mic and loopback channels, through the long-lived
+        stream or a stream opened just for this call. Also used for noise and probe recordings.
 
-        rec_loop = np.zeros(total_len, dtype=np.float32)
-        rec_mic = np.zeros(total_len, dtype=np.float32)
+        :param out_frames: (n_samples, n_out_channels) playback timeline.
+        :return: Recorded mic ((n_mics, n_samples) for a mic array) and loopback signals.
+        """
+        if self.stream_session is not None and self.stream_session.is_open:
+            return self.stream_session.play_and_record(out_frames, consumer)
+        session = AudioStreamSession(self.hw)
+        with span('stream_open'):
+            session.open()
+        try:
+            return session.play_and_record(out_frames, consumer)
+        finally:
+            session.close()
 
-        out_api = self._get_api_name(self.hw['dev_out'])
-        in_api = self._get_api_name(self.hw['dev_in'])
-        use_asio_in, use_asio_out = ("ASIO" in in_api), ("ASIO" in out_api)
+    def _capture_consumer(self, bundle: ExcitationBundle,
+                          debug_tag: Optional[str] = None) -> Optional[CaptureConsumer]:
+        """
+        The worker to run during capture: a streaming deconvolver or an adaptive averaging monitor, if enabled.
 
-        # Configure SoundDevice Settings (ASIO vs WASAPI logic)
-        if use_asio_in:
-            in_args = (2, sd.AsioSettings(channel_selectors=[self.hw['ch_in_loop'], self.hw['ch_in_mic']]))
-        else:
-            in_args = (in_ch_count,
-                       sd.WasapiSettings(exclusive=self.hw['wasapi_exclusive']) if "WASAPI" in in_api else None)
+        Only the streaming deconvolver dumps its marker detections; an adaptive capture is aligned
+        (and dumped) afterwards by _align.
+        """
+        if self.cap.get('streaming_deconvolution'):
+            return StreamingDeconvolver(self.alignment_engine, self.deconv_engine, bundle,
+                                        keep_slices=self.cap['debug_saves'], debug_tag=debug_tag)
+        if self.cap.get('adaptive_snr_db') is not None:
+            return AdaptiveAveragingMonitor(self.alignment_engine, self.deconv_engine, self.verifier, bundle,
+                                            self.cap['adaptive_snr_db'], self.cap.get('min_sweeps', 1))
+        return None
 
-        if use_asio_out:
-            out_args = (2, sd.AsioSettings(channel_selectors=[self.hw['ch_out_spkr'], self.hw['ch_out_ref']]))
-        else:
-            out_args = (out_ch_count,
-                        sd.WasapiSettings(exclusive=self.hw['wasapi_exclusive']) if "WASAPI" in out_api else None)
-
-        idx_play, idx_rec = 0, 0
-        done_evt = threading.Event()
-
-        # Real-time Callback
-        def callback(indata, outdata, frames, time_info, status):
-            nonlocal idx_play, idx_rec
-            if status:
-                logger.warning(f"Audio Status: {status}")
-
-            # Output
-            n_out = min(frames, total_len - idx_play)
-            if use_asio_out:
-                outdata[:n_out, 0] = out_frames[idx_play:idx_play + n_out, self.hw['ch_out_spkr']]
-                outdata[:n_out, 1] = out_frames[idx_play:idx_play + n_out, self.hw['ch_out_ref']]
-                if frames > n_out:
-                    outdata[n_out:] = 0
-            else:
-                outdata[:n_out, :out_args[0]] = out_frames[idx_play:idx_play + n_out, :out_args[0]]
-                if frames > n_out:
-                    outdata[n_out:] = 0
-
-            # Input
-            n_in = min(frames, total_len - idx_rec)
-            if n_in > 0:
-                if use_asio_in:
-                    rec_loop[idx_rec:idx_rec + n_in] = indata[:n_in, 0]
-                    rec_mic[idx_rec:idx_rec + n_in] = indata[:n_in, 1]
-                else:
-                    rec_loop[idx_rec:idx_rec + n_in] = indata[:n_in, self.hw['ch_in_loop']]
-                    rec_mic[idx_rec:idx_rec + n_in] = indata[:n_in, self.hw['ch_in_mic']]
-
-            idx_play += n_out
-            idx_rec += n_in
-            if idx_play >= total_len and idx_rec >= total_len:
-                done_evt.set()
-
-        # 7. Start Stream
-        with sd.Stream(device=(self.hw['dev_in'], self.hw['dev_out']), samplerate=self.hw['fs'],
-                       blocksize=self.hw['blocksize'],
-                       dtype="float32", channels=(in_args[0], out_args[0]), dither_off=True,
-                       extra_settings=(in_args[1], out_args[1]), callback=callback):
-            done_evt.wait()
-
-        avg_mic, avg_loop, mic_slices, psr = self.alignment_engine.sync_and_average(
-            rec_mic, rec_loop, marker_single, pre_samps_settle, slot_len, sweep_len
-        )
+    @staticmethod
+    def _capture_result(bundle: ExcitationBundle, rec_mic: np.ndarray, rec_loop: np.ndarray,
+                        consumer: Optional[CaptureConsumer]) -> Dict[str, Any]:
+        capture = {"bundle": bundle, "rec_mic": rec_mic, "rec_loop": rec_loop}
+        if isinstance(consumer, StreamingDeconvolver):
+            capture["streamed"] = consumer
+        elif isinstance(consumer, AdaptiveAveragingMonitor):
+            summary = consumer.result()
+            snr = "n/a" if summary["snr_db"] is None else f"{summary['snr_db']:.1f} dB"
+            logger.info(f"Adaptive averaging: {summary['sweeps']} sweep(s) used, SNR {snr}"
+                        f"{'' if summary['stopped_early'] else ' (target not reached)'}")
+            capture["sweeps_used"] = summary["sweeps"]
+        return capture
+
+    def _align(self, capture: Dict[str, Any], point_name: Optional[str] = None) -> Dict[str, Any]:
+        """Aligns and averages the sweeps of a raw capture."""
+        bundle = capture["bundle"]
+        dumper = self.alignment_engine.debug_dumper
+        debug_tag = dumper.select(point_name) if (dumper is not None and point_name) else None
+        if bundle.overlapped:
+            return self._align_overlapped(capture, debug_tag)
+        with span('sync_and_average'):
+            avg_mic, avg_loop, mic_slices, psr = self.alignment_engine.sync_and_average(
+                capture["rec_mic"], capture["rec_loop"], bundle.marker, bundle.pre_samps_settle, bundle.slot_len,
+                bundle.sweep_len, keep_slices=self.cap['debug_saves'], debug_tag=debug_tag
+            )
 
         return {
-            "inv_sweep": inv_sweep,
-            "tx_ref_signal": tx_ref_long[:len(avg_mic)],
+            "inv_sweep": bundle.inv_sweep,
+            "tx_ref_signal": bundle.tx_ref_long[:avg_mic.shape[-1]],
             "rx_mic_conditioned": avg_mic,
             "rx_loop_aligned": avg_loop,
             "debug_mic_slices": mic_slices,
             "psr": psr
         }
 
+    def _align_overlapped(self, capture: Dict[str, Any], debug_tag: Optional[str]) -> Dict[str, Any]:
+        """
+        Aligns a capture of overlapped sweeps. Their windows overlap, so they cannot be averaged
+        before deconvolution; the sweeps are deconvolved together and their IRs averaged instead.
+        """
+        bundle = capture["bundle"]
+        rec_mic, rec_loop = capture["rec_mic"], capture["rec_loop"]
+        capture_len = self.alignment_engine.capture_len(bundle.sweep_len)
+        # Window of one slot: the staggered sweeps of all drivers
+        slot_window = bundle.driver_offsets[-1] + capture_len
+        with span('sync_and_average'):
+            starts, psr = self.alignment_engine.locate_sweeps(rec_loop, bundle.marker, bundle.pre_samps_settle,
+                                                              bundle.slot_len, slot_window, debug_tag=debug_tag)
+        with span('process_ir'):
+            ir_full, ir_linear = self.deconv_engine.process_overlapped(
+                rec_mic, bundle.inv_sweep, starts, capture_len, bundle.ir_frame_len, bundle.harmonic_len,
+                bundle.playback_gain, bundle.driver_offsets)
+
+        segment = slice(starts[0], starts[-1] + slot_window)
+        return {
+            "inv_sweep": bundle.inv_sweep,
+            "tx_ref_signal": bundle.tx_ref_long[segment],
+            "rx_mic_conditioned": rec_mic[..., segment],
+            "rx_loop_aligned": rec_loop[segment],
+            "debug_mic_slices": [rec_mic[..., s: s + slot_window] for s in starts] if self.cap['debug_saves'] else [],
+            "psr": psr,
+            "ir_full": ir_full,
+            "ir_linear": ir_linear,
+        }
+
     def measure_ir(self, position: CylindricalPosition, order_id: str = "NA") -> None:
         """
         Public entry point. Coordinates capture, processing, and file saving.
         """
+        self.capture_ir(position, order_id)()
+
+    def capture_ir(self, position: CylindricalPosition, order_id: str = "NA") -> Callable[[], None]:
+        """
+        Runs the sweeps for a point and returns a job that aligns, deconvolves, verifies and saves them.
+        """
         logger.info(f"Measuring IR at {position} (ID: {order_id})")
 
+        # A streamed capture is aligned while recording, so its point is selected for dumping now
+        debug_tag = None
+        dumper = self.alignment_engine.debug_dumper
+        if dumper is not None and self.cap.get('streaming_deconvolution'):
+            base_name, _, _ = DSPUtils.ir_file_names(
+                position.r(), position.t(), position.z(), order_id, self.cap.get('naming_convention'))
+            debug_tag = dumper.select(base_name)
+
         # 1. Capture Raw Data (Run Sweeps)
-        result = self._run_sweep()
-
-        # 2. Filename formatting
-        if self.cap.get('naming_convention') == 'tom':
-            # tom's Format: (r, t, z).wav
-            base_name = f"({position.r():.1f}, {position.t():.1f}, {position.z():.1f})"
-            main_file_name = f"{base_name}.wav"
-            dist_file_name = f"{base_name}_dist.wav"
+        with span('capture'):
+            capture = self._capture(debug_tag)
+        capture["timestamp"] = time.time()
+        # The stage timings of this point, for the post-processing that may run on another thread.
+        # The job holds the point until it has run.
+        point = current_point()
+        if point is not None:
+            point.hold()
+        capture["timings"] = point
+        return functools.partial(self._process_capture, capture, position, order_id)
+
+    def _process_capture(self, capture: Dict[str, Any], position: CylindricalPosition,
+                         order_id: str) -> List[Dict[str, float]]:
+        """
+        Post-processing half of measure_ir. Safe to run off the measurement thread.
+
+        With a mic array all channels are deconvolved in one batch and every channel is stored as
+        its own point, at the arm position plus the mic's radial offset. With several drivers every
+        driver's IRs are stored in that driver's output tree.
+
+        :return: The DSP verification metrics, one entry per driver and mic (driver-major).
+        """
+        point = capture.get("timings")
+        try:
+            with recording(point):
+                metrics = self._post_process(capture, position, order_id)
+            if point is not None:
+                point.metrics = metrics
+            return metrics
+        finally:
+            if point is not None:
+                point.release()
+
+    def _post_process(self, capture: Dict[str, Any], position: CylindricalPosition,
+                      order_id: str) -> List[Dict[str, float]]:
+        # 1. Filename formatting (arm position; names the raw capture and debug files)
+        base_name, _, _ = DSPUtils.ir_file_names(
+            position.r(), position.t(), position.z(), order_id, self.cap.get('naming_convention'))
+
+        # Keep the untouched recordings so the point can be reprocessed offline (see nfs.reprocess)
+        if self.cap.get('save_raw'):
+            self._save_raw_capture(self.raw_dir / f"{base_name}_raw.npz", capture, position, order_id)
+
+        # 2. Align & Average (already done, together with the deconvolution, when streamed)
+        if "streamed" in capture:
+            result = capture["streamed"].result()
         else:
-            # dimitri's Format: ID_rX_phY_zZ_ir.wav
-            base_name = (
-                f"{order_id}_"
-                f"r{DSPUtils.fmt_num_for_name(position.r())}_"
-                f"ph{DSPUtils.fmt_num_for_name(position.t())}_"
-                f"z{DSPUtils.fmt_num_for_name(position.z())}"
-            )
-            main_file_name = f"{base_name}_ir.wav"
-            dist_file_name = f"{base_name}_ir_dist.wav"
+            result = self._align(capture, base_name)
 
         # 3. Debug Saves (Optional - write intermediate files)
         if self.cap['debug_saves']:
             logger.info("Saving debug artifacts...")
             self._save_wav_with_metadata(self.debug_dir / f"{base_name}_mic_conditioned.wav",
-                                         result["rx_mic_conditioned"], f"{base_name}_mic_conditioned.wav")
+                                         result["rx_mic_conditioned"].T, f"{base_name}_mic_conditioned.wav")
             self._save_wav_with_metadata(self.debug_dir / f"{base_name}_loop_aligned.wav", result["rx_loop_aligned"],
                                          f"{base_name}_loop_aligned.wav")
             for i, slice_data in enumerate(result["debug_mic_slices"]):
                 filename = f"{base_name}_sweep{i + 1:02d}.wav"
-                self._save_wav_with_metadata(self.debug_dir / filename, slice_data, filename)
+                self._save_wav_with_metadata(self.debug_dir / filename, slice_data.T, filename)
 
-        # 4. Process IR (Deconvolution)
-        ir_full, ir_linear = self.deconv_engine.process_ir(result["rx_mic_conditioned"], result["inv_sweep"])
+        # 4. Process IR (Deconvolution, batched over all mics)
+        if "ir_full" in result:
+            ir_full, ir_linear = result["ir_full"], result["ir_linear"]
+        else:
+            with span('process_ir'):
+                ir_full, ir_linear = self.deconv_engine.process_ir(result["rx_mic_conditioned"], result["inv_sweep"])
+        mic_positions = self.mic_positions(position)
+        num_drivers = len(capture["bundle"].driver_offsets)
+        ir_full = ir_full.reshape(num_drivers, len(mic_positions), -1)
+        ir_linear = ir_linear.reshape(num_drivers, len(mic_positions), -1)
+
+        # 5. & 6. Verify and store every mic (of every driver) as its own point
+        return [self._verify_and_store(capture, mic_position, order_id, ir_full[d, i], ir_linear[d, i],
+                                       result.get("psr", 0.0), driver=d)
+                for d in range(num_drivers) for i, mic_position in enumerate(mic_positions)]
+
+    def mic_positions(self, position: CylindricalPosition) -> List[CylindricalPosition]:
+        """Positions of the mics for the given arm position, in mic channel order."""
+        offsets = self.cap.get('mic_offsets_mm') or [0.0] * len(mic_channels(self.hw))
+        return [position if dr == 0 else CylindricalPosition(position.r() + dr, position.t(), position.z())
+                for dr in offsets]
+
+    def _verify_and_store(self, capture: Dict[str, Any], position: CylindricalPosition, order_id: str,
+                          ir_full: np.ndarray, ir_linear: np.ndarray, psr: float, driver: int = 0) -> Dict[str, float]:
+        """Calculates the metrics of one mic's IR (of one driver) and saves it."""
+        base_name, main_file_name, dist_file_name = DSPUtils.ir_file_names(
+            position.r(), position.t(), position.z(), order_id, self.cap.get('naming_convention'))
+        driver_label = f" (driver {driver + 1})" if len(self.rec_dirs) > 1 else ""
 
         # 5. DSP Verification
-        metrics = self.verifier.calculate_metrics(ir_full, ir_linear, result.get("psr", 0.0))
+        with span('calculate_metrics'):
+            metrics = self.verifier.calculate_metrics(ir_full, ir_linear, psr)
         logger.info(
-            f"DSP Metrics: SNR={metrics['snr_db']:.1f}dB, THD={metrics['thd_pct']:.2f}%, PSR={metrics['psr']:.1f}")
+            f"DSP Metrics{driver_label}: SNR={metrics['snr_db']:.1f}dB, THD={metrics['thd_pct']:.2f}%, PSR={metrics['psr']:.1f}")
 
         warnings = self.verifier.verify(metrics)
         for w in warnings:
             logger.warning(f"VERIFICATION FAILURE: {w}")
 
         # 6. Save Final Files
-        # Main (Linear)
-        linear_path = self.rec_dir / main_file_name
-        self._save_wav_with_metadata(linear_path, ir_linear, main_file_name, subtype='FLOAT')
-        logger.info(f"Saved Linear IR: {linear_path.name}")
-
-        # Secondary (Distortion)
-        dist_path = self.dist_dir / dist_file_name
-        self._save_wav_with_metadata(dist_path, ir_full, dist_file_name, subtype='FLOAT')
-        logger.info(f"Saved Distortion IR: {dist_path.name}")
+        output_format = self.cap.get('output_format', 'wav')
+        if output_format in ('wav', 'both'):
+            # Main (Linear)
+            linear_path = self.rec_dirs[driver] / main_file_name
+            self._save_wav_with_metadata(linear_path, ir_linear, main_file_name, subtype='FLOAT')
+            logger.info(f"Saved Linear IR: {linear_path.name}")
+
+            # Secondary (Distortion)
+            dist_path = self.dist_dirs[driver] / dist_file_name
+            self._save_wav_with_metadata(dist_path, ir_full, dist_file_name, subtype='FLOAT')
+            logger.info(f"Saved Distortion IR: {dist_path.name}")
+
+        if output_format in ('dataset', 'both'):
+            dataset = self._get_dataset(len(ir_linear), len(ir_full), list(metrics), driver)
+            timestamp = capture.get("timestamp")
+            self.writer.submit(dataset.path, lambda _: dataset.append(position, order_id, ir_linear, ir_full,
+                                                                      metrics, timestamp))
+            logger.info(f"Stored IR of {base_name} in {dataset.path.name}")
 
         # Save metrics to debug if enabled
         if self.cap['debug_saves']:
-            try:
-                import json
-                with open(self.debug_dir / f"{base_name}_metrics.json", "w") as f:
-                    json.dump(metrics, f, indent=4)
-            except Exception as e:
-                logger.warning(f"Failed to save metrics JSON: {e}")
-
-
-class MockInterfaceAudio(Audio):
-    """Digital Twin loopback simulating hardware latency and filters."""
-
-    def _run_sweep(self) -> Dict[str, Any]:
-        # 1. Generate Signals (Identical to standard Audio class)
-        s_fund, phase, inv_sweep = self.sweep_gen.generate()
-
-        s_composite = s_fund.copy()
-        if self.harmonic_injector:
-            s_composite = self.harmonic_injector.inject(s_fund, phase)
+            driver_tag = f"_driver{driver + 1}" if driver_label else ""
+            self.writer.write_json(self.debug_dir / f"{base_name}{driver_tag}_metrics.json", metrics)
 
-        target_amp = DSPUtils.db_to_lin(self.cap['sweep_level_dbfs'])
-        max_val = np.max(np.abs(s_composite)) + 1e-12
-        s_play = (s_composite * (target_amp / max_val)).astype(np.float32)
-
-        # Apply a 1ms Hann fade to prevent the step discontinuity "BLIP" at the end
-        s_play = DSPUtils.hann_fade(s_play, 1.0, self.hw['fs'], side="both")
+        return metrics
 
-        if self.protection_filter:
-            s_play = self.protection_filter.apply(s_play)
-            new_max = np.max(np.abs(s_play)) + 1e-12
-            s_play *= (target_amp / new_max)
+    def _get_dataset(self, ir_linear_len: int, ir_full_len: int, metric_names: List[str],
+                     driver: int = 0) -> ScanDataset:
+        """
+        Creates the driver's scan dataset on first use. With dataset_resume an existing file from an
+        interrupted run is continued instead.
+        """
+        with self._dataset_lock:
+            if self.datasets[driver] is None:
+                open_dataset = ScanDataset.open_or_create if self.cap.get('dataset_resume') else ScanDataset.create
+                self.datasets[driver] = open_dataset(
+                    self.dataset_paths[driver], self.hw['fs'], ir_linear_len, ir_full_len, metric_names,
+                    self.dataset_attrs(driver))
+            return self.datasets[driver]
+
+    def dataset_attrs(self, driver: int = 0) -> Dict[str, Any]:
+        """Scan settings stored in the header of the driver's dataset."""
+        attrs = {k: self.cap.get(k) for k in ('naming_convention', 'sweep_dur_s', 'sweep_level_dbfs', 'num_sweeps')}
+        if len(self.datasets) > 1:
+            attrs['driver'] = driver + 1
+            attrs['out_ch_spkr'] = speaker_channels(self.hw)[driver]
+        return attrs
+
+    def _save_raw_capture(self, filepath: Path, capture: Dict[str, Any], position: CylindricalPosition,
+                          order_id: str) -> None:
+        """
+        Stores the raw mic and loopback recordings together with the timeline and the excitation
+        settings they were captured with.
+        """
+        bundle = capture["bundle"]
+        # The excitation may differ from the config file (e.g. a sweep chosen by the sweep planner)
+        excitation = {f'excitation_{k}': np.asarray(v, dtype=np.float64)
+                      for k, v in self.excitation_settings().items()}
+        arrays = {
+            'rec_mic': capture["rec_mic"],
+            'rec_loop': capture["rec_loop"],
+            'fs': np.int64(self.hw['fs']),
+            'num_sweeps': np.int64(self.cap['num_sweeps']),
+            'pre_samps_settle': np.int64(bundle.pre_samps_settle),
+            'slot_len': np.int64(bundle.slot_len),
+            'sweep_len': np.int64(bundle.sweep_len),
+            'position': np.array([position.r(), position.t(), position.z()]),
+            'order_id': np.str_(order_id),
+            'timestamp': np.float64(capture.get("timestamp", np.nan)),
+            **excitation,
+        }
+        self.writer.submit(filepath, lambda p: np.savez(p, **arrays))
 
-        marker_single = self.marker_gen.generate()
 
-        # 2. Construct Stream Timelines
-        pre_samps_settle = int(round(self.cap['pre_sil_ms'] / 1000.0 * self.hw['fs']))
-        post_samps = int(round(self.cap['post_sil_ms'] / 1000.0 * self.hw['fs']))
-        sweep_len = len(s_play)
-        marker_len = len(marker_single)
+class MockInterfaceAudio(Audio):
+    """
+    Digital Twin loopback simulating hardware latency and filters.
 
-        slot_len = max(sweep_len, marker_len) + post_samps
-        total_len = pre_samps_settle + (slot_len * self.cap['num_sweeps'])
+    The simulated hardware (CS4272 FIR, 15 Hz HPF and 20 ms latency) is linear and time-invariant,
+    so it is reduced to one impulse response, built once and applied by FFT convolution. The
+    noiseless response to the cached excitation is cached as well; a capture then only adds a
+    window of a seeded noise bank, which also makes mock scans reproducible.
 
-        tx_sweep = np.zeros(total_len, dtype=np.float32)
-        tx_ref = np.zeros(total_len, dtype=np.float32)
+    With a virtual source the mics no longer hear the loopback directly: the speaker signal is
+    filtered by the source's transfer function to every mic position of the point being
+    measured, which gives position dependent data for load tests of whole scans.
 
-        cursor = pre_samps_settle
-        for _ in range(self.cap['num_sweeps']):
-            tx_sweep[cursor: cursor + sweep_len] = s_play
-            tx_ref[cursor: cursor + marker_len] = marker_single
-            cursor += slot_len
+    In real-time mode a capture takes as long as playing its timeline would, and the recording is
+    handed to a capture consumer at the pace of the audio callback. Together with a simulated
+    GRBL controller this runs whole scans with the timing of the rig.
+    """
 
-        # 3. --- HARDWARE SIMULATION (The Loopback) ---
-        fs = self.hw['fs']
+    noise_rms = 1e-5  # -100 dBFS noise floor
+
+    def __init__(self, *args, noise_seed: Optional[int] = 0, virtual_source: Optional[VirtualSource] = None,
+                 realtime: bool = False, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.virtual_source = virtual_source
+        self.realtime = realtime
+        self._position: Optional[CylindricalPosition] = None
+        # (bundle, spectrum of the speaker response) for the virtual source
+        self._speaker_spectrum: Optional[Tuple[ExcitationBundle, np.ndarray]] = None
+        self._rng = np.random.default_rng(noise_seed)
+        self._noise_bank: Optional[np.ndarray] = None
+        self._system_ir = self.system_ir(self.hw['fs'])
+        # Nfft -> rfft of the system IR, least recently used first
+        self._system_spectra: "OrderedDict[int, np.ndarray]" = OrderedDict()
+        # (bundle, speaker response, loopback response) of the last excitation played
+        self._clean_response: Optional[Tuple[ExcitationBundle, np.ndarray, np.ndarray]] = None
 
+    @staticmethod
+    def system_ir(fs: int) -> np.ndarray:
+        """Impulse response of the simulated playback and recording chain."""
         # A) CS4272 Simulation: 25-tap FIR filter
         # We use a stable windowed-sinc filter at ~21kHz. 
         # This safely rolls off near Nyquist and provides the exact 12-sample 
@@ -872,49 +2116,139 @@ class MockInterfaceAudio(Audio):
         #  fir_taps = np.array([1.0], dtype=np.float32)
 
         # B) 15Hz 1st-Order HPF (10k Ohm + 10uF RC circuit)
+        # Its tail decays with tau = 1 / (2 * pi * 15 Hz); after 25 tau it is below -200 dB
         hpf_sos = scipy.signal.butter(1, 15.0, btype='hp', fs=fs, output='sos')
-
-        def apply_hardware_sim(sig: np.ndarray) -> np.ndarray:
-            # 1. Add Padding: Append 100 samples of silence to the end 
-            # This prevents the FIR filter from "slamming" into the end of the array
-            padding_len = 100
-            sig_padded = np.concatenate([sig, np.zeros(padding_len)])
-
-            # 2. Apply Digital FIR (Linear Phase, 12-sample group delay)
-            # Now the "ringing" has room to decay into the padding
-            y_padded = scipy.signal.lfilter(fir_taps, 1.0, sig_padded)
-
-            # 3. Trim: Remove the padding to return to original length
-            y = y_padded[:len(sig)]
-
-            # 4. Apply Analog HPF (Minimum Phase)
-            y = scipy.signal.sosfilt(hpf_sos, y)
-
-            # 5. Apply 20ms Latency (Linear shift)
-            delay_samps = int(0.020 * fs)
-            y = np.concatenate([np.zeros(delay_samps), y[:-delay_samps]])
-
-            # 6. Add Noise Floor (-100dBFS)
-            noise = np.random.normal(0, 1e-5, len(y))
-            return (y + noise).astype(np.float32)
-
+        impulse = np.zeros(len(fir_taps) + int(np.ceil(25 * fs / (2 * np.pi * 15.0))))
+        impulse[0] = 1.0
+        h = scipy.signal.sosfilt(hpf_sos, scipy.signal.lfilter(fir_taps, 1.0, impulse))
+
+        # C) 20ms Latency (Linear shift)
+        delay_samps = int(0.020 * fs)
+        return np.concatenate([np.zeros(delay_samps), h])
+
+    def invalidate_caches(self) -> None:
+        super().invalidate_caches()
+        self._clean_response = None
+        self._speaker_spectrum = None
+
+    def capture_ir(self, position: CylindricalPosition, order_id: str = "NA") -> Callable[[], None]:
+        # The virtual source needs to know where the mics are
+        self._position = position
+        return super().capture_ir(position, order_id)
+
+    def _capture(self, debug_tag: Optional[str] = None) -> Dict[str, Any]:
+        started = time.perf_counter()
+        # 1. Fetch the (cached) excitation, identical to the standard Audio class
+        bundle = self._get_excitation()
+
+        # 2. --- HARDWARE SIMULATION (The Loopback) ---
         logger.info("► Loopback Mode: Applying CS4272 FIR, 15Hz HPF, and 20ms delay.")
-        rec_mic = apply_hardware_sim(tx_sweep)
-        rec_loop = apply_hardware_sim(tx_ref)
+        if self._clean_response is None or self._clean_response[0] is not bundle:
+            # A multi-way speaker: the mic hears the sum of all drivers
+            speaker_out = np.atleast_2d(bundle.tx_sweep_long).sum(axis=0, dtype=np.float64)
+            speaker_rec, loop_rec = self._apply_system(np.stack([speaker_out, bundle.tx_ref_long]))
+            self._clean_response = (bundle, speaker_rec, loop_rec)
+        _, speaker_rec, loop_rec = self._clean_response
+        if self.virtual_source is not None and self._position is not None:
+            speaker_rec = self._radiate(bundle, speaker_rec, self.mic_positions(self._position))
+        rec_mic, rec_loop = self._add_noise(speaker_rec, loop_rec)
+
+        consumer = self._capture_consumer(bundle, debug_tag)
+        if consumer is not None:
+            # Hand the recording over in callback-sized blocks, as the stream session would
+            consumer.start(rec_mic, rec_loop)
+            blocksize = self.hw['blocksize']
+            for n_recorded in range(blocksize, len(rec_loop) + blocksize, blocksize):
+                n_recorded = min(n_recorded, len(rec_loop))
+                self._pace(started, n_recorded)
+                consumer.feed(n_recorded)
+                if isinstance(consumer, AdaptiveAveragingMonitor):
+                    # The simulated recorder keeps pace with the monitor, so an early stop is deterministic
+                    consumer.wait_until(n_recorded)
+                    stop_at = consumer.stop_index(n_recorded)
+                    if stop_at is not None:
+                        consumer.end(stop_at)
+                        rec_mic, rec_loop = rec_mic[..., :stop_at], rec_loop[:stop_at]
+                        break
+        self._pace(started, len(rec_loop))
+        return self._capture_result(bundle, rec_mic, rec_loop, consumer)
+
+    def play_and_record(self, out_frames: np.ndarray,
+                        consumer: Optional[CaptureConsumer] = None) -> Tuple[np.ndarray, np.ndarray]:
+        """Simulates playing the frames through the loopback; the consumer is not used."""
+        started = time.perf_counter()
+        speaker_out = out_frames[:, speaker_channels(self.hw)].sum(axis=1, dtype=np.float64)
+        recording = self._simulate_loopback(speaker_out, out_frames[:, self.hw['ch_out_ref']])
+        self._pace(started, len(out_frames))
+        return recording
+
+    def _pace(self, started: float, n_samples: int) -> None:
+        """In real-time mode, waits until n_samples could have been recorded since started."""
+        if self.realtime:
+            remaining = started + n_samples / self.hw['fs'] - time.perf_counter()
+            if remaining > 0:
+                time.sleep(remaining)
+
+    def _simulate_loopback(self, speaker_out: np.ndarray, ref_out: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+        """Returns what the mic(s) and the loopback input record for the given speaker and reference signals."""
+        speaker_rec, loop_rec = self._apply_system(np.stack([speaker_out, ref_out]))
+        return self._add_noise(speaker_rec, loop_rec)
+
+    def _apply_system(self, sig: np.ndarray) -> np.ndarray:
+        """Causal response of the simulated hardware to each row of sig, cut to the length of sig."""
+        n = sig.shape[-1]
+        Nfft = FFT.fast_len(n + len(self._system_ir) - 1)
+        H = self._system_spectra.get(Nfft)
+        if H is None:
+            H = self._system_spectra[Nfft] = FFT.rfft(self._system_ir, n=Nfft)
+            while len(self._system_spectra) > 4:
+                self._system_spectra.popitem(last=False)
+        else:
+            self._system_spectra.move_to_end(Nfft)
+        Y = FFT.rfft(np.asarray(sig, dtype=np.float64), n=Nfft)
+        Y *= H
+        return FFT.irfft(Y, n=Nfft, overwrite_x=True)[..., :n].astype(np.float32)
 
-        # 4. --- ALIGNMENT & DECONVOLUTION ---
-        avg_mic, avg_loop, mic_slices, psr = self.alignment_engine.sync_and_average(
-            rec_mic, rec_loop, marker_single, pre_samps_settle, slot_len, sweep_len
-        )
+    def _radiate(self, bundle: ExcitationBundle, speaker_rec: np.ndarray,
+                 positions: List[CylindricalPosition]) -> np.ndarray:
+        """
+        Pressure of the virtual source at every mic position, as (n_mics, n_samples).
 
-        return {
-            "inv_sweep": inv_sweep,
-            "tx_ref_signal": tx_ref[:len(avg_mic)],
-            "rx_mic_conditioned": avg_mic,
-            "rx_loop_aligned": avg_loop,
-            "debug_mic_slices": mic_slices,
-            "psr": psr
-        }
+        The speaker response is transformed once per excitation; a point then costs one transfer
+        function evaluation and one inverse transform per mic. The transform is padded by 100 ms,
+        room for the propagation delay over 34 m.
+        """
+        fs = self.hw['fs']
+        n = speaker_rec.shape[-1]
+        Nfft = FFT.fast_len(n + fs // 10)
+        if self._speaker_spectrum is None or self._speaker_spectrum[0] is not bundle:
+            self._speaker_spectrum = (bundle, FFT.rfft(speaker_rec.astype(np.float64), n=Nfft))
+        H = self.virtual_source.frequency_response_at(positions, FFT.rfftfreq(Nfft, 1.0 / fs))
+        H *= self._speaker_spectrum[1]
+        return FFT.irfft(H, n=Nfft, overwrite_x=True)[..., :n].astype(np.float32)
+
+    def _add_noise(self, speaker_rec: np.ndarray, loop_rec: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+        """Adds the noise floor; every mic of an array gets its own noise. speaker_rec may hold one row per mic."""
+        num_mics = len(mic_channels(self.hw))
+        n = len(loop_rec)
+        noise = self._noise_block((num_mics + 1) * n).reshape(num_mics + 1, n)
+        rec_mic = noise[:num_mics] + speaker_rec
+        rec_loop = noise[num_mics] + loop_rec
+        return (rec_mic if num_mics > 1 else rec_mic[0]), rec_loop
+
+    def _noise_block(self, size: int) -> np.ndarray:
+        """
+        Returns `size` samples of the noise floor: a window at a random offset into a noise bank
+        drawn once (and redrawn larger when needed). Drawing Gaussian noise costs more than the
+        rest of a simulated capture.
+        """
+        bank = self._noise_bank
+        if bank is None or len(bank) < 2 * size:
+            bank = self._rng.standard_normal(4 * size, dtype=np.float32)
+            bank *= self.noise_rms
+            self._noise_bank = bank
+        offset = int(self._rng.integers(0, len(bank) - size + 1))
+        return bank[offset:offset + size]
 
 
 # ─────────────────────────────────────────────────────────────────────────────
@@ -936,6 +2270,9 @@ class AudioFactory:
     def _get_required_config(config: configparser.ConfigParser, section: str, key: str, type_func):
         if not config.has_option(section, key):
             raise KeyError(f"Missing required config: [{section}] {key}")
+        if type_func is bool:
+            # bool('False') is True; accept the usual true/false spellings and reject anything else
+            return config.getboolean(section, key)
         val = config.get(section, key).split('#')[0].split(';')[0].strip()
         return type_func(val)
 
@@ -965,6 +2302,61 @@ class AudioFactory:
             except ValueError:
                 pass  # Fallback
 
+        kwargs = AudioFactory._build_components(config, audio_section)
+
+        # Route to the correct class based on mode
+        if mode == 'mock_interface':
+            # Seeded noise makes mock scans reproducible; 'None' draws a fresh seed
+            seed = config.get(audio_section, 'mock_noise_seed', fallback='0').strip()
+            # Optional: a simulated speaker, so every position records different data
+            source_section = config.get(audio_section, 'virtual_source', fallback='').strip()
+            source = VirtualSourceFactory.create(config_file, source_section) if source_section else None
+            return MockInterfaceAudio(**kwargs, noise_seed=None if seed.lower() == 'none' else int(seed),
+                                      virtual_source=source,
+                                      realtime=config.getboolean(audio_section, 'mock_realtime', fallback=False))
+
+        audio = Audio(**kwargs)
+        # Keep one stream running for the whole session instead of reopening it per point
+        if config.getboolean(audio_section, 'persistent_stream', fallback=True):
+            audio.open_stream()
+        return audio
+
+    @staticmethod
+    def create_components(config_file: str, audio_section: str = 'audio') -> Dict[str, Any]:
+        """
+        Builds the Audio constructor arguments (configs, generators and engines) without creating
+        an Audio instance or touching the audio hardware. Used for offline reprocessing.
+        """
+        config = configparser.ConfigParser(inline_comment_prefixes=('#', ';'))
+        config.read(config_file)
+
+        if not config.has_section(audio_section):
+            raise KeyError(f"Config file missing [{audio_section}] section")
+
+        return AudioFactory._build_components(config, audio_section)
+
+    @staticmethod
+    def check_sweep_layout(cap_config: Dict[str, Any], hw_config: Dict[str, Any], audio_section: str = 'audio',
+                           sweep_section: str = 'sweep') -> None:
+        """
+        Checks the driver channels and the spacing of overlapped or staggered sweeps against the
+        sweep settings. Also used when the sweep is changed after start-up (SweepPlanner).
+
+        :raises ValueError: If the settings do not fit together.
+        """
+        drivers = speaker_channels(hw_config)
+        if len(set(drivers + [hw_config['ch_out_ref']])) != len(drivers) + 1:
+            raise ValueError(f"[{audio_section}] out_ch_spkr channels must be distinct and differ from out_ch_ref")
+        if cap_config['overlapped_sweeps'] or len(drivers) > 1:
+            # Overlapped and staggered sweeps are separated after deconvolution, not averaged as windows
+            if cap_config['streaming_deconvolution'] or cap_config['adaptive_snr_db'] is not None:
+                raise ValueError(f"[{sweep_section}] overlapped_sweeps and multiple out_ch_spkr channels cannot be "
+                                 f"combined with streaming_deconvolution or adaptive_snr_db")
+            if not 0 < cap_config['ir_len_ms'] < cap_config['sweep_dur_s'] * 1000.0:
+                raise ValueError(f"[{sweep_section}] ir_len_ms must be positive and shorter than the sweep")
+
+    @staticmethod
+    def _build_components(config: configparser.ConfigParser, audio_section: str) -> Dict[str, Any]:
         sweep_section = 'sweep'
         if not config.has_section(sweep_section):
             raise KeyError(f"Config file missing [{sweep_section}] section")
@@ -972,6 +2364,11 @@ class AudioFactory:
         def parse_optional_float(s):
             return None if s.lower() == "none" else float(s)
 
+        def parse_channels(s):
+            # A single channel, or a comma separated list for a mic array
+            channels = [int(c) for c in s.split(',')]
+            return channels[0] if len(channels) == 1 else channels
+
         fs = AudioFactory._get_required_config(config, audio_section, 'fs', int)
         sweep_dur_s = AudioFactory._get_required_config(config, sweep_section, 'sweep_dur_s', float)
         sweep_level_dbfs = AudioFactory._get_required_config(config, sweep_section, 'sweep_level_dbfs', float)
@@ -979,15 +2376,18 @@ class AudioFactory:
         hw_config = {
             'dev_in': AudioFactory._get_required_config(config, audio_section, 'in_dev', int),
             'dev_out': AudioFactory._get_required_config(config, audio_section, 'out_dev', int),
-            'ch_in_mic': AudioFactory._get_required_config(config, audio_section, 'in_ch_mic', int),
+            'ch_in_mic': AudioFactory._get_required_config(config, audio_section, 'in_ch_mic', parse_channels),
             'ch_in_loop': AudioFactory._get_required_config(config, audio_section, 'in_ch_loop', int),
-            'ch_out_spkr': AudioFactory._get_required_config(config, audio_section, 'out_ch_spkr', int),
+            'ch_out_spkr': AudioFactory._get_required_config(config, audio_section, 'out_ch_spkr', parse_channels),
             'ch_out_ref': AudioFactory._get_required_config(config, audio_section, 'out_ch_ref', int),
             'fs': fs,
             'blocksize': AudioFactory._get_required_config(config, audio_section, 'blocksize', int),
             'wasapi_exclusive': AudioFactory._get_required_config(config, audio_section, 'wasapi_exclusive', bool),
         }
 
+        # Threads for batched transforms, shared by every DSP stage
+        FFT.configure(config.getint(audio_section, 'fft_workers', fallback=1))
+
         cap_config = {
             'naming_convention': config.get(sweep_section, 'naming_convention', fallback='dimitri').strip(),
             'debug_saves': AudioFactory._get_required_config(config, sweep_section, 'debug_saves', bool),
@@ -996,21 +2396,71 @@ class AudioFactory:
             'num_sweeps': AudioFactory._get_required_config(config, sweep_section, 'num_sweeps', int),
             'pre_sil_ms': AudioFactory._get_required_config(config, sweep_section, 'pre_sil_ms', float),
             'post_sil_ms': AudioFactory._get_required_config(config, sweep_section, 'post_sil_ms', float),
+            'save_raw': config.getboolean(audio_section, 'save_raw_measurement', fallback=False),
+            'output_format': config.get(audio_section, 'output_format', fallback='wav').strip().lower(),
+            'dataset_file': config.get(audio_section, 'dataset_file', fallback='scan.nfsd').strip(),
+            'dataset_resume': config.getboolean(audio_section, 'dataset_resume', fallback=False),
+            'mic_offsets_mm': None,
+            'streaming_deconvolution': config.getboolean(sweep_section, 'streaming_deconvolution', fallback=False),
+            'adaptive_snr_db': parse_optional_float(config.get(sweep_section, 'adaptive_snr_db', fallback='None')),
+            'min_sweeps': config.getint(sweep_section, 'min_sweeps', fallback=1),
+            'overlapped_sweeps': config.getboolean(sweep_section, 'overlapped_sweeps', fallback=False),
+            'ir_len_ms': config.getfloat(sweep_section, 'ir_len_ms', fallback=200.0),
+            'max_harmonic': config.getint(sweep_section, 'max_harmonic', fallback=5),
         }
+        if cap_config['adaptive_snr_db'] is not None:
+            # num_sweeps becomes the ceiling; the timeline holds max_sweeps slots and capture may end earlier
+            cap_config['num_sweeps'] = config.getint(sweep_section, 'max_sweeps', fallback=cap_config['num_sweeps'])
+            if cap_config['streaming_deconvolution']:
+                raise ValueError(f"[{sweep_section}] adaptive_snr_db and streaming_deconvolution cannot be combined")
+            if not 1 <= cap_config['min_sweeps'] <= cap_config['num_sweeps']:
+                raise ValueError(f"[{sweep_section}] min_sweeps must be between 1 and max_sweeps")
+        AudioFactory.check_sweep_layout(cap_config, hw_config, audio_section, sweep_section)
+        num_mics = len(mic_channels(hw_config))
+        if config.has_option(audio_section, 'mic_offsets_mm'):
+            offsets = [float(v) for v in config.get(audio_section, 'mic_offsets_mm').split(',')]
+            if len(offsets) != num_mics:
+                raise ValueError(f"[{audio_section}] mic_offsets_mm needs one offset per mic channel "
+                                 f"({num_mics}), got {len(offsets)}")
+            cap_config['mic_offsets_mm'] = offsets
+        elif num_mics > 1:
+            raise KeyError(f"Missing required config: [{audio_section}] mic_offsets_mm (needed for a mic array)")
+        if cap_config['mic_offsets_mm'] and len(set(cap_config['mic_offsets_mm'])) != num_mics:
+            raise ValueError(f"[{audio_section}] mic_offsets_mm must be distinct, mics would overwrite each other")
+        if cap_config['output_format'] not in ('wav', 'dataset', 'both'):
+            raise ValueError(f"[{audio_section}] output_format must be wav, dataset or both, "
+                             f"got {cap_config['output_format']!r}")
 
         # Initialize core components
+        # Working precision of averaging and deconvolution
+        dsp_precision = config.get(sweep_section, 'dsp_precision', fallback='float64').strip().lower()
+        if dsp_precision not in ('float32', 'float64'):
+            raise ValueError(f"[{sweep_section}] dsp_precision must be float32 or float64, got '{dsp_precision}'")
+        dsp_dtype = np.dtype(dsp_precision)
+
         sweep_gen = SweepGenerator(fs, sweep_dur_s, f1=1.0, level_dbfs=sweep_level_dbfs)
         marker_gen = MarkerGenerator(fs, 100.0, (500.0, 5000.0), sweep_level_dbfs)
 
+        # Opt-in marker alignment dumps, written in the background
+        debug_dumper = None
+        if config.getboolean(sweep_section, 'alignment_debug', fallback=False):
+            # The directory is set by the Audio that owns the engine, inside its output tree
+            debug_dumper = AlignmentDebugDumper(
+                every_nth=config.getint(sweep_section, 'alignment_debug_every_n', fallback=1),
+                compress=config.getboolean(sweep_section, 'alignment_debug_compress', fallback=True),
+            )
+
         alignment_engine = AlignmentEngine(
             fs,
             cap_config['num_sweeps'],
             AudioFactory._get_required_config(config, sweep_section, 'align_to_first_marker', bool),
             AudioFactory._get_required_config(config, sweep_section, 'mic_tail_taper_ms', float),
-            marker_gen.dur_ms
+            marker_gen.dur_ms,
+            debug_dumper=debug_dumper,
+            dtype=dsp_dtype
         )
 
-        deconv_engine = DeconvolutionEngine(fs)
+        deconv_engine = DeconvolutionEngine(fs, dtype=dsp_dtype)
 
         # Gatekeeper logic for optional pipeline stages
         h2_db = AudioFactory._get_required_config(config, sweep_section, 'H2_TEST_DB', parse_optional_float)
@@ -1025,7 +2475,13 @@ class AudioFactory:
         else:
             filter_engine = None
 
-        kwargs = {
+        writer = ResultWriter(
+            num_threads=config.getint(audio_section, 'writer_threads', fallback=0),
+            max_queue=config.getint(audio_section, 'writer_queue_size', fallback=64),
+            fsync=config.get(audio_section, 'writer_fsync', fallback='none').strip().lower(),
+        )
+
+        return {
             'hw_config': hw_config,
             'capture_config': cap_config,
             'sweep_gen': sweep_gen,
@@ -1033,15 +2489,10 @@ class AudioFactory:
             'alignment_engine': alignment_engine,
             'deconv_engine': deconv_engine,
             'harmonic_injector': injector,
-            'protection_filter': filter_engine
+            'protection_filter': filter_engine,
+            'writer': writer
         }
 
-        # Route to the correct class based on mode
-        if mode == 'mock_interface':
-            return MockInterfaceAudio(**kwargs)
-
-        return Audio(**kwargs)
-
 
 if __name__ == "__main__":
     # Helper to list devices if run directly
@@ -0,0 +1,263 @@
+import argparse
+import json
+import struct
+import threading
+import time
+from pathlib import Path
+from typing import Any, BinaryIO, Dict, List, Optional, Sequence
+
+import numpy as np
+from loguru import logger
+
+from .datatypes import CylindricalPosition
+from .result_writer import ResultWriter
+from .utils.dsp import DSPUtils
+
+
+class ScanDataset:
+    """
+    Single-file, append-only store for all impulse responses of a scan.
+
+    The file starts with a magic string, the header length and a JSON header (sample rate,
+    IR lengths, metric names), padded to ``HEADER_ALIGN`` bytes. It is followed by fixed-size
+    records, one per point, holding the position, timestamp, order id, metrics, linear IR and
+    full IR (linear + distortion). Because every record has the same size, the file is read
+    through a numpy memmap: slicing a field (e.g. ``dataset.ir_linear[100:200]``) only touches
+    those records.
+
+    Records are appended with a single write per point through a handle that stays open until
+    close(). A record left incomplete by a crash is ignored when the file is opened again, and cut
+    off before the first new record is appended.
+
+    The fields of a point are interleaved in its record rather than each stored as its own
+    contiguous array. Per-field arrays would need one pre-sized region per field, or one write
+    per field for every point, and a crash could then leave a point half written across them.
+    The cost is that a field slice is strided: ``ir_linear[100:200]`` reads those 100 records,
+    not one contiguous block.
+
+    :ivar path: Location of the dataset file.
+    :type path: Path
+    :ivar header: The decoded JSON header.
+    :type header: Dict[str, Any]
+    """
+    MAGIC = b'NFSSCAN1'
+    HEADER_ALIGN = 4096
+    VERSION = 1
+    _PREFIX = struct.Struct('<8sI')
+
+    def __init__(self, path: Path, header: Dict[str, Any], data_offset: int):
+        self.path = Path(path)
+        self.header = header
+        self._data_offset = data_offset
+        self._dtype = self.record_dtype(header['ir_linear_len'], header['ir_full_len'], len(header['metric_names']))
+        self._lock = threading.Lock()
+        self._mmap: Optional[np.memmap] = None
+        self._mmap_len = -1
+        self._file: Optional[BinaryIO] = None
+
+    # ── Creation ──────────────────────────────────────────────────────────
+
+    @staticmethod
+    def record_dtype(ir_linear_len: int, ir_full_len: int, num_metrics: int) -> np.dtype:
+        """The on-disk layout of one point."""
+        return np.dtype([
+            ('position', '<f8', (3,)),
+            ('timestamp', '<f8'),
+            ('order_id', 'S32'),
+            ('metrics', '<f8', (num_metrics,)),
+            ('ir_linear', '<f4', (ir_linear_len,)),
+            ('ir_full', '<f4', (ir_full_len,)),
+        ])
+
+    @classmethod
+    def create(cls, path: Path, fs: int, ir_linear_len: int, ir_full_len: int,
+               metric_names: Sequence[str], attrs: Optional[Dict[str, Any]] = None) -> "ScanDataset":
+        """
+        Creates a new, empty dataset file.
+
+        :param attrs: Free-form JSON-serialisable scan information stored in the header.
+        :raises FileExistsError: If the file already exists.
+        """
+        header = {
+            'version': cls.VERSION,
+            'fs': int(fs),
+            'ir_linear_len': int(ir_linear_len),
+            'ir_full_len': int(ir_full_len),
+            'metric_names': list(metric_names),
+            'attrs': attrs or {},
+        }
+        header_bytes = json.dumps(header).encode('utf-8')
+        data_offset = -(-(cls._PREFIX.size + len(header_bytes)) // cls.HEADER_ALIGN) * cls.HEADER_ALIGN
+
+        path = Path(path)
+        with open(path, 'xb') as f:
+            f.write(cls._PREFIX.pack(cls.MAGIC, len(header_bytes)))
+            f.write(header_bytes)
+            f.write(b'\0' * (data_offset - cls._PREFIX.size - len(header_bytes)))
+        return cls(path, header, data_offset)
+
+    @classmethod
+    def open(cls, path: Path) -> "ScanDataset":
+        """
+        Opens an existing dataset for reading and appending.
+
+        :raises ValueError: If the file is not a scan dataset.
+        """
+        path = Path(path)
+        with open(path, 'rb') as f:
+            magic, header_len = cls._PREFIX.unpack(f.read(cls._PREFIX.size))
+            if magic != cls.MAGIC:
+                raise ValueError(f'{path} is not a scan dataset')
+            header = json.loads(f.read(header_len).decode('utf-8'))
+        data_offset = -(-(cls._PREFIX.size + header_len) // cls.HEADER_ALIGN) * cls.HEADER_ALIGN
+        return cls(path, header, data_offset)
+
+    @classmethod
+    def open_or_create(cls, path: Path, fs: int, ir_linear_len: int, ir_full_len: int,
+                       metric_names: Sequence[str], attrs: Optional[Dict[str, Any]] = None) -> "ScanDataset":
+        """
+        Opens the dataset to continue an interrupted scan, or creates it.
+
+        :raises ValueError: If an existing file has a different sample rate, IR lengths or metrics.
+        """
+        if not Path(path).exists():
+            return cls.create(path, fs, ir_linear_len, ir_full_len, metric_names, attrs)
+
+        dataset = cls.open(path)
+        expected = {'fs': int(fs), 'ir_linear_len': int(ir_linear_len), 'ir_full_len': int(ir_full_len),
+                    'metric_names': list(metric_names)}
+        mismatches = [k for k, v in expected.items() if dataset.header[k] != v]
+        if mismatches:
+            raise ValueError(f'Existing dataset {path} does not match the current measurement ({", ".join(mismatches)})')
+        return dataset
+
+    # ── Writing ───────────────────────────────────────────────────────────
+
+    def append(self, position: CylindricalPosition, order_id: str, ir_linear: np.ndarray, ir_full: np.ndarray,
+               metrics: Dict[str, float], timestamp: Optional[float] = None) -> None:
+        """Appends one point. Thread-safe."""
+        record = np.zeros(1, dtype=self._dtype)
+        record['position'] = (position.r(), position.t(), position.z())
+        record['timestamp'] = time.time() if timestamp is None else timestamp
+        record['order_id'] = str(order_id).encode('utf-8')[:32]
+        record['metrics'] = [metrics.get(name, np.nan) for name in self.header['metric_names']]
+        record['ir_linear'] = ir_linear
+        record['ir_full'] = ir_full
+
+        with self._lock:
+            if self._file is None:
+                self._file = self._open_for_append()
+            self._file.write(record.tobytes())
+            # Readers (records, len) look at the file on disk
+            self._file.flush()
+
+    def close(self) -> None:
+        """Closes the append handle and releases the memmap of the records."""
+        with self._lock:
+            if self._file is not None:
+                self._file.close()
+                self._file = None
+            self._release_mmap()
+
+    def _open_for_append(self) -> BinaryIO:
+        f = open(self.path, 'r+b')
+        end = self._data_offset + self._count_on_disk() * self._dtype.itemsize
+        if self.path.stat().st_size != end:
+            # Cut off the remains of an interrupted append. A file cannot be resized while it is
+            # mapped on Windows, so drop our memmap first.
+            self._release_mmap()
+            f.truncate(end)
+        f.seek(end)
+        return f
+
+    def _release_mmap(self) -> None:
+        self._mmap = None
+        self._mmap_len = -1
+
+    # ── Reading ───────────────────────────────────────────────────────────
+
+    def __len__(self) -> int:
+        return self._count_on_disk()
+
+    @property
+    def fs(self) -> int:
+        return self.header['fs']
+
+    @property
+    def metric_names(self) -> List[str]:
+        return self.header['metric_names']
+
+    @property
+    def records(self) -> np.ndarray:
+        """All complete records as a read-only memmap (structured array)."""
+        count = self._count_on_disk()
+        if self._mmap is None or self._mmap_len != count:
+            if count == 0:
+                return np.zeros(0, dtype=self._dtype)
+            self._mmap = np.memmap(self.path, dtype=self._dtype, mode='r', offset=self._data_offset, shape=(count,))
+            self._mmap_len = count
+        return self._mmap
+
+    @property
+    def positions(self) -> np.ndarray:
+        """(N, 3) array of r, t, z."""
+        return self.records['position']
+
+    @property
+    def timestamps(self) -> np.ndarray:
+        return self.records['timestamp']
+
+    @property
+    def order_ids(self) -> List[str]:
+        return [oid.decode('utf-8') for oid in self.records['order_id']]
+
+    @property
+    def ir_linear(self) -> np.ndarray:
+        """(N, ir_linear_len) linear impulse responses."""
+        return self.records['ir_linear']
+
+    @property
+    def ir_full(self) -> np.ndarray:
+        """(N, ir_full_len) full impulse responses including the distortion products."""
+        return self.records['ir_full']
+
+    def metric(self, name: str) -> np.ndarray:
+        """Values of one metric for all points."""
+        return self.records['metrics'][:, self.metric_names.index(name)]
+
+    def export_wavs(self, output_dir: Path, naming_convention: str = 'dimitri',
+                    writer: Optional[ResultWriter] = None) -> None:
+        """
+        Writes every point as loose WAV files (Recordings/ and Distortion/ under output_dir), named
+        the same way as a scan without dataset output.
+        """
+        output_dir = Path(output_dir)
+        rec_dir = output_dir / 'Recordings'
+        dist_dir = output_dir / 'Distortion'
+        rec_dir.mkdir(parents=True, exist_ok=True)
+        dist_dir.mkdir(parents=True, exist_ok=True)
+        writer = writer if writer is not None else ResultWriter()
+
+        records = self.records
+        for i, order_id in enumerate(self.order_ids):
+            r, t, z = (float(v) for v in records['position'][i])
+            _, main_file_name, dist_file_name = DSPUtils.ir_file_names(r, t, z, order_id, naming_convention)
+            writer.write_wav(rec_dir / main_file_name, np.array(records['ir_linear'][i]), self.fs,
+                             main_file_name, subtype='FLOAT')
+            writer.write_wav(dist_dir / dist_file_name, np.array(records['ir_full'][i]), self.fs,
+                             dist_file_name, subtype='FLOAT')
+        writer.flush()
+        logger.info(f'Exported {len(records)} point(s) from {self.path.name} to {output_dir}')
+
+    def _count_on_disk(self) -> int:
+        size = self.path.stat().st_size
+        return max(0, size - self._data_offset) // self._dtype.itemsize
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description='Export a scan dataset to loose WAV files.')
+    parser.add_argument('dataset', help='scan dataset file')
+    parser.add_argument('output', help='output directory')
+    parser.add_argument('--naming', default='dimitri', choices=['dimitri', 'tom'], help='file naming convention')
+    args = parser.parse_args()
+    ScanDataset.open(Path(args.dataset)).export_wavs(Path(args.output), args.naming)
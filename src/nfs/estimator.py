@@ -0,0 +1,163 @@
+import configparser
+import functools
+from typing import Callable, List
+
+import numpy as np
+from loguru import logger
+
+from .datatypes import CylindricalPosition
+from .grbl_controller import GrblControllerFactory, GrblControllerSimulated, GrblMotionModel
+from .instrumentation import ScanTimings
+from .motion_manager import IMotionManager, MotionManagerFactory
+from .scanner import Scanner
+
+# Modules that log every move; quiet while the point sequence is walked
+_MOVE_LOGGERS = ('nfs.motion_manager', 'nfs.scanner', 'nfs.grbl_controller')
+
+
+def format_duration(seconds: float) -> str:
+    """A duration as '1h 02m 03s', '2m 03s' or '45s'."""
+    seconds = int(round(max(seconds, 0.0)))
+    hours, rest = divmod(seconds, 3600)
+    minutes, seconds = divmod(rest, 60)
+    if hours:
+        return f'{hours}h {minutes:02d}m {seconds:02d}s'
+    if minutes:
+        return f'{minutes}m {seconds:02d}s'
+    return f'{seconds}s'
+
+
+class ScanEstimate:
+    """
+    Predicted duration of a scan, per point.
+
+    :ivar start_s: Move to the safe starting position.
+    :type start_s: float
+    :ivar moves_s: Move to every point, in scan order.
+    :type moves_s: List[float]
+    :ivar capture_s: Capture time of one point (the length of the sweep timeline).
+    :type capture_s: float
+    :ivar finish_s: Moves back to the starting position after the last point.
+    :type finish_s: float
+    """
+
+    def __init__(self, start_s: float, moves_s: List[float], capture_s: float, finish_s: float):
+        self.start_s = start_s
+        self.moves_s = moves_s
+        self.capture_s = capture_s
+        self.finish_s = finish_s
+
+    @property
+    def points(self) -> int:
+        return len(self.moves_s)
+
+    @property
+    def motion_s(self) -> float:
+        return self.start_s + sum(self.moves_s) + self.finish_s
+
+    @property
+    def total_s(self) -> float:
+        return self.motion_s + self.points * self.capture_s
+
+    def remaining_s(self, timings: ScanTimings, current: int) -> float:
+        """
+        Time left once the rig has reached point `current` (1-based), corrected by the points so far.
+
+        Both corrections use the last `timings.window` points. The ratio of the observed to the
+        predicted move time scales the remaining moves. The observed time per point besides the
+        move (capture, stream start-up, and any processing or writing that holds up the next
+        move) replaces the predicted capture time. Until a point has completed, the prediction
+        is used as is.
+        """
+        recent = timings.points[:current][-timings.window:]
+        predicted = sum(self._move_s(p.index) for p in recent)
+        observed = sum(p.as_dict().get('motion', 0.0) for p in recent)
+        motion_scale = observed / predicted if predicted > 0 and observed > 0 else 1.0
+
+        # From the end of the move to a point to the start of the next point
+        rest = [b.started - a.started - a.as_dict().get('motion', 0.0) for a, b in zip(recent, recent[1:])]
+        per_point = float(np.mean(rest)) if rest else self.capture_s
+
+        points_left = max(self.points - current + 1, 0)
+        return per_point * points_left + motion_scale * (sum(self.moves_s[current:]) + self.finish_s)
+
+    def _move_s(self, index: int) -> float:
+        # The scan can deviate from the walked sequence (e.g. random points), so stay in range
+        return self.moves_s[index - 1] if 0 < index <= len(self.moves_s) else 0.0
+
+
+class ScanTimeEstimator:
+    """
+    Predicts how long a scan takes, before it starts.
+
+    A second motion manager, built like the scan's own but driving a GrblControllerSimulated,
+    walks the full point sequence. The simulated controller costs every move the scanner sends
+    with the trapezoidal profiles of GrblMotionModel, so angle changes, wall-to-cap transitions
+    and arcs cost what they cost on the rig. Every point adds the capture time of the sweep
+    timeline. Nothing is sent to the real machine.
+
+    :ivar motion_model: Move timing from the [grbl_*_axis] rates and accelerations.
+    :type motion_model: GrblMotionModel
+    :ivar feed_rate: Feed rate of arc moves, as configured for the scanner.
+    :type feed_rate: float
+    :ivar motion_manager_factory: Builds a motion manager, with its own point sequence, for a scanner.
+    :type motion_manager_factory: Callable[[Scanner], IMotionManager]
+    """
+
+    def __init__(self, motion_model: GrblMotionModel, feed_rate: float,
+                 motion_manager_factory: Callable[[Scanner], IMotionManager]):
+        self.motion_model = motion_model
+        self.feed_rate = feed_rate
+        self.motion_manager_factory = motion_manager_factory
+
+    def estimate(self, start: CylindricalPosition, capture_s: float) -> ScanEstimate:
+        """
+        Walks the scan as take_measurement_set does, from start.
+
+        :param start: Position of the rig when the scan starts.
+        :param capture_s: Capture time of one point in s.
+        """
+        controller = GrblControllerSimulated(self.motion_model, realtime=False, position=start)
+        scanner = Scanner(controller, self.feed_rate)
+        motion_manager = self.motion_manager_factory(scanner)
+
+        for name in _MOVE_LOGGERS:
+            logger.disable(name)
+        try:
+            motion_manager.move_to_safe_starting_radius()
+            start_s = controller.elapsed_s
+            moves_s = []
+            finish_s = 0.0
+            while not motion_manager.ready():
+                before = controller.elapsed_s
+                motion_manager.next()
+                if motion_manager.ready():
+                    finish_s = controller.elapsed_s - before
+                    break
+                moves_s.append(controller.elapsed_s - before)
+
+            before = controller.elapsed_s
+            motion_manager.reset()
+            motion_manager.move_to_safe_starting_radius()
+            scanner.angular_move_to(0.0)
+            finish_s += controller.elapsed_s - before
+        finally:
+            for name in _MOVE_LOGGERS:
+                logger.enable(name)
+        return ScanEstimate(start_s, moves_s, capture_s, finish_s)
+
+    @staticmethod
+    def from_config(config_file: str, motion_manager_section: str) -> "ScanTimeEstimator":
+        """
+        Creates the estimator from the axis sections of the [scanner] controller and its feed rate.
+        """
+        config_parser = configparser.ConfigParser(inline_comment_prefixes="#")
+        config_parser.read(config_file)
+        controller_section = config_parser.get('scanner', 'controller')
+        axes = [GrblControllerFactory.axis_config(
+            config_parser, config_parser.get(controller_section, f'grbl_{axis}_axis_config',
+                                             fallback=f'grbl_{axis}_axis'))
+            for axis in ('x', 'y', 'z')]
+        feed_rate = config_parser.getfloat('scanner', 'feed_rate')
+        return ScanTimeEstimator(GrblMotionModel(*axes), feed_rate,
+                                 functools.partial(MotionManagerFactory.create, config_file, motion_manager_section))
@@ -1,13 +1,16 @@
 import configparser
+import math
+import re
 import sys
 import time
 from abc import ABC, abstractmethod
 from threading import Lock
+from typing import List, Optional, Sequence, Tuple
 
 from grbl_streamer import GrblStreamer  # type: ignore
 from loguru import logger
 
-from nfs.datatypes import CylindricalPosition, GrblMachineState
+from nfs.datatypes import CylindricalPosition, GrblConfig, GrblMachineState
 
 
 class IGrblController(ABC):
@@ -103,6 +106,179 @@ class GrblControllerMock(IGrblController):
         pass
 
 
+class GrblMotionModel:
+    """
+    Move durations of a GRBL machine from its per-axis maximum rates and accelerations.
+
+    GRBL plans a straight move as one trapezoidal velocity profile along the direction of the
+    move. The speed and acceleration of that profile are the largest ones that keep every axis
+    within its own maximum rate ($11x) and acceleration ($12x). The scanner waits for the machine
+    to be idle after every move, so each profile starts and ends at rest.
+
+    Arcs (G2/G3 in the XY plane) are timed over their length at the feed rate. The speed is also
+    limited by the slower of the two axes and by the centripetal acceleration v^2 / R.
+
+    G-code axes: X is the vertical axis (mm), Y the radial axis (mm) and Z the turntable (degrees).
+
+    :ivar axes: Configuration of the X, Y and Z axis; rates in units/min, accelerations in units/s^2.
+    :type axes: Tuple[GrblConfig, GrblConfig, GrblConfig]
+    """
+
+    def __init__(self, x_axis: GrblConfig, y_axis: GrblConfig, z_axis: GrblConfig):
+        self.axes = (x_axis, y_axis, z_axis)
+
+    @staticmethod
+    def trapezoid_time(distance: float, speed: float, acceleration: float) -> float:
+        """
+        Duration of a move from rest to rest.
+
+        :param distance: Length of the move.
+        :param speed: Cruise speed in units/s.
+        :param acceleration: Acceleration and deceleration in units/s^2.
+        """
+        if distance <= 0:
+            return 0.0
+        if distance >= speed ** 2 / acceleration:
+            # Accelerate, cruise, decelerate
+            return distance / speed + speed / acceleration
+        # Triangle: the cruise speed is never reached
+        return 2.0 * math.sqrt(distance / acceleration)
+
+    def linear_move_time(self, start: Sequence[float], end: Sequence[float],
+                         feed_rate: Optional[float] = None) -> float:
+        """
+        Duration of a straight move (G0, or G1 at feed_rate in units/min) between two XYZ positions.
+        """
+        delta = [abs(e - s) for s, e in zip(start, end)]
+        distance = math.sqrt(sum(d ** 2 for d in delta))
+        if distance == 0:
+            return 0.0
+        speed = min(axis.maximum_rate / 60.0 * distance / d for axis, d in zip(self.axes, delta) if d > 0)
+        if feed_rate:
+            speed = min(speed, feed_rate / 60.0)
+        acceleration = min(axis.acceleration * distance / d for axis, d in zip(self.axes, delta) if d > 0)
+        return self.trapezoid_time(distance, speed, acceleration)
+
+    def arc_move_time(self, start: Sequence[float], end: Sequence[float], radius: float, feed_rate: float) -> float:
+        """
+        Duration of an arc in the XY plane with the given radius; a negative radius is the long arc (GRBL R word).
+        """
+        chord = math.hypot(end[0] - start[0], end[1] - start[1])
+        r = abs(radius)
+        if chord == 0 or r == 0:
+            return 0.0
+        angle = 2.0 * math.asin(min(1.0, chord / (2.0 * r)))
+        if radius < 0:
+            angle = 2.0 * math.pi - angle
+        plane = self.axes[:2]
+        acceleration = min(axis.acceleration for axis in plane)
+        speed = min(feed_rate / 60.0, min(axis.maximum_rate for axis in plane) / 60.0, math.sqrt(acceleration * r))
+        return self.trapezoid_time(r * angle, speed, acceleration)
+
+
+class GrblControllerSimulated(IGrblController):
+    """
+    Simulated GRBL controller that moves with the timing of the real machine.
+
+    Parses the G-code the scanner sends, keeps track of the position and times every move with
+    a GrblMotionModel of the configured axes. In real-time mode a move blocks for as long as the
+    machine would take, so a whole scan runs at the pace of the rig without hardware. Otherwise
+    moves return at once and their durations only add up in elapsed_s.
+
+    :ivar motion_model: Move timing of the simulated machine.
+    :type motion_model: GrblMotionModel
+    :ivar realtime: Block for the duration of every move.
+    :type realtime: bool
+    :ivar elapsed_s: Total simulated move time so far.
+    :type elapsed_s: float
+    :ivar moves: Number of moves executed so far.
+    :type moves: int
+    """
+    _WORD = re.compile(r'([A-Z])\s*(-?\d+(?:\.\d*)?|-?\.\d+)')
+
+    def __init__(self, motion_model: GrblMotionModel, realtime: bool = True,
+                 position: Optional[CylindricalPosition] = None):
+        self.motion_model = motion_model
+        self.realtime = realtime
+        self.elapsed_s = 0.0
+        self.moves = 0
+        # G-code X, Y, Z; the machine origin unless the simulation continues from a known position
+        self._position: List[float] = [0.0, 0.0, 0.0] if position is None else [position.z(), position.r(),
+                                                                                 position.t()]
+
+    def shutdown(self) -> None:
+        logger.trace('Simulated controller: shutting down')
+
+    def send(self, message: str) -> None:
+        self._execute(message)
+
+    def send_and_wait_for_move_ready(self, message: str) -> None:
+        self._execute(message)
+
+    def killalarm(self) -> None:
+        logger.trace('Simulated controller: killalarm')
+
+    def softreset(self) -> None:
+        logger.trace('Simulated controller: softreset')
+
+    def hold(self) -> None:
+        logger.trace('Simulated controller: hold')
+
+    def get_position(self) -> CylindricalPosition:
+        x, y, z = self._position
+        return CylindricalPosition(y, z, x)
+
+    def get_state(self) -> GrblMachineState:
+        return GrblMachineState.IDLE
+
+    def get_state_raw(self) -> str:
+        return "Idle"
+
+    def move_time(self, message: str) -> float:
+        """Duration of the move in a G-code line from the current position, 0 for anything else."""
+        return self._plan(message)[0]
+
+    def _plan(self, message: str) -> Tuple[float, Optional[List[float]]]:
+        """(duration, target) of a G-code line; target is None when the line does not move the machine."""
+        line = message.strip().upper()
+        if line == '$H':
+            # Homing ends at the machine origin
+            target = [0.0, 0.0, 0.0]
+            return self.motion_model.linear_move_time(self._position, target), target
+
+        words = {}
+        for letter, value in self._WORD.findall(line):
+            words.setdefault(letter, float(value))
+        if 'G' not in words:
+            return 0.0, None
+
+        g = int(words['G'])
+        target = [words.get(axis, current) for axis, current in zip('XYZ', self._position)]
+        if g == 10:
+            # G10 L20 redefines the work coordinates of the current position
+            return 0.0, target
+        if g in (0, 1):
+            feed_rate = words.get('F') if g == 1 else None
+            return self.motion_model.linear_move_time(self._position, target, feed_rate), target
+        if g in (2, 3) and 'R' in words:
+            feed_rate = words.get('F', min(axis.maximum_rate for axis in self.motion_model.axes[:2]))
+            return self.motion_model.arc_move_time(self._position, target, words['R'], feed_rate), target
+        return 0.0, None
+
+    def _execute(self, message: str) -> None:
+        duration, target = self._plan(message)
+        if target is None:
+            logger.trace(f'Simulated controller: ignoring {message}')
+            return
+        if duration > 0:
+            self.moves += 1
+            self.elapsed_s += duration
+            logger.trace(f'Simulated controller: {message} takes {duration:.3f} s')
+            if self.realtime:
+                time.sleep(duration)
+        self._position = target
+
+
 class EventHandler:
     def __init__(self):
         self._received_message = ''
@@ -174,7 +350,7 @@ class GrblControllerFactory:
     Creates instances of GRBL controller types based on configuration.
 
     This class provides factory methods to create various GRBL controllers, such as
-    Arduino, ESP32Duino, and Mock controllers, using a configuration file. It handles
+    Arduino, ESP32Duino, Mock and Simulated controllers, using a configuration file. It handles
     the parsing of the configuration and the instantiation of the appropriate controller
     class based on the type specified in the configuration file. Additional methods
     assist in configuring specific GRBL controller settings like axes configurations.
@@ -221,9 +397,23 @@ class GrblControllerFactory:
             return ESP32Duino(connection)  # TODO MPOT check this. Maybe simply rename. Looking at the class diagram this can be much simpler and a few layers of indirection can be removed.
         elif type_to_build == 'Mock':
             return GrblControllerMock()
+        elif type_to_build == 'Simulated':
+            axes = [GrblControllerFactory.axis_config(
+                config_parser, config_parser.get(section, f'grbl_{axis}_axis_config', fallback=f'grbl_{axis}_axis'))
+                for axis in ('x', 'y', 'z')]
+            realtime = config_parser.getboolean(section, 'realtime', fallback=True)
+            return GrblControllerSimulated(GrblMotionModel(*axes), realtime)
         else:
             raise Exception(f'Unknown controller type: {type}')
 
+    @staticmethod
+    def axis_config(config_parser: configparser.ConfigParser, section: str) -> GrblConfig:
+        """Reads the GrblConfig of one axis from its [grbl_*_axis] section."""
+        return GrblConfig(config_parser.getfloat(section, 'steps_per_millimeter'),
+                          config_parser.getfloat(section, 'maximum_rate'),
+                          config_parser.getfloat(section, 'acceleration'),
+                          config_parser.getboolean(section, 'invert_direction', fallback=False))
+
     @staticmethod
     def _set_axis_according_to_config(grbl_streamer, config_parser, axis: str) -> None:
         section = f'grbl_{axis}_axis'
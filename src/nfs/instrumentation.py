@@ -0,0 +1,220 @@
+import contextlib
+import threading
+import time
+from contextvars import ContextVar
+from typing import Callable, Dict, Iterator, List, Optional
+
+import numpy as np
+
+from .datatypes import CylindricalPosition
+
+STAGES = ('motion', 'stream_open', 'capture', 'sync_and_average', 'process_ir', 'calculate_metrics', 'write')
+
+
+class PointTimings:
+    """
+    Stage durations of one measured point.
+
+    A stage that runs more than once for a point (one write per file, one metrics call per mic)
+    adds up; counts tells how often it ran. Stages can be added from several threads, since the
+    post-processing and the file writes of a point may run off the measurement thread.
+
+    Work that outlives the measurement loop (a queued post-processing job, a queued write) holds
+    the point until it is done. The point is finished when the last hold is released; the
+    listeners are then called once, on the thread that released it.
+
+    :ivar index: Number of the point in the scan, starting at 1.
+    :type index: int
+    :ivar position: Position of the point, once the rig has moved there.
+    :type position: Optional[CylindricalPosition]
+    :ivar started: Wall clock time (time.time()) the point was started.
+    :type started: float
+    :ivar durations: Total time in s per stage.
+    :type durations: Dict[str, float]
+    :ivar counts: Number of spans per stage.
+    :type counts: Dict[str, int]
+    :ivar counters: Event counters of the point, e.g. 'xruns' and 'bytes_written'.
+    :type counters: Dict[str, int]
+    :ivar metrics: DSP verification metrics of the point, one entry per driver and mic.
+    :type metrics: List[Dict[str, float]]
+    :ivar finished: Wall clock time the last hold on the point was released, None until then.
+    :type finished: Optional[float]
+    """
+
+    def __init__(self, index: int, position: Optional[CylindricalPosition] = None):
+        self.index = index
+        self.position = position
+        self.started = time.time()
+        self.durations: Dict[str, float] = {}
+        self.counts: Dict[str, int] = {}
+        self.counters: Dict[str, int] = {}
+        self.metrics: List[Dict[str, float]] = []
+        self.finished: Optional[float] = None
+        self._holds = 0
+        self._listeners: List[Callable[["PointTimings"], None]] = []
+        self._lock = threading.Lock()
+
+    def add(self, stage: str, seconds: float) -> None:
+        with self._lock:
+            self.durations[stage] = self.durations.get(stage, 0.0) + seconds
+            self.counts[stage] = self.counts.get(stage, 0) + 1
+
+    def increment(self, counter: str, n: int = 1) -> None:
+        with self._lock:
+            self.counters[counter] = self.counters.get(counter, 0) + n
+
+    def on_finished(self, listener: Callable[["PointTimings"], None]) -> None:
+        """Calls listener(point) when the point is finished."""
+        with self._lock:
+            self._listeners.append(listener)
+
+    def hold(self) -> None:
+        """Keeps the point open until a matching release()."""
+        with self._lock:
+            self._holds += 1
+
+    def release(self) -> None:
+        with self._lock:
+            self._holds -= 1
+            if self._holds > 0 or self.finished is not None:
+                return
+            self.finished = time.time()
+            listeners = list(self._listeners)
+        for listener in listeners:
+            listener(self)
+
+    def as_dict(self) -> Dict[str, float]:
+        """A copy of the stage durations."""
+        with self._lock:
+            return dict(self.durations)
+
+
+_current_point: ContextVar[Optional[PointTimings]] = ContextVar('nfs_current_point', default=None)
+
+
+def current_point() -> Optional[PointTimings]:
+    """The point the spans of this thread are booked on, if any."""
+    return _current_point.get()
+
+
+@contextlib.contextmanager
+def recording(point: Optional[PointTimings]) -> Iterator[None]:
+    """
+    Books the spans of this thread on point for the duration of the block.
+
+    Worker threads do not inherit the point of the thread that queued the work. Pass the point
+    along with the work (e.g. in the capture dict) and activate it again on the worker.
+    """
+    token = _current_point.set(point)
+    try:
+        yield
+    finally:
+        _current_point.reset(token)
+
+
+def count(counter: str, n: int = 1) -> None:
+    """Adds n to a counter of the current point, if any."""
+    point = _current_point.get()
+    if point is not None:
+        point.increment(counter, n)
+
+
+@contextlib.contextmanager
+def span(stage: str) -> Iterator[None]:
+    """
+    Times the block as one span of stage on the current point.
+
+    Without a current point (a single measurement, offline reprocessing) the block is not timed.
+    """
+    point = _current_point.get()
+    if point is None:
+        yield
+        return
+    t0 = time.perf_counter()
+    try:
+        yield
+    finally:
+        point.add(stage, time.perf_counter() - t0)
+
+
+class ScanTimings:
+    """
+    Collects the PointTimings of a scan and aggregates them per stage.
+
+    The statistics are rolling: mean, p95 and max cover the last `window` points, so they follow
+    a scan whose cost per point changes (e.g. longer moves on the cap than on the wall).
+    on_point_finished, if given, is called with every point once it is finished (see PointTimings).
+
+    :ivar window: Number of most recent points the statistics cover.
+    :type window: int
+    :ivar points: Timings of every point of the scan, in scan order.
+    :type points: List[PointTimings]
+    """
+
+    def __init__(self, window: int = 50, on_point_finished: Optional[Callable[[PointTimings], None]] = None):
+        if window < 1:
+            raise ValueError(f'timing window must be at least 1 point, got {window}')
+        self.window = window
+        self.points: List[PointTimings] = []
+        self._on_point_finished = on_point_finished
+        self._lock = threading.Lock()
+
+    def new_point(self, position: Optional[CylindricalPosition] = None) -> PointTimings:
+        """
+        Starts the record of the next point. The caller holds it and releases it once the point
+        has been measured (or handed to the pipeline).
+        """
+        with self._lock:
+            point = PointTimings(len(self.points) + 1, position)
+            self.points.append(point)
+        if self._on_point_finished is not None:
+            point.on_finished(self._on_point_finished)
+        point.hold()
+        return point
+
+    def discard(self, point: PointTimings) -> None:
+        """Drops a record that did not become a measured point (e.g. the move past the last point)."""
+        with self._lock:
+            if self.points and self.points[-1] is point:
+                self.points.pop()
+
+    def stage_stats(self) -> Dict[str, Dict[str, float]]:
+        """
+        Rolling statistics per stage over the last `window` points.
+
+        :return: Per stage that ran: 'mean', 'p95' and 'max' of its time per point in s, and the
+                 'total' over the whole scan.
+        """
+        with self._lock:
+            points = list(self.points)
+        recent = points[-self.window:]
+
+        stats: Dict[str, Dict[str, float]] = {}
+        for stage in self._stages(points):
+            per_point = np.array([p.as_dict().get(stage, 0.0) for p in recent])
+            stats[stage] = {
+                'mean': float(np.mean(per_point)),
+                'p95': float(np.percentile(per_point, 95)),
+                'max': float(np.max(per_point)),
+                'total': float(sum(p.as_dict().get(stage, 0.0) for p in points)),
+            }
+        return stats
+
+    def summary(self) -> str:
+        """The statistics as a table for the log."""
+        stats = self.stage_stats()
+        lines = [f"Stage timings over the last {min(self.window, len(self.points))} of {len(self.points)} points "
+                 f"(ms per point):",
+                 f"{'stage':<18} {'mean':>9} {'p95':>9} {'max':>9} {'total s':>9}"]
+        for stage, s in stats.items():
+            lines.append(f"{stage:<18} {s['mean'] * 1e3:>9.1f} {s['p95'] * 1e3:>9.1f} {s['max'] * 1e3:>9.1f} "
+                         f"{s['total']:>9.2f}")
+        return '\n'.join(lines)
+
+    @staticmethod
+    def _stages(points: List[PointTimings]) -> List[str]:
+        """The stages that ran, in pipeline order; unknown stages last."""
+        seen = set()
+        for p in points:
+            seen.update(p.as_dict())
+        return [s for s in STAGES if s in seen] + sorted(seen - set(STAGES))
@@ -1,13 +1,20 @@
 import configparser
+import functools
 import time
+from typing import Optional
 
 from .logging_config import setup_logging
 from loguru import logger
 
 from . import loader
 from .audio import AudioFactory, IAudio
+from .estimator import ScanEstimate, ScanTimeEstimator, format_duration
+from .instrumentation import PointTimings, ScanTimings, recording, span
 from .motion_manager import MotionManagerFactory
+from .pipeline import PipelinedScanExecutor
+from .planner import SweepPlanner
 from .scanner import Scanner
+from .telemetry import TelemetrySink
 
 
 class NearFieldScanner:
@@ -26,16 +33,44 @@ class NearFieldScanner:
     :type _measurement_motion_manager: Any
     :ivar _position_log_file: Path to the file where measurement positions are logged.
     :type _position_log_file: str
+    :ivar _executor: Optional worker pool that post-processes captured points while the
+        rig moves on. When None, every point is measured and processed serially.
+    :type _executor: Optional[PipelinedScanExecutor]
+    :ivar _planner: Optional sweep planner that sets the sweep duration and level from the
+        noise floor at the starting position, before the first point is measured.
+    :type _planner: Optional[SweepPlanner]
+    :ivar timings: Stage timings of every point of the current (or last) scan, with rolling
+        statistics per stage.
+    :type timings: ScanTimings
+    :ivar _telemetry: Optional sink that records every finished point of a scan.
+    :type _telemetry: Optional[TelemetrySink]
+    :ivar _estimator: Optional scan time estimator. When set, the scan duration is predicted
+        before the first point and every progress line shows the time left.
+    :type _estimator: Optional[ScanTimeEstimator]
+    :ivar estimate: Predicted duration of the current (or last) scan, if estimated.
+    :type estimate: Optional[ScanEstimate]
     """
     def __init__(self,
                  scanner: Scanner,
                  audio: IAudio,
                  measurement_motion_manager,
-                 position_log_file: str = 'measurement_positions.csv'):
+                 position_log_file: str = 'measurement_positions.csv',
+                 executor: Optional[PipelinedScanExecutor] = None,
+                 planner: Optional[SweepPlanner] = None,
+                 timing_window: int = 50,
+                 telemetry: Optional[TelemetrySink] = None,
+                 estimator: Optional[ScanTimeEstimator] = None):
         self._scanner = scanner
         self._audio = audio
         self._measurement_motion_manager = measurement_motion_manager
         self._position_log_file = position_log_file
+        self._executor = executor
+        self._planner = planner
+        self._timing_window = timing_window
+        self._telemetry = telemetry
+        self._estimator = estimator
+        self.estimate: Optional[ScanEstimate] = None
+        self.timings = ScanTimings(timing_window)
         self._clear_position_log()
 
     def _clear_position_log(self) -> None:
@@ -71,26 +106,83 @@ class NearFieldScanner:
         :return: nothing
         """
         self._clear_position_log()
+        if self._estimator is not None:
+            # Walk the moves from where the rig is now; the capture time is known once the sweep is planned
+            self.estimate = self._estimator.estimate(self._scanner.get_position(), 0.0)
         self._measurement_motion_manager.move_to_safe_starting_radius()
+        if self._planner is not None:
+            # Size the sweep to the room's noise floor at the reference position
+            self._planner.plan(self._audio)
         total = self._measurement_motion_manager.total_points()
         current = 0
-        while not self._measurement_motion_manager.ready():
-            self._measurement_motion_manager.next()
-            if self._measurement_motion_manager.ready():
-                break
+        if self.estimate is not None:
+            self.estimate.capture_s = self._audio.capture_duration()
+            logger.info(f"Estimated scan time {format_duration(self.estimate.total_s)} for {self.estimate.points} "
+                        f"points: {format_duration(self.estimate.motion_s)} moving, "
+                        f"{self.estimate.capture_s:.2f} s capture per point")
+        on_point_finished = None
+        if self._telemetry is not None:
+            on_point_finished = functools.partial(self._emit_telemetry, time.time())
+        self.timings = ScanTimings(self._timing_window, on_point_finished)
+        completed = False
+        try:
+            while not self._measurement_motion_manager.ready():
+                point = self.timings.new_point()
+                with recording(point), span('motion'):
+                    self._measurement_motion_manager.next()
+                if self._measurement_motion_manager.ready():
+                    self.timings.discard(point)
+                    break
 
-            current += 1
-            progress = (current / total) * 100 if total > 0 else 0
-            logger.info(f"Measuring point {current} of {total}... {progress:.1f}% complete")
+                current += 1
+                progress = (current / total) * 100 if total > 0 else 0
+                eta = ""
+                if self.estimate is not None:
+                    remaining = self.estimate.remaining_s(self.timings, current)
+                    eta = (f", {format_duration(remaining)} left "
+                           f"(ETA {time.strftime('%H:%M:%S', time.localtime(time.time() + remaining))})")
+                logger.info(f"Measuring point {current} of {total}... {progress:.1f}% complete{eta}")
 
-            position = self._scanner.get_position()
-            self._append_position_to_file(position)
-            self._audio.measure_ir(position)
+                position = self._scanner.get_position()
+                point.position = position
+                self._append_position_to_file(position)
+                with recording(point):
+                    if self._executor is not None:
+                        # Capture now, process while moving to the next point
+                        self._executor.submit(self._audio.capture_ir(position))
+                    else:
+                        self._audio.measure_ir(position)
+                # Finishes the point, unless its processing or writes are still queued
+                point.release()
+            completed = True
+        finally:
+            if completed:
+                self._finish_outstanding_work()
+            else:
+                # Still wait for the queued points, but let the error that stopped the scan propagate
+                try:
+                    self._finish_outstanding_work()
+                except Exception as e:
+                    logger.error(f'Finishing the outstanding work of the failed scan also failed: {e}')
+            if self.timings.points:
+                logger.info(self.timings.summary())
 
         self._measurement_motion_manager.reset()
         self._measurement_motion_manager.move_to_safe_starting_radius()
         self._scanner.angular_move_to(0.0)
 
+    def _finish_outstanding_work(self) -> None:
+        """Waits for the queued post-processing jobs and result files of the scan."""
+        try:
+            if self._executor is not None:
+                self._executor.drain()
+        finally:
+            # Barrier: every result file of this scan is on disk before we report completion
+            self._audio.flush()
+
+    def _emit_telemetry(self, scan_started: float, point: PointTimings) -> None:
+        self._telemetry.emit(TelemetrySink.record(point, scan_started))
+
     def shutdown(self) -> None:
         """
         Shuts down the scanner system gracefully.
@@ -101,6 +193,11 @@ class NearFieldScanner:
 
         :return: None
         """
+        if self._executor is not None:
+            self._executor.shutdown()
+        self._audio.close()
+        if self._telemetry is not None:
+            self._telemetry.close()
         self._scanner.shutdown()  # turn off stuff and tidy
 
     def __enter__(self):
@@ -145,4 +242,29 @@ class NearFieldScannerFactory:
         motion_manager_section = config_parser.get(section, 'motion_manager')
         measurement_manager = MotionManagerFactory.create(config_file, motion_manager_section, scanner)
 
-        return NearFieldScanner(scanner, audio, measurement_manager)
+        # Optional: overlap post-processing of point N with the move to point N+1
+        kwargs = {}
+        pipeline_workers = config_parser.getint(section, 'pipeline_workers', fallback=0)
+        if pipeline_workers > 0:
+            max_pending = config_parser.getint(section, 'pipeline_max_pending', fallback=2 * pipeline_workers)
+            kwargs['executor'] = PipelinedScanExecutor(pipeline_workers, max_pending)
+            logger.info(f'Pipelined scanning enabled: {pipeline_workers} worker(s), {max_pending} pending max')
+
+        # Optional: choose sweep duration and level from the noise floor at the start of each scan
+        if config_parser.getboolean('sweep', 'auto_plan', fallback=False):
+            kwargs['planner'] = SweepPlanner.from_config(config_file)
+
+        # Optional: number of recent points the rolling stage timing statistics cover
+        if config_parser.has_option(section, 'timing_window'):
+            kwargs['timing_window'] = config_parser.getint(section, 'timing_window')
+
+        # Optional: per-point telemetry records (NDJSON file and/or local UDP)
+        telemetry = TelemetrySink.from_config(config_file, section)
+        if telemetry is not None:
+            kwargs['telemetry'] = telemetry
+
+        # Optional: predict the scan duration from the axis limits and the sweep timeline, with a live ETA
+        if config_parser.getboolean(section, 'estimate_duration', fallback=False):
+            kwargs['estimator'] = ScanTimeEstimator.from_config(config_file, motion_manager_section)
+
+        return NearFieldScanner(scanner, audio, measurement_manager, **kwargs)
@@ -0,0 +1,91 @@
+import threading
+from concurrent.futures import Future, ThreadPoolExecutor
+from typing import Callable, List, Optional
+
+from loguru import logger
+
+
+class PipelinedScanExecutor:
+    """
+    Runs the post-processing of captured measurement points on a worker pool, so the rig can
+    move to the next point while alignment, deconvolution, metrics and file output of the
+    previous point are still in progress.
+
+    The number of outstanding jobs is bounded: when ``max_pending`` jobs are queued or running,
+    ``submit`` blocks until one finishes. This keeps memory use for raw captures bounded when
+    processing is slower than motion.
+
+    :ivar _max_workers: Number of worker threads processing captures.
+    :type _max_workers: int
+    :ivar _max_pending: Maximum number of jobs queued or running before submit blocks.
+    :type _max_pending: int
+    """
+
+    def __init__(self, max_workers: int = 1, max_pending: Optional[int] = None):
+        if max_workers < 1:
+            raise ValueError(f'max_workers must be at least 1, got {max_workers}')
+        self._max_workers = max_workers
+        self._max_pending = max_pending if max_pending is not None else 2 * max_workers
+        self._slots = threading.BoundedSemaphore(self._max_pending)
+        self._pool = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix='nfs-post')
+        self._futures: List[Future] = []
+        self._lock = threading.Lock()
+
+    def submit(self, job: Callable[[], None]) -> None:
+        """
+        Queues a post-processing job. Blocks while the queue is full.
+
+        :param job: Callable doing the post-processing of one point.
+        :raises Exception: The first error raised by a previously finished job. Every failure is logged.
+        """
+        self._raise_finished_errors()
+        self._slots.acquire()
+        try:
+            future = self._pool.submit(job)
+        except Exception:
+            self._slots.release()
+            raise
+        future.add_done_callback(lambda _: self._slots.release())
+        with self._lock:
+            self._futures.append(future)
+
+    def drain(self) -> None:
+        """
+        Waits until all submitted jobs have finished.
+
+        :raises Exception: The first error raised by any of the jobs.
+        """
+        with self._lock:
+            futures, self._futures = self._futures, []
+
+        first_error = None
+        for future in futures:
+            error = future.exception()
+            if error is not None:
+                logger.error(f'Post-processing of a measurement failed: {error}')
+                if first_error is None:
+                    first_error = error
+
+        if first_error is not None:
+            raise first_error
+
+    def shutdown(self) -> None:
+        """Waits for outstanding jobs and stops the worker threads."""
+        self._pool.shutdown(wait=True)
+
+    def _raise_finished_errors(self) -> None:
+        """Surfaces failures of jobs that already completed, so a scan stops early on errors."""
+        with self._lock:
+            done = [f for f in self._futures if f.done()]
+            self._futures = [f for f in self._futures if not f.done()]
+
+        first_error = None
+        for future in done:
+            error = future.exception()
+            if error is not None:
+                logger.error(f'Post-processing of a measurement failed: {error}')
+                if first_error is None:
+                    first_error = error
+
+        if first_error is not None:
+            raise first_error
@@ -0,0 +1,180 @@
+import configparser
+from typing import Dict, List, Tuple
+
+import numpy as np
+from loguru import logger
+
+from .audio import Audio, AudioFactory, ExcitationCache, IAudio, SweepGenerator, mic_channels, speaker_channels
+from .utils.fft import FFT
+
+
+class SweepPlanner:
+    """
+    Chooses the sweep duration and level for a scan from the measured noise floor.
+
+    At the start of a scan the planner records the ambient noise through the audio stream and
+    plays one short probe sweep at the reference (starting) position. Both recordings are
+    deconvolved with the probe's inverse filter. Comparing the probe IR with the deconvolved
+    noise per octave band gives the SNR the probe reaches. Its worst band inside the planning
+    band is scaled to the target.
+
+    The SNR of an exponential sweep IR grows with 10*log10(duration) and 20*log10(level), and
+    averaging adds 10*log10(num_sweeps). The planner uses the highest allowed level, and then the
+    shortest duration that reaches the target. If even the minimum duration overshoots, the
+    level is lowered instead, which keeps the speaker's distortion down.
+
+    :ivar target_snr_db: SNR the averaged IR must reach in every band.
+    :type target_snr_db: float
+    :ivar band_hz: Frequency range (low, high) the target applies to.
+    :type band_hz: Tuple[float, float]
+    :ivar min_dur_s: Shortest sweep duration the planner may choose.
+    :type min_dur_s: float
+    :ivar max_dur_s: Longest sweep duration the planner may choose.
+    :type max_dur_s: float
+    :ivar min_level_dbfs: Lowest sweep level the planner may choose.
+    :type min_level_dbfs: float
+    :ivar max_level_dbfs: Highest sweep level the planner may choose.
+    :type max_level_dbfs: float
+    :ivar probe_dur_s: Duration of the probe sweep (and of the noise recording).
+    :type probe_dur_s: float
+    """
+
+    def __init__(self, target_snr_db: float, band_hz: Tuple[float, float] = (50.0, 16000.0),
+                 min_dur_s: float = 0.5, max_dur_s: float = 10.0, min_level_dbfs: float = -40.0,
+                 max_level_dbfs: float = -6.0, probe_dur_s: float = 0.5):
+        if not 0 < min_dur_s <= max_dur_s:
+            raise ValueError(f'Need 0 < min_dur_s <= max_dur_s, got {min_dur_s} and {max_dur_s}')
+        if min_level_dbfs > max_level_dbfs:
+            raise ValueError(f'min_level_dbfs ({min_level_dbfs}) is above max_level_dbfs ({max_level_dbfs})')
+        self.target_snr_db = target_snr_db
+        self.band_hz = band_hz
+        self.min_dur_s = min_dur_s
+        self.max_dur_s = max_dur_s
+        self.min_level_dbfs = min_level_dbfs
+        self.max_level_dbfs = max_level_dbfs
+        self.probe_dur_s = probe_dur_s
+
+    @staticmethod
+    def from_config(config_file: str, sweep_section: str = 'sweep') -> "SweepPlanner":
+        """Creates a planner from the plan_* options of the sweep section."""
+        config = configparser.ConfigParser(inline_comment_prefixes=('#', ';'))
+        config.read(config_file)
+        band = [float(f) for f in config.get(sweep_section, 'plan_band_hz', fallback='50, 16000').split(',')]
+        if len(band) != 2:
+            raise ValueError(f'[{sweep_section}] plan_band_hz needs a low and a high frequency')
+        return SweepPlanner(
+            target_snr_db=config.getfloat(sweep_section, 'plan_target_snr_db', fallback=60.0),
+            band_hz=(band[0], band[1]),
+            min_dur_s=config.getfloat(sweep_section, 'plan_min_dur_s', fallback=0.5),
+            max_dur_s=config.getfloat(sweep_section, 'plan_max_dur_s', fallback=10.0),
+            min_level_dbfs=config.getfloat(sweep_section, 'plan_min_level_dbfs', fallback=-40.0),
+            max_level_dbfs=config.getfloat(sweep_section, 'plan_max_level_dbfs', fallback=-6.0),
+            probe_dur_s=config.getfloat(sweep_section, 'plan_probe_dur_s', fallback=0.5),
+        )
+
+    def plan(self, audio: IAudio) -> Dict[str, float]:
+        """
+        Measures noise and a probe sweep, and configures the audio chain with the planned sweep.
+
+        :return: The planned 'sweep_dur_s', 'sweep_level_dbfs', the probe's worst band SNR
+                 'probe_snr_db' and the expected 'capture_s' per point.
+        """
+        if not isinstance(audio, Audio):
+            logger.warning('Sweep planner needs a real or loopback audio interface, keeping the configured sweep')
+            return {}
+
+        probe_level = audio.cap['sweep_level_dbfs']
+        probe_snr_db = self.measure_probe_snr(audio, probe_level)
+        duration, level = self.solve(probe_snr_db, self.probe_dur_s, probe_level, audio.cap['num_sweeps'])
+        try:
+            AudioFactory.check_sweep_layout(dict(audio.cap, sweep_dur_s=duration, sweep_level_dbfs=level), audio.hw)
+        except ValueError as e:
+            raise ValueError(f'Sweep planner: planned sweep of {duration:.2f} s does not fit the configuration '
+                             f'(raise plan_min_dur_s): {e}') from e
+
+        # Reconfigure the sweep; the cached excitation and inverse spectra belong to the old one
+        audio.configure_excitation(sweep_dur_s=duration, sweep_level_dbfs=level)
+
+        capture_s = audio._get_excitation().total_len / audio.hw['fs']
+        logger.info(f'Sweep planner: probe reached {probe_snr_db:.1f} dB (worst band). Planned sweep {duration:.2f} s '
+                    f'at {level:.1f} dBFS x {audio.cap["num_sweeps"]} for {self.target_snr_db:.0f} dB, '
+                    f'expected capture time {capture_s:.2f} s per point')
+        return {'sweep_dur_s': duration, 'sweep_level_dbfs': level, 'probe_snr_db': probe_snr_db,
+                'capture_s': capture_s}
+
+    def solve(self, probe_snr_db: float, probe_dur_s: float, probe_level_dbfs: float,
+              num_sweeps: int = 1) -> Tuple[float, float]:
+        """
+        Shortest duration (and then lowest level) that lifts the probe's SNR to the target.
+
+        :return: Sweep duration in s and level in dBFS, within the configured limits.
+        """
+        # SNR still missing from a single probe sweep, after averaging
+        missing_db = self.target_snr_db - 10 * np.log10(num_sweeps) - probe_snr_db
+
+        # Full level first; the rest comes from duration
+        level_gain_db = self.max_level_dbfs - probe_level_dbfs
+        duration = probe_dur_s * 10 ** ((missing_db - level_gain_db) / 10)
+        duration = float(np.clip(duration, self.min_dur_s, self.max_dur_s))
+        if duration >= self.max_dur_s and missing_db - level_gain_db > 10 * np.log10(self.max_dur_s / probe_dur_s):
+            logger.warning(f'Sweep planner: target of {self.target_snr_db:.0f} dB is out of reach, '
+                           f'using the longest sweep ({self.max_dur_s:.1f} s) at {self.max_level_dbfs:.1f} dBFS')
+
+        # Duration gain is fixed now; only as much level as still needed
+        level = probe_level_dbfs + missing_db - 10 * np.log10(duration / probe_dur_s)
+        level = float(np.clip(level, self.min_level_dbfs, self.max_level_dbfs))
+        return round(duration, 2), round(level, 1)
+
+    def measure_probe_snr(self, audio: Audio, level_dbfs: float) -> float:
+        """Records noise and a probe sweep and returns the probe IR's SNR in its worst octave band."""
+        fs = audio.hw['fs']
+        probe = SweepGenerator(fs, self.probe_dur_s, audio.sweep_gen.f1, level_dbfs)
+        s_fund, _, inv_sweep = probe.generate()
+        # Played like the scan's sweep, so the probe's passband level is the level being planned from
+        s_play = ExcitationCache.playback_sweep(s_fund, level_dbfs, fs, audio.protection_filter)
+
+        # Probe timeline: settle, sweep on the first driver, room for the IR
+        pre = int(round(audio.cap['pre_sil_ms'] / 1000.0 * fs))
+        ir_len = int(round(audio.cap.get('ir_len_ms', 200.0) / 1000.0 * fs))
+        out_channels = speaker_channels(audio.hw) + [audio.hw['ch_out_ref']]
+        out_frames = np.zeros((pre + len(s_play) + ir_len, max(out_channels) + 1), dtype=np.float32)
+        out_frames[pre:pre + len(s_play), speaker_channels(audio.hw)[0]] = s_play
+
+        logger.info(f'Sweep planner: recording {len(out_frames) / fs:.2f} s of ambient noise')
+        noise_mic, _ = audio.play_and_record(np.zeros_like(out_frames))
+        logger.info(f'Sweep planner: probe sweep of {self.probe_dur_s:.2f} s at {level_dbfs:.1f} dBFS')
+        probe_mic, _ = audio.play_and_record(out_frames)
+
+        worst = np.inf
+        for ch in range(len(mic_channels(audio.hw))):
+            h_probe = self._deconvolve(audio, np.atleast_2d(probe_mic)[ch], inv_sweep)
+            h_noise = self._deconvolve(audio, np.atleast_2d(noise_mic)[ch], inv_sweep)
+            # The same IR window in both: from just before the probe's peak, ir_len long
+            start = max(0, int(np.argmax(np.abs(h_probe))) - int(0.001 * fs))
+            band_snr = self.band_snr_db(h_probe[start:start + ir_len], h_noise[start:start + ir_len], fs)
+            worst = min(worst, min(band_snr.values()))
+        return float(worst)
+
+    @staticmethod
+    def _deconvolve(audio: Audio, rec: np.ndarray, inv_sweep: np.ndarray) -> np.ndarray:
+        ir_full, _ = audio.deconv_engine.process_ir(rec, inv_sweep)
+        return ir_full
+
+    def band_snr_db(self, h_signal: np.ndarray, h_noise: np.ndarray, fs: int) -> Dict[float, float]:
+        """SNR per octave band (keyed on the band centre frequency) inside the planning band."""
+        n = len(h_signal)
+        freqs = FFT.rfftfreq(n, 1.0 / fs)
+        p_signal = np.abs(FFT.rfft(h_signal)) ** 2
+        p_noise = np.abs(FFT.rfft(h_noise, n=n)) ** 2
+
+        snr: Dict[float, float] = {}
+        for centre in self._octave_centres():
+            band = (freqs >= centre / np.sqrt(2)) & (freqs < centre * np.sqrt(2))
+            if np.any(band):
+                snr[centre] = float(10 * np.log10(np.sum(p_signal[band]) / (np.sum(p_noise[band]) + 1e-30)))
+        return snr
+
+    def _octave_centres(self) -> List[float]:
+        low, high = self.band_hz
+        centres = 1000.0 * 2.0 ** np.arange(-10, 6)
+        return [float(c) for c in centres if low <= c <= high]
@@ -0,0 +1,240 @@
+import argparse
+import os
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from pathlib import Path
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+
+import numpy as np
+from loguru import logger
+
+from .audio import Audio, AudioFactory
+from .dataset import ScanDataset
+from .datatypes import CylindricalPosition
+from .result_writer import ResultWriter
+
+# Per worker process state, created once by _init_worker
+_worker_audio: Optional[Audio] = None
+
+
+class _CollectedDataset:
+    """Stands in for the scan dataset in a worker; the records are appended by the parent process."""
+
+    def __init__(self, path: Path, fs: int, attrs: Dict[str, Any]):
+        self.path = path
+        self.fs = fs
+        self.attrs = attrs
+        self.records: List[Dict[str, Any]] = []
+
+    def close(self) -> None:
+        """Nothing to close; the parent process owns the file."""
+
+    def append(self, position: CylindricalPosition, order_id: str, ir_linear: np.ndarray, ir_full: np.ndarray,
+               metrics: Dict[str, float], timestamp: Optional[float] = None) -> None:
+        self.records.append({'position': (position.r(), position.t(), position.z()), 'order_id': order_id,
+                             'ir_linear': ir_linear, 'ir_full': ir_full, 'metrics': metrics,
+                             'timestamp': timestamp, 'path': str(self.path), 'fs': self.fs, 'attrs': self.attrs})
+
+
+class ReprocessError(Exception):
+    """
+    Raised when one or more raw captures could not be reprocessed.
+
+    :ivar results: Metrics (one entry per driver and mic) of the captures that were reprocessed successfully, keyed by file.
+    :type results: Dict[str, List[Dict[str, float]]]
+    :ivar failures: Error message per file that failed.
+    :type failures: Dict[str, str]
+    """
+
+    def __init__(self, results: Dict[str, List[Dict[str, float]]], failures: Dict[str, str]):
+        super().__init__(f'{len(failures)} of {len(results) + len(failures)} raw capture(s) could not be reprocessed')
+        self.results = results
+        self.failures = failures
+
+
+def load_raw_capture(path: Path) -> Dict[str, Any]:
+    """
+    Loads a raw capture written by Audio when ``save_raw_measurement`` is enabled.
+
+    :return: Dictionary with the recordings, the capture timeline, the excitation settings (see
+             Audio.excitation_settings; empty for captures stored before they were recorded), the
+             position and the order id.
+    """
+    with np.load(path) as data:
+        r, t, z = data['position']
+        excitation = {k[len('excitation_'):]: data[k] for k in data.files if k.startswith('excitation_')}
+        if 'marker_bw_hz' in excitation:
+            excitation['marker_bw_hz'] = tuple(float(f) for f in excitation['marker_bw_hz'])
+        return {
+            'rec_mic': data['rec_mic'],
+            'rec_loop': data['rec_loop'],
+            'fs': int(data['fs']),
+            'num_sweeps': int(data['num_sweeps']),
+            'pre_samps_settle': int(data['pre_samps_settle']),
+            'slot_len': int(data['slot_len']),
+            'sweep_len': int(data['sweep_len']),
+            'excitation': {k: v if isinstance(v, tuple) else float(v) for k, v in excitation.items()},
+            'position': CylindricalPosition(float(r), float(t), float(z)),
+            'order_id': str(data['order_id']),
+            'timestamp': float(data['timestamp']) if 'timestamp' in data else None,
+        }
+
+
+def _init_worker(config_file: str, audio_section: str, output_dir: str) -> None:
+    """Builds the processing chain once per worker process."""
+    global _worker_audio
+    components = AudioFactory.create_components(config_file, audio_section)
+    # Never rewrite the raw captures that are being reprocessed
+    # The parent process checked and creates the output datasets
+    components['capture_config'] = dict(components['capture_config'], save_raw=False, dataset_resume=True)
+    # The worker processes are the parallelism; write synchronously within each of them
+    components['writer'] = ResultWriter()
+    _worker_audio = Audio(**components, output_dir=Path(output_dir))
+    # Several processes cannot append to one dataset file, so records go back to the parent
+    _worker_audio.datasets = [_CollectedDataset(path, _worker_audio.hw['fs'], _worker_audio.dataset_attrs(d))
+                              for d, path in enumerate(_worker_audio.dataset_paths)]
+
+
+def _reprocess_file(path: str) -> Tuple[List[Dict[str, float]], List[Dict[str, Any]]]:
+    """
+    Aligns, deconvolves, verifies and saves a single raw capture in a worker process.
+
+    :return: The metrics (one entry per driver and mic) and the dataset records of the point.
+    """
+    audio = _worker_audio
+    raw = load_raw_capture(Path(path))
+    # Rebuild the excitation the point was captured with, which can differ from the config file
+    # when the sweep planner chose the sweep
+    if raw['excitation'] and raw['excitation'] != audio.excitation_settings():
+        audio.configure_excitation(**raw['excitation'])
+
+    # The excitation (and with it the inverse sweep and its filtered spectrum) is cached per worker
+    bundle = audio._get_excitation()
+    expected = {
+        'fs': audio.hw['fs'],
+        'num_sweeps': audio.cap['num_sweeps'],
+        'pre_samps_settle': bundle.pre_samps_settle,
+        'slot_len': bundle.slot_len,
+        'sweep_len': bundle.sweep_len,
+    }
+    mismatches = [f'{k}: capture {raw[k]}, config {v}' for k, v in expected.items() if raw[k] != v]
+    if mismatches:
+        raise ValueError(f'{path} was captured with a different excitation ({", ".join(mismatches)}). '
+                         f'Only alignment, deconvolution and verification settings can change offline.')
+
+    capture = {'bundle': bundle, 'rec_mic': raw['rec_mic'], 'rec_loop': raw['rec_loop'],
+               'timestamp': raw['timestamp']}
+    metrics = audio._process_capture(capture, raw['position'], raw['order_id'])
+    audio.flush()
+    records = []
+    for dataset in audio.datasets:
+        records, dataset.records = records + dataset.records, []
+    return metrics, records
+
+
+class BatchReprocessor:
+    """
+    Reruns alignment, deconvolution and verification for stored raw captures of a whole scan under
+    a (new) configuration, spread over all CPU cores.
+
+    Every worker process builds the processing chain from the configuration once and reuses its
+    cached excitation and inverse filter for all captures it handles. The sweep and marker are
+    rebuilt from the settings stored with each capture, so a sweep chosen by the sweep planner
+    is reprocessed as played. Results are written to
+    ``output_dir`` with the same layout as a live scan (Recordings, Distortion).
+
+    :ivar _config_file: Configuration used for reprocessing.
+    :type _config_file: str
+    :ivar _audio_section: Name of the audio section in the configuration.
+    :type _audio_section: str
+    :ivar _output_dir: Root directory for the reprocessed results.
+    :type _output_dir: Path
+    :ivar _max_workers: Number of worker processes; None uses all CPU cores.
+    :type _max_workers: Optional[int]
+    """
+
+    def __init__(self, config_file: str, audio_section: str = 'audio', output_dir: Path = Path('./Reprocessed'),
+                 max_workers: Optional[int] = None):
+        self._config_file = config_file
+        self._audio_section = audio_section
+        self._output_dir = Path(output_dir)
+        self._max_workers = max_workers
+
+    @staticmethod
+    def find_raw_captures(raw_dir: Path) -> List[Path]:
+        """Lists the raw capture files in a directory."""
+        return sorted(Path(raw_dir).glob('*_raw.npz'))
+
+    def run(self, raw_files: Iterable[Path]) -> Dict[str, List[Dict[str, float]]]:
+        """
+        Reprocesses the given raw capture files.
+
+        :param raw_files: Raw capture (.npz) files to reprocess.
+        :return: Metrics per file, one entry per driver and mic.
+        :raises ReprocessError: If any file failed; the remaining files are still processed.
+        :raises FileExistsError: If the output directory already holds a scan dataset.
+        """
+        files = [str(f) for f in raw_files]
+        self._check_output_datasets()
+        self._output_dir.mkdir(parents=True, exist_ok=True)
+        workers = self._max_workers or os.cpu_count() or 1
+        logger.info(f'Reprocessing {len(files)} raw capture(s) on {workers} worker process(es)')
+
+        results: Dict[str, List[Dict[str, float]]] = {}
+        failures: Dict[str, str] = {}
+        datasets: Dict[str, ScanDataset] = {}
+        with ProcessPoolExecutor(max_workers=workers, initializer=_init_worker,
+                                 initargs=(self._config_file, self._audio_section, str(self._output_dir))) as pool:
+            futures = {pool.submit(_reprocess_file, f): f for f in files}
+            for done, future in enumerate(as_completed(futures), start=1):
+                path = futures[future]
+                try:
+                    results[path], records = future.result()
+                    for record in records:
+                        if record['path'] not in datasets:
+                            datasets[record['path']] = self._open_dataset(record)
+                        datasets[record['path']].append(CylindricalPosition(*record['position']), record['order_id'],
+                                       record['ir_linear'], record['ir_full'], record['metrics'],
+                                       record['timestamp'])
+                except Exception as e:
+                    logger.error(f'Reprocessing {path} failed: {e}')
+                    failures[path] = str(e)
+                if done % 100 == 0:
+                    logger.info(f'Reprocessed {done}/{len(files)} raw capture(s)')
+        for dataset in datasets.values():
+            dataset.close()
+
+        if failures:
+            raise ReprocessError(results, failures)
+        return results
+
+    def _check_output_datasets(self) -> None:
+        """Refuses to mix the reprocessed points into a dataset left in the output directory."""
+        components = AudioFactory.create_components(self._config_file, self._audio_section)
+        capture_config = components['capture_config']
+        if capture_config['output_format'] not in ('dataset', 'both'):
+            return
+        for directory in Audio.driver_dirs(self._output_dir, components['hw_config']):
+            path = directory / capture_config['dataset_file']
+            if path.exists():
+                raise FileExistsError(f'Scan dataset {path} already exists; reprocess into an empty output directory')
+
+    @staticmethod
+    def _open_dataset(record: Dict[str, Any]) -> ScanDataset:
+        return ScanDataset.create(Path(record['path']), record['fs'], len(record['ir_linear']),
+                                  len(record['ir_full']), list(record['metrics']), record['attrs'])
+
+
+def _parse_args(argv: Optional[List[str]] = None) -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description='Reprocess raw captures of a scan under a new configuration.')
+    parser.add_argument('config', help='configuration file with the new processing settings')
+    parser.add_argument('raw_dir', help='directory with the *_raw.npz captures')
+    parser.add_argument('--output', default='./Reprocessed', help='output directory (default: ./Reprocessed)')
+    parser.add_argument('--workers', type=int, default=None, help='worker processes (default: all cores)')
+    parser.add_argument('--audio-section', default='audio', help='audio section in the config (default: audio)')
+    return parser.parse_args(argv)
+
+
+if __name__ == "__main__":
+    args = _parse_args()
+    reprocessor = BatchReprocessor(args.config, args.audio_section, Path(args.output), args.workers)
+    reprocessor.run(BatchReprocessor.find_raw_captures(Path(args.raw_dir)))
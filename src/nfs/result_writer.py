@@ -0,0 +1,181 @@
+import json
+import os
+import queue
+import threading
+from pathlib import Path
+from typing import Any, Callable, List, Optional
+
+import numpy as np
+import soundfile as sf
+from loguru import logger
+
+from .instrumentation import PointTimings, current_point, recording, span
+
+
+class ResultWriteError(Exception):
+    """Raised when one or more result files could not be written."""
+
+
+class ResultWriter:
+    """
+    Writes measurement result files (WAV, JSON, ...) off the measurement thread.
+
+    Writes are queued on a bounded queue and executed by one or more writer threads. When the
+    queue is full, ``submit`` blocks, so a slow disk throttles the scan instead of exhausting
+    memory. With ``num_threads = 0`` every write runs synchronously in the caller.
+
+    Durability is controlled by ``fsync``:
+
+    * ``none``  - leave flushing to the OS (fastest).
+    * ``file``  - fsync every file right after it has been written.
+    * ``batch`` - fsync all files written since the previous barrier when ``flush()`` is called.
+
+    Write errors are collected and re-raised as ResultWriteError from the next ``submit`` or
+    ``flush`` call, so a failing disk stops the scan.
+
+    :ivar _num_threads: Number of background writer threads; 0 writes synchronously.
+    :type _num_threads: int
+    :ivar _fsync: The fsync policy (none, file or batch).
+    :type _fsync: str
+    """
+    FSYNC_POLICIES = ('none', 'file', 'batch')
+
+    def __init__(self, num_threads: int = 0, max_queue: int = 64, fsync: str = 'none'):
+        if fsync not in self.FSYNC_POLICIES:
+            raise ValueError(f'Unknown fsync policy {fsync!r}, expected one of {self.FSYNC_POLICIES}')
+        self._num_threads = num_threads
+        self._fsync = fsync
+        self._queue: "queue.Queue[Optional[tuple]]" = queue.Queue(maxsize=max_queue)
+        self._errors: List[str] = []
+        self._unsynced: List[Path] = []
+        self._lock = threading.Lock()
+        self._threads = []
+        for i in range(num_threads):
+            t = threading.Thread(target=self._worker, name=f'nfs-writer-{i}', daemon=True)
+            t.start()
+            self._threads.append(t)
+
+    def submit(self, path: Path, write_fn: Callable[[Path], None]) -> None:
+        """
+        Schedules write_fn(path). The caller must not modify data captured by write_fn afterwards.
+
+        :raises ResultWriteError: If an earlier write failed.
+        """
+        self._raise_errors()
+        # Book the write on the point that produced it, also when a writer thread executes it.
+        # The point stays open until the write is done.
+        point = current_point()
+        if point is not None:
+            point.hold()
+        if self._num_threads == 0:
+            self._execute(path, write_fn, point)
+            self._raise_errors()
+        else:
+            self._queue.put((path, write_fn, point))
+
+    def write_wav(self, path: Path, data: np.ndarray, fs: int, title: str, subtype: Optional[str] = None) -> None:
+        """Schedules a WAV file with the title embedded in the INAM and ICMT RIFF chunks."""
+        self.submit(path, lambda p: self._write_wav(p, data, fs, title, subtype))
+
+    def write_json(self, path: Path, obj: Any) -> None:
+        """Schedules a JSON file."""
+        def write(p: Path) -> None:
+            with open(p, 'w') as f:
+                json.dump(obj, f, indent=4)
+        self.submit(path, write)
+
+    def flush(self) -> None:
+        """
+        Barrier: waits until every submitted write has finished (and, for the batch policy, has been
+        fsynced).
+
+        :raises ResultWriteError: If any write failed.
+        """
+        self._queue.join()
+        if self._fsync == 'batch':
+            with self._lock:
+                paths, self._unsynced = self._unsynced, []
+            for path in paths:
+                try:
+                    self._fsync_path(path)
+                except OSError as e:
+                    self._record_error(path, e)
+        self._raise_errors()
+
+    def close(self) -> None:
+        """Flushes outstanding writes and stops the writer threads."""
+        try:
+            self.flush()
+        finally:
+            for _ in self._threads:
+                self._queue.put(None)
+            for t in self._threads:
+                t.join()
+            self._threads = []
+
+    def _worker(self) -> None:
+        while True:
+            item = self._queue.get()
+            try:
+                if item is None:
+                    return
+                self._execute(*item)
+            finally:
+                self._queue.task_done()
+
+    def _execute(self, path: Path, write_fn: Callable[[Path], None], point: Optional[PointTimings] = None) -> None:
+        try:
+            size = self._file_size(path) if point is not None else 0
+            with recording(point), span('write'):
+                write_fn(path)
+                if self._fsync == 'file':
+                    self._fsync_path(path)
+            if point is not None:
+                # Growth rather than size, so an append to a scan dataset counts only the new point
+                point.increment('bytes_written', max(self._file_size(path) - size, 0))
+            if self._fsync == 'batch':
+                with self._lock:
+                    self._unsynced.append(path)
+        except Exception as e:
+            self._record_error(path, e)
+        finally:
+            if point is not None:
+                point.release()
+
+    def _record_error(self, path: Path, error: Exception) -> None:
+        logger.error(f'Failed to write {path}: {error}')
+        with self._lock:
+            self._errors.append(f'{path}: {error}')
+
+    def _raise_errors(self) -> None:
+        with self._lock:
+            errors, self._errors = self._errors, []
+        if errors:
+            raise ResultWriteError(f'{len(errors)} result file(s) could not be written: ' + '; '.join(errors))
+
+    @staticmethod
+    def _file_size(path: Path) -> int:
+        try:
+            return os.path.getsize(path)
+        except OSError:
+            return 0
+
+    @staticmethod
+    def _fsync_path(path: Path) -> None:
+        with open(path, 'rb+') as f:
+            os.fsync(f.fileno())
+
+    @staticmethod
+    def _write_wav(path: Path, data: np.ndarray, fs: int, title: str, subtype: Optional[str]) -> None:
+        channels = data.shape[1] if len(data.shape) > 1 else 1
+
+        kwargs = {'mode': 'w', 'samplerate': fs, 'channels': channels}
+        if subtype:
+            kwargs['subtype'] = subtype
+
+        with sf.SoundFile(str(path), **kwargs) as f:
+            # f.title writes the INAM chunk
+            f.title = title
+            # f.comment writes the ICMT chunk; Windows is more likely to show this
+            f.comment = title
+            f.write(data)
@@ -0,0 +1,122 @@
+import configparser
+import json
+import math
+import socket
+import threading
+from pathlib import Path
+from typing import Any, Dict, Optional, Tuple
+
+from loguru import logger
+
+from .instrumentation import PointTimings
+
+
+class TelemetrySink:
+    """
+    Writes one compact JSON record per measured point, for monitoring a scan from another process.
+
+    Records are appended to a newline-delimited JSON file (one object per line, flushed per
+    record, so `tail -f` and pandas.read_json(lines=True) both work) and, optionally, sent as
+    UDP datagrams to a local port. UDP never blocks the scan: without a listener the datagrams
+    are dropped. A record holds:
+
+    - scan, point: start time of the scan (s since the epoch) and number of the point in it
+    - r, t, z: position of the point
+    - started, finished: wall clock times the point was started and fully written
+    - stages_ms: time spent per stage (see nfs.instrumentation.STAGES)
+    - metrics: SNR, THD, PSR and crest factor, one entry per driver and mic
+    - xruns: over- and underflows reported by the audio stream during the capture
+    - bytes_written: bytes added to the result files
+
+    Points finish in any order when they are post-processed on worker threads, so records are
+    not necessarily in point order.
+
+    :ivar path: NDJSON file the records are appended to, None for UDP only.
+    :type path: Optional[Path]
+    :ivar udp_address: (host, port) the records are published to, None to not publish.
+    :type udp_address: Optional[Tuple[str, int]]
+    :ivar records: Number of records emitted.
+    :type records: int
+    """
+
+    def __init__(self, path: Optional[Path] = None, udp_address: Optional[Tuple[str, int]] = None):
+        self.path = None if path is None else Path(path)
+        self.udp_address = udp_address
+        self.records = 0
+        self._file = None
+        self._socket = None
+        self._lock = threading.Lock()
+        if self.path is not None:
+            self.path.parent.mkdir(parents=True, exist_ok=True)
+            self._file = open(self.path, 'a', buffering=1)
+        if udp_address is not None:
+            self._socket = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+            self._socket.setblocking(False)
+
+    @staticmethod
+    def record(point: PointTimings, scan: float) -> Dict[str, Any]:
+        """The telemetry record of a finished point."""
+        position = point.position
+        return {
+            'scan': round(scan, 3),
+            'point': point.index,
+            'r': None if position is None else position.r(),
+            't': None if position is None else position.t(),
+            'z': None if position is None else position.z(),
+            'started': round(point.started, 3),
+            'finished': None if point.finished is None else round(point.finished, 3),
+            'stages_ms': {stage: round(s * 1e3, 2) for stage, s in point.as_dict().items()},
+            'metrics': [{k: TelemetrySink._number(v) for k, v in m.items()} for m in point.metrics],
+            'xruns': point.counters.get('xruns', 0),
+            'bytes_written': point.counters.get('bytes_written', 0),
+        }
+
+    @staticmethod
+    def _number(value: Any) -> Optional[float]:
+        """Rounded value; None for inf and NaN, which strict JSON readers reject."""
+        value = float(value)
+        return round(value, 3) if math.isfinite(value) else None
+
+    def emit(self, record: Dict[str, Any]) -> None:
+        """Appends the record to the file and publishes it. Safe to call from any thread."""
+        line = json.dumps(record, separators=(',', ':'), default=str)
+        with self._lock:
+            if self._file is not None:
+                self._file.write(line + '\n')
+            if self._socket is not None:
+                try:
+                    self._socket.sendto(line.encode(), self.udp_address)
+                except OSError as e:
+                    logger.debug(f'Telemetry datagram dropped: {e}')
+            self.records += 1
+
+    def close(self) -> None:
+        with self._lock:
+            if self._file is not None:
+                self._file.close()
+                self._file = None
+            if self._socket is not None:
+                self._socket.close()
+                self._socket = None
+
+    @staticmethod
+    def from_config(config_file: str, section: str = 'nfs') -> Optional["TelemetrySink"]:
+        """
+        Creates the sink from 'telemetry_file' and 'telemetry_udp' (host:port) in the section.
+
+        :return: The sink, or None when neither option is set.
+        """
+        config = configparser.ConfigParser(inline_comment_prefixes=('#', ';'))
+        config.read(config_file)
+        path = config.get(section, 'telemetry_file', fallback='').strip()
+        udp = config.get(section, 'telemetry_udp', fallback='').strip()
+        if not path and not udp:
+            return None
+
+        address = None
+        if udp:
+            host, _, port = udp.rpartition(':')
+            if not host or not port.isdigit():
+                raise ValueError(f"[{section}] telemetry_udp must be host:port, got '{udp}'")
+            address = (host, int(port))
+        return TelemetrySink(Path(path) if path else None, address)
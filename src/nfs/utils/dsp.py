@@ -1,6 +1,8 @@
 import numpy as np
 import math
-from typing import Tuple
+from typing import Optional, Tuple
+
+from .fft import FFT
 
 
 class DSPUtils:
@@ -13,6 +15,28 @@ class DSPUtils:
             return "NA"
         return str(val).replace(".", "p")
 
+    @staticmethod
+    def ir_file_names(r: float, t: float, z: float, order_id: str,
+                      naming_convention: str = "dimitri") -> Tuple[str, str, str]:
+        """
+        Builds the file names of a measurement point.
+
+        :return: (base name, linear IR file name, distortion IR file name)
+        """
+        if naming_convention == 'tom':
+            # tom's Format: (r, t, z).wav
+            base_name = f"({r:.1f}, {t:.1f}, {z:.1f})"
+            return base_name, f"{base_name}.wav", f"{base_name}_dist.wav"
+
+        # dimitri's Format: ID_rX_phY_zZ_ir.wav
+        base_name = (
+            f"{order_id}_"
+            f"r{DSPUtils.fmt_num_for_name(r)}_"
+            f"ph{DSPUtils.fmt_num_for_name(t)}_"
+            f"z{DSPUtils.fmt_num_for_name(z)}"
+        )
+        return base_name, f"{base_name}_ir.wav", f"{base_name}_ir_dist.wav"
+
     @staticmethod
     def db_to_lin(db: float) -> float:
         """Converts dBFS to linear amplitude scale."""
@@ -26,11 +50,11 @@ class DSPUtils:
         Args:
             :param fs: sample rate
             :param fade_ms: fade duration in ms
-            :param sig: signal to fade
+            :param sig: signal to fade; multichannel signals are faded along the last axis
             :param side: 'in' (start), 'out' (end), or 'both'.
         """
         n_fade = int(round(fade_ms / 1000.0 * fs))
-        if n_fade <= 0 or n_fade >= len(sig):
+        if n_fade <= 0 or n_fade >= sig.shape[-1]:
             return sig
 
         # Generate ramp: 0 to 1 (half-cosine)
@@ -38,26 +62,37 @@ class DSPUtils:
         y = sig.copy()
 
         if side in ["both", "in"]:
-            y[:n_fade] *= ramp
+            y[..., :n_fade] *= ramp
 
         if side in ["both", "out"]:
             # Fade out uses the reverse of the ramp
-            y[-n_fade:] *= ramp[::-1]
+            y[..., -n_fade:] *= ramp[::-1]
 
         return y
 
     @staticmethod
-    def rfft_xcorr(a: np.ndarray, b: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
-        """Fast Cross-Correlation via RFFT."""
-        # Calculate next power of 2 for optimal FFT performance and linear convolution
-        n = int(2 ** np.ceil(np.log2(len(a) + len(b) - 1)))
+    def xcorr_fft_len(len_a: int, len_b: int) -> int:
+        """FFT length used by rfft_xcorr for inputs of the given lengths."""
+        # Fast transform length that still holds the full linear correlation
+        return FFT.fast_len(len_a + len_b - 1)
+
+    @staticmethod
+    def rfft_xcorr(a: np.ndarray, b: np.ndarray, B: Optional[np.ndarray] = None) -> Tuple[np.ndarray, np.ndarray]:
+        """
+        Fast Cross-Correlation via RFFT.
+
+        :param B: Optional precomputed rfft of 'b' at length xcorr_fft_len(len(a), len(b)),
+            to avoid re-transforming a fixed reference.
+        """
+        n = DSPUtils.xcorr_fft_len(len(a), len(b))
 
         # Transform signal 'a' and 'b' into the frequency domain
-        A = np.fft.rfft(a, n=n)  # jklafklfkaf
-        B = np.fft.rfft(b, n=n)
+        A = FFT.rfft(a, n=n)
+        if B is None:
+            B = FFT.rfft(b, n=n)
 
         # Multiply by complex conjugate to perform correlation, then return to time domain
-        x = np.fft.irfft(A * np.conj(B), n=n)
+        x = FFT.irfft(A * np.conj(B), n=n, overwrite_x=True)
 
         # Shift the zero-lag component to the center of the array
         x = np.roll(x, len(b) - 1)
@@ -0,0 +1,105 @@
+import threading
+from collections import OrderedDict
+from typing import Optional, Tuple
+
+import numpy as np
+import scipy.fft
+
+
+class FFT:
+    """
+    Shared FFT backend for all DSP stages.
+
+    Wraps scipy.fft with one process wide worker count and picks fast (5-smooth) transform
+    lengths instead of powers of two. Zero padded inputs are assembled in per-thread scratch
+    buffers that are reused between calls of the same shape, so a deconvolution of a long
+    capture does not allocate a new padded copy of the recording every time. The buffers of a
+    thread hold at most max_scratch_bytes; larger inputs are padded by scipy as usual.
+
+    scipy.fft spreads independent transforms over the workers. A (n_mics, n_samples) block is
+    transformed with one transform per mic in parallel; a single channel runs on one core.
+    """
+
+    workers: int = 1
+    max_scratch_bytes: int = 32 * 1024 * 1024
+    _local = threading.local()
+
+    @staticmethod
+    def configure(workers: int = 1) -> None:
+        """
+        Sets the number of threads for batched transforms.
+
+        :param workers: Thread count; -1 uses all cores (scipy.fft convention).
+        """
+        if workers == 0 or workers < -1:
+            raise ValueError(f'fft_workers must be -1 or a positive number, got {workers}')
+        FFT.workers = workers
+
+    @staticmethod
+    def fast_len(n: int) -> int:
+        """Smallest even transform length >= n whose only prime factors are 2, 3 and 5."""
+        return 2 * scipy.fft.next_fast_len(max(1, -(-int(n) // 2)), real=True)
+
+    @staticmethod
+    def rfft(x: np.ndarray, n: Optional[int] = None, axis: int = -1) -> np.ndarray:
+        """Real FFT along axis, zero padded (or truncated) to n points."""
+        x = np.asarray(x)
+        if n is not None and n > x.shape[axis] and axis in (-1, x.ndim - 1):
+            padded = FFT._padded(x, n)
+            if padded is not None:
+                x, n = padded, None
+        return scipy.fft.rfft(x, n=n, axis=axis, workers=FFT.workers)
+
+    @staticmethod
+    def irfft(X: np.ndarray, n: int, axis: int = -1, overwrite_x: bool = False) -> np.ndarray:
+        """
+        Inverse real FFT to n points.
+
+        :param overwrite_x: Allows the transform to reuse X as scratch space. Only for temporaries.
+        """
+        return scipy.fft.irfft(X, n=n, axis=axis, workers=FFT.workers, overwrite_x=overwrite_x)
+
+    @staticmethod
+    def fft(x: np.ndarray, n: Optional[int] = None, axis: int = -1) -> np.ndarray:
+        return scipy.fft.fft(x, n=n, axis=axis, workers=FFT.workers)
+
+    @staticmethod
+    def ifft(X: np.ndarray, n: Optional[int] = None, axis: int = -1) -> np.ndarray:
+        return scipy.fft.ifft(X, n=n, axis=axis, workers=FFT.workers)
+
+    @staticmethod
+    def rfftfreq(n: int, d: float = 1.0) -> np.ndarray:
+        return scipy.fft.rfftfreq(n, d=d)
+
+    @staticmethod
+    def _padded(x: np.ndarray, n: int) -> Optional[np.ndarray]:
+        """
+        Copies x into this thread's reusable (..., n) buffer and zeroes whatever lies beyond it.
+
+        :return: The buffer, or None when it would not fit in max_scratch_bytes.
+        """
+        key: Tuple = (x.shape[:-1], n, x.dtype.str)
+        cache = getattr(FFT._local, 'scratch', None)
+        if cache is None:
+            cache = FFT._local.scratch = OrderedDict()
+
+        entry = cache.get(key)
+        if entry is None:
+            nbytes = int(np.prod(x.shape[:-1], dtype=np.int64)) * n * x.dtype.itemsize
+            if nbytes > FFT.max_scratch_bytes:
+                return None
+            # Least recently used buffers go first
+            while cache and sum(e[0].nbytes for e in cache.values()) + nbytes > FFT.max_scratch_bytes:
+                cache.popitem(last=False)
+            entry = [np.zeros(x.shape[:-1] + (n,), dtype=x.dtype), 0]
+            cache[key] = entry
+        else:
+            cache.move_to_end(key)
+
+        buf, filled = entry
+        m = x.shape[-1]
+        buf[..., :m] = x
+        if filled > m:
+            buf[..., m:filled] = 0
+        entry[1] = m
+        return buf
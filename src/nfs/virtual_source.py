@@ -0,0 +1,170 @@
+import configparser
+from abc import ABC, abstractmethod
+from typing import List, Optional, Sequence, Tuple
+
+import numpy as np
+import scipy.special
+
+from .datatypes import CylindricalPosition
+from .utils.geometry import cyl_to_cart
+
+
+class VirtualSource(ABC):
+    """
+    Acoustic source model for the simulated interface (mode mock_interface).
+
+    A source turns the speaker signal into the pressure at a mic position. It is linear and
+    time-invariant, so it is described by its transfer function from the speaker drive signal
+    to a point in space. Coordinates are the scanner's cartesian coordinates in mm
+    (x along phi = 0, z the vertical axis).
+    """
+
+    def __init__(self, speed_of_sound: float = 343.0):
+        self.speed_of_sound = speed_of_sound
+
+    @abstractmethod
+    def frequency_response(self, mic_xyz_mm: np.ndarray, freqs: np.ndarray) -> np.ndarray:
+        """
+        Transfer function to each mic.
+
+        :param mic_xyz_mm: (n_mics, 3) mic positions in mm.
+        :param freqs: Frequencies in Hz.
+        :return: (n_mics, len(freqs)) complex transfer functions.
+        """
+        pass
+
+    def frequency_response_at(self, positions: Sequence[CylindricalPosition], freqs: np.ndarray) -> np.ndarray:
+        """Transfer function to each of the given scanner positions."""
+        return self.frequency_response(np.array([cyl_to_cart(p) for p in positions], dtype=float), freqs)
+
+
+class MonopoleSource(VirtualSource):
+    """
+    A set of point sources, each with its own gain and delay.
+
+    Every monopole contributes gain / d * exp(-j*2*pi*f*(d / c + delay)), with the distance d
+    in metres, so a gain of 1 gives unity amplitude at 1 m. A single monopole is the simplest
+    speaker; a few spaced monopoles give lobing and interference for a more varied scan.
+
+    :ivar positions_mm: (n_sources, 3) source positions in mm.
+    :type positions_mm: np.ndarray
+    :ivar gains: Amplitude of every source at 1 m.
+    :type gains: np.ndarray
+    :ivar delays_s: Extra delay of every source (e.g. a crossover) in s.
+    :type delays_s: np.ndarray
+    """
+
+    def __init__(self, positions_mm: Sequence[Sequence[float]], gains: Sequence[float],
+                 delays_s: Optional[Sequence[float]] = None, speed_of_sound: float = 343.0):
+        super().__init__(speed_of_sound)
+        self.positions_mm = np.atleast_2d(np.asarray(positions_mm, dtype=float))
+        self.gains = np.asarray(gains, dtype=float)
+        self.delays_s = np.zeros(len(self.gains)) if delays_s is None else np.asarray(delays_s, dtype=float)
+        if not len(self.positions_mm) == len(self.gains) == len(self.delays_s):
+            raise ValueError('Every monopole needs a position, a gain and a delay')
+
+    def frequency_response(self, mic_xyz_mm: np.ndarray, freqs: np.ndarray) -> np.ndarray:
+        omega = 2 * np.pi * np.asarray(freqs)
+        H = np.zeros((len(mic_xyz_mm), len(omega)), dtype=np.complex128)
+        for pos, gain, delay in zip(self.positions_mm, self.gains, self.delays_s):
+            d = np.maximum(np.linalg.norm(mic_xyz_mm - pos, axis=-1) / 1000.0, 1e-3)
+            tau = d / self.speed_of_sound + delay
+            H += (gain / d)[:, None] * np.exp(-1j * np.outer(tau, omega))
+        return H
+
+
+class BaffledPistonSource(VirtualSource):
+    """
+    A rigid circular piston in an infinite baffle, the classic model of a driver.
+
+    The pressure follows gain / d * D(theta) * exp(-j*k*d) with the piston directivity
+    D = 2 * J1(k*a*sin(theta)) / (k*a*sin(theta)): omnidirectional at low frequencies and
+    beaming above ka = 1. This is the far-field directivity applied at every distance, which is
+    good enough for realistic, position dependent test data but not a near-field reference.
+    Behind the baffle plane the response is scaled by rear_gain.
+
+    :ivar center_mm: Piston centre (x, y, z) in mm.
+    :type center_mm: np.ndarray
+    :ivar radius_mm: Piston radius in mm.
+    :type radius_mm: float
+    :ivar axis_deg: Azimuth of the piston axis in the horizontal plane (0 points along phi = 0).
+    :type axis_deg: float
+    :ivar gain: On-axis amplitude at 1 m.
+    :type gain: float
+    :ivar rear_gain: Amplitude factor behind the baffle.
+    :type rear_gain: float
+    """
+
+    def __init__(self, center_mm: Sequence[float], radius_mm: float, axis_deg: float = 0.0, gain: float = 1.0,
+                 rear_gain: float = 0.1, speed_of_sound: float = 343.0):
+        super().__init__(speed_of_sound)
+        if radius_mm <= 0:
+            raise ValueError(f'Piston radius must be positive, got {radius_mm}')
+        self.center_mm = np.asarray(center_mm, dtype=float)
+        self.radius_mm = radius_mm
+        self.axis_deg = axis_deg
+        self.gain = gain
+        self.rear_gain = rear_gain
+
+    def frequency_response(self, mic_xyz_mm: np.ndarray, freqs: np.ndarray) -> np.ndarray:
+        axis = np.array([np.cos(np.radians(self.axis_deg)), np.sin(np.radians(self.axis_deg)), 0.0])
+        v = (mic_xyz_mm - self.center_mm) / 1000.0
+        d = np.maximum(np.linalg.norm(v, axis=-1), 1e-3)
+        cos_theta = v @ axis / d
+        sin_theta = np.sqrt(np.clip(1.0 - cos_theta ** 2, 0.0, 1.0))
+
+        k = 2 * np.pi * np.asarray(freqs) / self.speed_of_sound
+        ka_sin = np.outer(sin_theta, k) * (self.radius_mm / 1000.0)
+        safe = np.where(ka_sin < 1e-9, 1.0, ka_sin)
+        directivity = np.where(ka_sin < 1e-9, 1.0, 2 * scipy.special.j1(safe) / safe)
+
+        amplitude = self.gain / d * np.where(cos_theta < 0, self.rear_gain, 1.0)
+        return amplitude[:, None] * directivity * np.exp(-1j * np.outer(d, k))
+
+
+class VirtualSourceFactory:
+    """
+    Creates a virtual source from a config section.
+
+    type = monopoles reads 'monopoles' as 'x, y, z, gain[, delay_ms]' entries (mm) separated by '|'.
+    type = piston reads 'center_mm', 'radius_mm', 'axis_deg', 'gain' and 'rear_gain'.
+    """
+
+    @staticmethod
+    def create(config_file: str, section: str = 'virtual_source') -> VirtualSource:
+        config = configparser.ConfigParser(inline_comment_prefixes=('#', ';'))
+        config.read(config_file)
+        if not config.has_section(section):
+            raise KeyError(f"Config file missing [{section}] section")
+
+        source_type = config.get(section, 'type', fallback='monopoles').strip().lower()
+        c = config.getfloat(section, 'speed_of_sound', fallback=343.0)
+
+        if source_type == 'monopoles':
+            # ';' starts an inline comment for configparser, so monopoles are separated by '|'
+            entries = VirtualSourceFactory._parse_monopoles(config.get(section, 'monopoles', fallback='0, 0, 0, 1'))
+            return MonopoleSource([e[:3] for e in entries], [e[3] for e in entries],
+                                  [e[4] / 1000.0 for e in entries], speed_of_sound=c)
+
+        if source_type == 'piston':
+            center = [float(v) for v in config.get(section, 'center_mm', fallback='0, 0, 0').split(',')]
+            if len(center) != 3:
+                raise ValueError(f'[{section}] center_mm needs x, y and z')
+            return BaffledPistonSource(center,
+                                       config.getfloat(section, 'radius_mm', fallback=80.0),
+                                       axis_deg=config.getfloat(section, 'axis_deg', fallback=0.0),
+                                       gain=config.getfloat(section, 'gain', fallback=1.0),
+                                       rear_gain=config.getfloat(section, 'rear_gain', fallback=0.1),
+                                       speed_of_sound=c)
+
+        raise ValueError(f"[{section}] unknown virtual source type '{source_type}' (monopoles or piston)")
+
+    @staticmethod
+    def _parse_monopoles(text: str) -> List[Tuple[float, float, float, float, float]]:
+        entries = []
+        for entry in text.split('|'):
+            values = [float(v) for v in entry.split(',')]
+            if len(values) not in (4, 5):
+                raise ValueError(f"Monopole '{entry.strip()}' needs x, y, z, gain and optionally delay_ms")
+            entries.append(tuple(values) if len(values) == 5 else tuple(values) + (0.0,))
+        return entries
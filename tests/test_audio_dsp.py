@@ -1,9 +1,13 @@
+import threading
+import time
+
 import pytest
 import numpy as np
 from nfs.audio import (
     MarkerGenerator, SweepGenerator, HarmonicInjector,
     ProtectionFilter, AlignmentEngine, DeconvolutionEngine,
-    DSPVerificationTool
+    DSPVerificationTool, ExcitationCache, AudioStreamSession, AlignmentDebugDumper, StreamingDeconvolver,
+    AdaptiveAveragingMonitor
 )
 from nfs.utils.dsp import DSPUtils
 
@@ -227,6 +231,25 @@ def test_alignment_engine_sync_and_average(fs):
     assert psr > 10.0
 
 
+def test_float32_precision_matches_float64(fs):
+    _, _, inv = SweepGenerator(fs, 0.2, 100, -6.0).generate()
+    rng = np.random.default_rng(3)
+    rec = (rng.standard_normal(3 * 12000) * 0.1).astype(np.float32)
+    starts, length = [0, 12000, 24000], 11000
+
+    avg64 = AlignmentEngine._average_windows(rec, starts, length, 12000)
+    avg32 = AlignmentEngine._average_windows(rec, starts, length, 12000, np.float32)
+    assert avg32.dtype == np.float32
+    np.testing.assert_allclose(avg32, avg64, atol=1e-6)
+
+    full64, lin64 = DeconvolutionEngine(fs).process_ir(avg64.astype(np.float32), inv)
+    engine32 = DeconvolutionEngine(fs, dtype=np.float32)
+    full32, lin32 = engine32.process_ir(avg32, inv)
+    assert engine32._filtered_inverse_spectrum(inv, engine32.fft_len(length, len(inv))).dtype == np.complex64
+    assert full32.dtype == np.float32
+    np.testing.assert_allclose(lin32, lin64, atol=1e-5 * np.max(np.abs(lin64)))
+
+
 def test_deconvolution_engine_simple(fs):
     engine = DeconvolutionEngine(fs)
 
@@ -301,3 +324,510 @@ def test_deconvolution_engine_farina_separation(fs):
     energy_full = np.sum(ir_full ** 2)
     energy_linear = np.sum(ir_linear ** 2)
     assert energy_full > energy_linear * 1.05  # 10% distortion should be noticeable
+
+
+def test_excitation_cache_reuses_bundle(fs):
+    hw = {'fs': fs, 'ch_out_spkr': 0, 'ch_out_ref': 1}
+    cap = {'sweep_level_dbfs': -6.0, 'pre_sil_ms': 10.0, 'post_sil_ms': 10.0, 'num_sweeps': 2}
+    sweep_gen = SweepGenerator(fs, 0.1, 20, -6.0)
+    marker_gen = MarkerGenerator(fs, 50.0, (500.0, 5000.0), -6.0)
+    cache = ExcitationCache()
+
+    bundle = cache.get(sweep_gen, marker_gen, None, None, hw, cap)
+    assert cache.get(sweep_gen, marker_gen, None, None, hw, cap) is bundle
+
+    # Timeline holds num_sweeps slots after the settle time, on both output channels
+    assert bundle.total_len == bundle.pre_samps_settle + 2 * bundle.slot_len
+    assert np.array_equal(bundle.out_frames[:, 0], bundle.tx_sweep_long)
+    assert np.array_equal(bundle.out_frames[:, 1], bundle.tx_ref_long)
+
+    # Shared buffers must not be writable by consumers
+    with pytest.raises(ValueError):
+        bundle.inv_sweep[0] = 1.0
+
+    # Changing a keyed setting builds a new bundle
+    cap_changed = dict(cap, num_sweeps=3)
+    assert cache.get(sweep_gen, marker_gen, None, None, hw, cap_changed) is not bundle
+
+
+def test_deconvolution_engine_caches_inverse_spectrum(fs):
+    engine = DeconvolutionEngine(fs, max_cache_entries=2)
+    s_fund, phase, inv = SweepGenerator(fs, 0.2, 100, -6.0).generate()
+    rec = np.zeros(len(s_fund) + 200)
+    rec[100: 100 + len(s_fund)] = s_fund
+
+    ir_first, _ = engine.process_ir(rec, inv)
+    assert len(engine._inverse_cache) == 1
+
+    ir_second, _ = engine.process_ir(rec, inv)
+    assert len(engine._inverse_cache) == 1
+    assert np.array_equal(ir_first, ir_second)
+
+    # Cache stays bounded when new inverse filters keep arriving
+    for _ in range(3):
+        engine.process_ir(rec, inv.copy())
+    assert len(engine._inverse_cache) == 2
+
+    engine.invalidate()
+    assert len(engine._inverse_cache) == 0
+    assert len(engine._mask_cache) == 0
+
+
+def test_stream_session_callback_handoff(fs):
+    hw = {'fs': fs, 'dev_in': 0, 'dev_out': 0, 'ch_in_mic': 1, 'ch_in_loop': 0,
+          'ch_out_spkr': 0, 'ch_out_ref': 1, 'blocksize': 256, 'wasapi_exclusive': False}
+    session = AudioStreamSession(hw)
+    session.use_asio_in = session.use_asio_out = False
+    frames = 256
+
+    # Idle: silence out, nothing recorded
+    outdata = np.ones((frames, 2), dtype=np.float32)
+    session._callback(np.zeros((frames, 2), dtype=np.float32), outdata, frames, None, None)
+    assert not outdata.any()
+
+    rng = np.random.default_rng(1)
+    out_frames = rng.normal(0, 0.1, (1000, 2)).astype(np.float32)
+    result = {}
+    worker = threading.Thread(target=lambda: result.update(rec=session.play_and_record(out_frames)))
+    worker.start()
+    while session._job is None:
+        time.sleep(0.001)
+
+    # Drive the callback as the audio driver would, looping output back to the inputs
+    played = []
+    while worker.is_alive():
+        outdata = np.zeros((frames, 2), dtype=np.float32)
+        indata = np.zeros((frames, 2), dtype=np.float32)
+        if played:
+            indata[:] = played[-1]
+        session._callback(indata, outdata, frames, None, None)
+        played.append(outdata.copy())
+        worker.join(timeout=0.001)
+
+    rec_mic, rec_loop = result['rec']
+    played = np.concatenate(played)
+    assert np.array_equal(played[:1000], out_frames)
+    assert np.array_equal(rec_mic[frames:], out_frames[:1000 - frames, 1])
+    assert np.array_equal(rec_loop[frames:], out_frames[:1000 - frames, 0])
+
+
+def test_stream_session_times_out_without_callbacks(fs, monkeypatch):
+    hw = {'fs': fs, 'dev_in': 0, 'dev_out': 0, 'ch_in_mic': 1, 'ch_in_loop': 0,
+          'ch_out_spkr': 0, 'ch_out_ref': 1, 'blocksize': 256, 'wasapi_exclusive': False}
+    session = AudioStreamSession(hw)
+    monkeypatch.setattr(session, 'CALLBACK_TIMEOUT_MARGIN_S', 0.05)
+
+    # The driver never calls back: the wait ends after the job's length plus the margin
+    with pytest.raises(RuntimeError, match="stopped delivering"):
+        session.play_and_record(np.zeros((100, 2), dtype=np.float32))
+    assert session._job is None
+
+
+def test_alignment_engine_matched_filter_search_window(fs):
+    engine = AlignmentEngine(fs, 1, True, 10.0, 50.0)
+
+    rng = np.random.default_rng(2)
+    ref = rng.normal(0, 1.0, 500)
+    x = np.zeros(20000)
+    x[3000:3000 + len(ref)] = ref
+    x[12000:12000 + len(ref)] = ref
+
+    # Each window only sees its own copy of the marker
+    lag_first, _, _ = engine._matched_filter_detect(x, ref, search_start=2800, search_end=3200)
+    lag_second, _, _ = engine._matched_filter_detect(x, ref, search_start=11800, search_end=12200)
+    assert lag_first == 3000
+    assert lag_second == 12000
+
+    # Windowed search gives the same result as searching the whole record
+    lag_full, peak_full, _ = engine._matched_filter_detect(x, ref, search_end=5000)
+    lag_win, peak_win, _ = engine._matched_filter_detect(x, ref, search_start=0, search_end=5000)
+    assert lag_full == lag_win == 3000
+    assert np.isclose(peak_full, peak_win)
+
+
+@pytest.mark.parametrize("align_to_first_marker", [True, False])
+def test_alignment_engine_average_matches_mean_of_slices(fs, align_to_first_marker):
+    num_sweeps, slot_len, sweep_len, pre_samps = 4, 8000, 4000, 1000
+    engine = AlignmentEngine(fs, num_sweeps, align_to_first_marker, 10.0, 50.0)
+
+    rng = np.random.default_rng(3)
+    marker = rng.normal(0, 1.0, 500)
+    rec_len = pre_samps + num_sweeps * slot_len + 2000
+    rec_loop = np.zeros(rec_len)
+    rec_mic = rng.normal(0, 1.0, rec_len)
+    for i in range(num_sweeps):
+        start = pre_samps + i * slot_len + 50
+        rec_loop[start: start + len(marker)] = marker
+
+    avg_mic, avg_loop, slices, _ = engine.sync_and_average(rec_mic, rec_loop, marker, pre_samps, slot_len, sweep_len)
+    expected = DSPUtils.hann_fade(np.mean(slices, axis=0), 10.0, fs, side="out")
+    assert np.allclose(avg_mic, expected, atol=1e-5)
+
+    # Slices are views into the recording, and are skipped entirely when not requested
+    assert np.shares_memory(slices[0], rec_mic)
+    _, _, no_slices, _ = engine.sync_and_average(rec_mic, rec_loop, marker, pre_samps, slot_len, sweep_len,
+                                                 keep_slices=False)
+    assert no_slices == []
+
+
+def test_reference_spectra_are_evicted_least_recently_used(fs):
+    engine = AlignmentEngine(fs, 1, False, 10.0, 50.0)
+    marker = np.ones(100)
+    others = [np.ones(100) for _ in range(4)]
+
+    engine._ref_spectrum(marker, 256)
+    for ref in others[:3]:
+        engine._ref_spectrum(ref, 256)
+        engine._ref_spectrum(marker, 256)  # the marker is used for every detection
+    engine._ref_spectrum(others[3], 256)
+    assert (id(marker), 256) in engine._ref_spectra
+    assert (id(others[0]), 256) not in engine._ref_spectra
+
+
+def test_alignment_debug_dumper_samples_points(fs, tmp_path):
+    num_sweeps, slot_len, sweep_len, pre_samps = 2, 8000, 4000, 1000
+    dumper = AlignmentDebugDumper(tmp_path, every_nth=2, compress=True)
+    engine = AlignmentEngine(fs, num_sweeps, False, 10.0, 50.0, debug_dumper=dumper)
+
+    rng = np.random.default_rng(4)
+    marker = rng.normal(0, 1.0, 500)
+    rec_loop = np.zeros(pre_samps + num_sweeps * slot_len + 2000)
+    for i in range(num_sweeps):
+        start = pre_samps + i * slot_len + 50
+        rec_loop[start: start + len(marker)] = marker
+    rec_mic = rec_loop.copy()
+
+    for point in ["p0", "p1", "p2"]:
+        engine.sync_and_average(rec_mic, rec_loop, marker, pre_samps, slot_len, sweep_len,
+                                debug_tag=dumper.select(point))
+    dumper.flush()
+
+    # Every 2nd point, one file per marker detection (first marker + per-sweep re-syncs)
+    names = sorted(p.name for p in tmp_path.iterdir())
+    assert names == [f"{p}_{d}_alignment.npz" for p in ["p0", "p2"] for d in ["first", "sweep01", "sweep02"]]
+
+    data = np.load(tmp_path / "p0_first_alignment.npz")
+    assert int(data["peak_idx"]) == pre_samps + 50
+    assert float(data["psr"]) > 1.0
+    dumper.close()
+
+
+def test_deconvolution_engine_batched_mic_array(fs):
+    engine = DeconvolutionEngine(fs)
+    s_fund, phase, inv = SweepGenerator(fs, 0.2, 100, -6.0).generate()
+    block = np.zeros((3, len(s_fund) + 300))
+    for ch, delay in enumerate([0, 100, 250]):
+        block[ch, delay: delay + len(s_fund)] = s_fund * (ch + 1)
+
+    ir_full, ir_linear = engine.process_ir(block, inv)
+    assert ir_full.shape[0] == ir_linear.shape[0] == 3
+
+    # One batched transform gives the same IRs as deconvolving every channel on its own
+    for ch in range(3):
+        full_ch, linear_ch = engine.process_ir(block[ch], inv)
+        assert np.allclose(ir_full[ch], full_ch, atol=1e-6)
+        assert np.allclose(ir_linear[ch], linear_ch, atol=1e-6)
+
+
+def test_alignment_engine_averages_mic_array(fs):
+    num_sweeps, slot_len, sweep_len, pre_samps = 3, 8000, 4000, 1000
+    engine = AlignmentEngine(fs, num_sweeps, True, 10.0, 50.0)
+
+    rng = np.random.default_rng(5)
+    marker = rng.normal(0, 1.0, 500)
+    rec_len = pre_samps + num_sweeps * slot_len + 2000
+    rec_loop = np.zeros(rec_len)
+    for i in range(num_sweeps):
+        start = pre_samps + i * slot_len + 50
+        rec_loop[start: start + len(marker)] = marker
+    rec_mics = rng.normal(0, 1.0, (2, rec_len))
+
+    avg_mics, _, slices, _ = engine.sync_and_average(rec_mics, rec_loop, marker, pre_samps, slot_len, sweep_len)
+    assert avg_mics.shape[0] == 2
+    assert slices[0].shape[0] == 2
+    for ch in range(2):
+        avg_ch, _, _, _ = engine.sync_and_average(rec_mics[ch], rec_loop, marker, pre_samps, slot_len, sweep_len)
+        assert np.allclose(avg_mics[ch], avg_ch, atol=1e-6)
+
+
+def test_stream_session_records_mic_array(fs):
+    hw = {'fs': fs, 'dev_in': 0, 'dev_out': 0, 'ch_in_mic': [1, 3], 'ch_in_loop': 0,
+          'ch_out_spkr': 0, 'ch_out_ref': 1, 'blocksize': 256, 'wasapi_exclusive': False}
+    session = AudioStreamSession(hw)
+    session.use_asio_in = session.use_asio_out = False
+    assert session.in_args[0] == 4
+
+    frames = 256
+    out_frames = np.zeros((frames, 2), dtype=np.float32)
+    result = {}
+    worker = threading.Thread(target=lambda: result.update(rec=session.play_and_record(out_frames)))
+    worker.start()
+    while session._job is None:
+        time.sleep(0.001)
+
+    indata = np.arange(frames * 4, dtype=np.float32).reshape(frames, 4)
+    session._callback(indata, np.zeros((frames, 2), dtype=np.float32), frames, None, None)
+    worker.join()
+
+    rec_mic, rec_loop = result['rec']
+    assert rec_mic.shape == (2, frames)
+    assert np.array_equal(rec_mic[0], indata[:, 1])
+    assert np.array_equal(rec_mic[1], indata[:, 3])
+    assert np.array_equal(rec_loop, indata[:, 0])
+
+
+@pytest.mark.parametrize("align_to_first_marker, num_mics", [(True, 1), (False, 1), (True, 2)])
+def test_streaming_deconvolver_matches_batch(fs, align_to_first_marker, num_mics):
+    hw = {'fs': fs, 'ch_out_spkr': 0, 'ch_out_ref': 1}
+    cap = {'sweep_level_dbfs': -6.0, 'pre_sil_ms': 50.0, 'post_sil_ms': 50.0, 'num_sweeps': 3}
+    bundle = ExcitationCache().get(SweepGenerator(fs, 0.2, 20, -6.0), MarkerGenerator(fs, 50.0, (500.0, 5000.0), -6.0),
+                                   None, None, hw, cap)
+    alignment = AlignmentEngine(fs, 3, align_to_first_marker, 10.0, 50.0)
+    deconv = DeconvolutionEngine(fs)
+
+    # Delayed loop back with a little noise, one (differently scaled) copy per mic
+    delay = 700
+    rng = np.random.default_rng(6)
+    rec_loop = np.roll(bundle.tx_ref_long, delay) + rng.normal(0, 1e-5, bundle.total_len)
+    rec_mic = np.stack([np.roll(bundle.tx_sweep_long, delay + 12) * (ch + 1) for ch in range(num_mics)])
+    rec_mic = (rec_mic + rng.normal(0, 1e-5, rec_mic.shape)).astype(np.float32)
+    if num_mics == 1:
+        rec_mic = rec_mic[0]
+
+    avg_mic, _, _, psr = alignment.sync_and_average(rec_mic, rec_loop, bundle.marker, bundle.pre_samps_settle,
+                                                    bundle.slot_len, bundle.sweep_len)
+    batch_full, batch_linear = deconv.process_ir(avg_mic, bundle.inv_sweep)
+
+    streamer = StreamingDeconvolver(alignment, deconv, bundle)
+    streamer.start(rec_mic, rec_loop)
+    for n in range(256, bundle.total_len + 256, 256):
+        streamer.feed(min(n, bundle.total_len))
+    result = streamer.result(timeout=30)
+
+    assert result["psr"] == psr
+    assert np.allclose(result["rx_mic_conditioned"], avg_mic, atol=1e-6)
+    scale = np.max(np.abs(batch_full))
+    assert np.allclose(result["ir_full"], batch_full, atol=1e-5 * scale)
+    assert np.allclose(result["ir_linear"], batch_linear, atol=1e-5 * scale)
+
+
+def test_streaming_deconvolver_reports_failed_alignment(fs):
+    hw = {'fs': fs, 'ch_out_spkr': 0, 'ch_out_ref': 1}
+    cap = {'sweep_level_dbfs': -6.0, 'pre_sil_ms': 10.0, 'post_sil_ms': 10.0, 'num_sweeps': 2}
+    bundle = ExcitationCache().get(SweepGenerator(fs, 0.1, 20, -6.0), MarkerGenerator(fs, 50.0, (500.0, 5000.0), -6.0),
+                                   None, None, hw, cap)
+    streamer = StreamingDeconvolver(AlignmentEngine(fs, 2, True, 10.0, 50.0), DeconvolutionEngine(fs), bundle)
+
+    # Recording stops halfway through the first sweep: no sweep window fits in it
+    n = bundle.pre_samps_settle + bundle.sweep_len // 2
+    rec_loop = np.zeros(n)
+    rec_loop[bundle.pre_samps_settle:bundle.pre_samps_settle + len(bundle.marker)] = bundle.marker
+    streamer.start(np.zeros(n, dtype=np.float32), rec_loop)
+    streamer.feed(n)
+    with pytest.raises(RuntimeError, match="Alignment failed"):
+        streamer.result(timeout=30)
+
+
+def _adaptive_capture(fs, target_snr_db, num_sweeps=4):
+    hw = {'fs': fs, 'ch_out_spkr': 0, 'ch_out_ref': 1}
+    cap = {'sweep_level_dbfs': -6.0, 'pre_sil_ms': 50.0, 'post_sil_ms': 50.0, 'num_sweeps': num_sweeps}
+    bundle = ExcitationCache().get(SweepGenerator(fs, 0.2, 20, -6.0), MarkerGenerator(fs, 50.0, (500.0, 5000.0), -6.0),
+                                   None, None, hw, cap)
+    rng = np.random.default_rng(13)
+    delay = 700
+    rec_loop = np.roll(bundle.tx_ref_long, delay) + rng.normal(0, 1e-5, bundle.total_len)
+    rec_mic = (np.roll(bundle.tx_sweep_long, delay + 12) + rng.normal(0, 1e-5, bundle.total_len))
+    monitor = AdaptiveAveragingMonitor(AlignmentEngine(fs, num_sweeps, True, 10.0, 50.0), DeconvolutionEngine(fs),
+                                       DSPVerificationTool(fs), bundle, target_snr_db)
+    monitor.start(rec_mic.astype(np.float32), rec_loop)
+
+    stop_at = None
+    for n in range(256, bundle.total_len + 256, 256):
+        n = min(n, bundle.total_len)
+        monitor.feed(n)
+        monitor.wait_until(n, timeout=30)
+        stop_at = monitor.stop_index(n)
+        if stop_at is not None:
+            monitor.end(stop_at)
+            break
+    return bundle, stop_at, monitor.result(timeout=30)
+
+
+def test_adaptive_monitor_stops_at_next_slot_boundary(fs):
+    bundle, stop_at, summary = _adaptive_capture(fs, target_snr_db=30.0)
+
+    assert summary["stopped_early"]
+    assert summary["snr_db"] >= 30.0
+    # Ends on a slot boundary (in the silence before a sweep), before the ceiling is played
+    slots, rest = divmod(stop_at - bundle.pre_samps_settle, bundle.slot_len)
+    assert rest == 0 and 1 <= slots < 4
+    assert summary["sweeps"] == slots
+
+
+def test_adaptive_monitor_plays_all_sweeps_below_target(fs):
+    _, stop_at, summary = _adaptive_capture(fs, target_snr_db=500.0)
+
+    assert stop_at is None
+    assert summary == {"sweeps": 4, "snr_db": summary["snr_db"], "stopped_early": False}
+
+
+def test_alignment_on_shortened_recording(fs):
+    bundle, stop_at, _ = _adaptive_capture(fs, target_snr_db=30.0)
+    engine = AlignmentEngine(fs, 4, False, 10.0, 50.0)
+    rec_loop = np.roll(bundle.tx_ref_long, 700)[:stop_at]
+    rec_mic = np.roll(bundle.tx_sweep_long, 712)[:stop_at]
+
+    avg_mic, _, slices, _ = engine.sync_and_average(rec_mic, rec_loop, bundle.marker, bundle.pre_samps_settle,
+                                                    bundle.slot_len, bundle.sweep_len)
+    assert len(slices) == (stop_at - bundle.pre_samps_settle) // bundle.slot_len
+    assert np.all(np.isfinite(avg_mic))
+
+
+def test_stream_session_stops_where_consumer_asks(fs):
+    class StopAfterFirstBlock:
+        ended = None
+
+        def start(self, rec_mic, rec_loop):
+            pass
+
+        def feed(self, n_recorded):
+            pass
+
+        def stop_index(self, idx_play):
+            return 300 if idx_play > 0 else None
+
+        def end(self, n_recorded):
+            self.ended = n_recorded
+
+    hw = {'fs': fs, 'dev_in': 0, 'dev_out': 0, 'ch_in_mic': 1, 'ch_in_loop': 0,
+          'ch_out_spkr': 0, 'ch_out_ref': 1, 'blocksize': 256, 'wasapi_exclusive': False}
+    session = AudioStreamSession(hw)
+    session.use_asio_in = session.use_asio_out = False
+    consumer = StopAfterFirstBlock()
+
+    out_frames = np.ones((1024, 2), dtype=np.float32)
+    result = {}
+    worker = threading.Thread(target=lambda: result.update(rec=session.play_and_record(out_frames, consumer)))
+    worker.start()
+    while session._job is None:
+        time.sleep(0.001)
+
+    outputs = []
+    while worker.is_alive() and len(outputs) < 4:
+        outdata = np.zeros((256, 2), dtype=np.float32)
+        session._callback(np.ones((256, 2), dtype=np.float32), outdata, 256, None, None)
+        outputs.append(outdata)
+        time.sleep(0.01)
+    worker.join(timeout=5)
+
+    rec_mic, rec_loop = result['rec']
+    assert len(rec_mic) == len(rec_loop) == 300
+    assert consumer.ended == 300
+    # Playback stops at the same sample: the rest of the second block is silence
+    assert np.all(outputs[1][:44] == 1) and np.all(outputs[1][44:] == 0)
+    assert len(outputs) == 2
+
+
+def test_overlapped_sweep_timeline(fs):
+    hw = {'fs': fs, 'ch_out_spkr': 0, 'ch_out_ref': 1}
+    cap = {'sweep_level_dbfs': -6.0, 'pre_sil_ms': 50.0, 'post_sil_ms': 100.0, 'num_sweeps': 4}
+    sweep_gen, marker_gen = SweepGenerator(fs, 1.0, 1.0, -6.0), MarkerGenerator(fs, 100.0, (500.0, 5000.0), -6.0)
+    disjoint = ExcitationCache().get(sweep_gen, marker_gen, None, None, hw, cap)
+    overlapped = ExcitationCache().get(sweep_gen, marker_gen, None, None, hw,
+                                       dict(cap, overlapped_sweeps=True, ir_len_ms=100.0, max_harmonic=5))
+
+    # Slot spacing: IR frame + span of the 5th harmonic, L * ln(5) with L = T / ln(f2 / f1)
+    harmonic_len = int(np.ceil(1.0 / np.log(fs / 2) * np.log(5) * fs))
+    assert overlapped.harmonic_len == harmonic_len
+    assert overlapped.slot_len == 2 * max(harmonic_len, int(0.1 * fs))
+    assert overlapped.total_len < 0.5 * disjoint.total_len
+    assert not disjoint.overlapped and overlapped.overlapped
+
+    # Summed sweeps are scaled back to the configured peak
+    assert np.isclose(np.max(np.abs(overlapped.tx_sweep_long)), DSPUtils.db_to_lin(-6.0), rtol=1e-4)
+    assert overlapped.playback_gain < 1.0
+
+
+def test_overlapped_sweeps_match_disjoint_sweeps(fs):
+    import scipy.signal
+
+    hw = {'fs': fs, 'ch_out_spkr': 0, 'ch_out_ref': 1}
+    cap = {'sweep_level_dbfs': -6.0, 'pre_sil_ms': 50.0, 'post_sil_ms': 100.0, 'num_sweeps': 3}
+    sweep_gen, marker_gen = SweepGenerator(fs, 0.5, 1.0, -6.0), MarkerGenerator(fs, 100.0, (500.0, 5000.0), -6.0)
+    alignment, deconv = AlignmentEngine(fs, 3, False, 10.0, 100.0), DeconvolutionEngine(fs)
+    capture_len = alignment.capture_len(int(0.5 * fs))
+
+    # A delayed, decaying system with a weak square-law distortion
+    rng = np.random.default_rng(0)
+    h = np.zeros(1500)
+    h[40] = 1.0
+    h[40:] += 0.05 * rng.normal(size=1460) * np.exp(-np.arange(1460) / 200)
+
+    def record(bundle):
+        # 300 samples of converter latency on both channels
+        mic = np.roll(scipy.signal.fftconvolve(bundle.tx_sweep_long, h)[:bundle.total_len], 300)
+        mic = mic + 0.01 * mic ** 2 + rng.normal(0, 1e-6, bundle.total_len)
+        loop = np.roll(bundle.tx_ref_long, 300) + rng.normal(0, 1e-4, bundle.total_len)
+        return mic.astype(np.float32), loop
+
+    disjoint = ExcitationCache().get(sweep_gen, marker_gen, None, None, hw, cap)
+    rec_mic, rec_loop = record(disjoint)
+    avg_mic, _, _, _ = alignment.sync_and_average(rec_mic, rec_loop, disjoint.marker, disjoint.pre_samps_settle,
+                                                  disjoint.slot_len, disjoint.sweep_len)
+    _, ref_linear = deconv.process_ir(avg_mic, disjoint.inv_sweep)
+
+    overlapped = ExcitationCache().get(sweep_gen, marker_gen, None, None, hw,
+                                       dict(cap, overlapped_sweeps=True, ir_len_ms=50.0, max_harmonic=3))
+    assert overlapped.slot_len < overlapped.sweep_len
+    rec_mic, rec_loop = record(overlapped)
+    starts, _ = alignment.locate_sweeps(rec_loop, overlapped.marker, overlapped.pre_samps_settle,
+                                        overlapped.slot_len, capture_len)
+    assert len(starts) == 3
+    ir_full, ir_linear = deconv.process_overlapped(rec_mic, overlapped.inv_sweep, starts, capture_len,
+                                                   overlapped.ir_frame_len, overlapped.harmonic_len,
+                                                   overlapped.playback_gain)
+
+    assert ir_full.shape == (2 * overlapped.ir_frame_len,)
+    assert ir_linear.shape == (overlapped.ir_frame_len,)
+    # The linear IR (before the end fade) matches the one from disjoint slots, level included
+    n = int(0.03 * fs)
+    scale = np.max(np.abs(ref_linear))
+    assert np.max(np.abs(ir_linear[:n] - ref_linear[:n])) < 0.01 * scale
+    # The leading half of the frame only holds this sweep's harmonics; the previous IR is removed
+    assert np.all(ir_full[:overlapped.ir_frame_len - overlapped.harmonic_len] == 0)
+
+
+def test_staggered_drivers_are_separated(fs):
+    import scipy.signal
+
+    hw = {'fs': fs, 'ch_out_spkr': [0, 2, 3], 'ch_out_ref': 1}
+    cap = {'sweep_level_dbfs': -6.0, 'pre_sil_ms': 50.0, 'post_sil_ms': 100.0, 'num_sweeps': 2,
+           'ir_len_ms': 30.0, 'max_harmonic': 3}
+    bundle = ExcitationCache().get(SweepGenerator(fs, 0.5, 1.0, -6.0), MarkerGenerator(fs, 100.0, (500.0, 5000.0), -6.0),
+                                   None, None, hw, cap)
+    step = bundle.ir_frame_len + bundle.harmonic_len
+    assert bundle.driver_offsets == [0, step, 2 * step]
+    assert bundle.tx_sweep_long.shape == (3, bundle.total_len)
+    for d, ch in enumerate([0, 2, 3]):
+        assert np.array_equal(bundle.out_frames[:, ch], bundle.tx_sweep_long[d])
+
+    # Three drivers with different gains and delays, heard by one mic
+    systems = [(1.0, 40), (0.5, 90), (0.25, 140)]
+    rec_mic = sum(gain * np.roll(bundle.tx_sweep_long[d], delay) for d, (gain, delay) in enumerate(systems))
+    rng = np.random.default_rng(7)
+    rec_mic = (rec_mic + rng.normal(0, 1e-6, bundle.total_len)).astype(np.float32)
+    rec_loop = bundle.tx_ref_long + rng.normal(0, 1e-4, bundle.total_len)
+
+    alignment, deconv = AlignmentEngine(fs, 2, True, 10.0, 100.0), DeconvolutionEngine(fs)
+    capture_len = alignment.capture_len(bundle.sweep_len)
+    starts, _ = alignment.locate_sweeps(rec_loop, bundle.marker, bundle.pre_samps_settle, bundle.slot_len,
+                                        capture_len + bundle.driver_offsets[-1])
+    ir_full, ir_linear = deconv.process_overlapped(rec_mic, bundle.inv_sweep, starts, capture_len,
+                                                   bundle.ir_frame_len, bundle.harmonic_len, bundle.playback_gain,
+                                                   bundle.driver_offsets)
+
+    assert ir_linear.shape == (3, bundle.ir_frame_len)
+    peaks = np.max(np.abs(ir_linear), axis=-1)
+    assert np.allclose(peaks / peaks[0], [1.0, 0.5, 0.25], rtol=0.02)
+    # Each driver's IR sits at its own delay
+    assert np.array_equal(np.diff([np.argmax(np.abs(ir)) for ir in ir_linear]), [50, 50])
@@ -0,0 +1,134 @@
+import configparser
+
+import numpy as np
+import pytest
+import soundfile as sf
+
+from nfs.audio import AudioFactory
+from nfs.dataset import ScanDataset
+from nfs.datatypes import CylindricalPosition
+
+METRICS = ['snr_db', 'thd_pct', 'psr']
+
+
+def _append_points(dataset, count):
+    for i in range(count):
+        dataset.append(CylindricalPosition(100.0, 10.0 * i, 5.0), str(i + 1),
+                       np.full(8, i, dtype=np.float32), np.full(16, -i, dtype=np.float32),
+                       {'snr_db': 60.0 + i, 'thd_pct': 0.5, 'psr': 10.0}, timestamp=1000.0 + i)
+
+
+def test_append_and_read_back(tmp_path):
+    dataset = ScanDataset.create(tmp_path / 'scan.nfsd', 48000, 8, 16, METRICS, {'num_sweeps': 4})
+    _append_points(dataset, 3)
+
+    reopened = ScanDataset.open(tmp_path / 'scan.nfsd')
+    assert len(reopened) == 3
+    assert reopened.fs == 48000
+    assert reopened.header['attrs'] == {'num_sweeps': 4}
+    assert reopened.order_ids == ['1', '2', '3']
+    np.testing.assert_array_equal(reopened.positions[:, 1], [0.0, 10.0, 20.0])
+    np.testing.assert_array_equal(reopened.timestamps, [1000.0, 1001.0, 1002.0])
+    np.testing.assert_array_equal(reopened.metric('snr_db'), [60.0, 61.0, 62.0])
+    # Slicing a field only reads the selected records
+    np.testing.assert_array_equal(reopened.ir_linear[1:], [[1] * 8, [2] * 8])
+    np.testing.assert_array_equal(reopened.ir_full[2], [-2] * 16)
+
+
+def test_incomplete_record_is_ignored_and_overwritten(tmp_path):
+    path = tmp_path / 'scan.nfsd'
+    dataset = ScanDataset.create(path, 48000, 8, 16, METRICS)
+    _append_points(dataset, 2)
+
+    # Simulate a crash in the middle of writing the third record
+    with open(path, 'ab') as f:
+        f.write(b'\x01' * 20)
+
+    reopened = ScanDataset.open(path)
+    assert len(reopened) == 2
+    _append_points(reopened, 1)
+    assert len(ScanDataset.open(path)) == 3
+    assert path.stat().st_size == reopened._data_offset + 3 * reopened.records.dtype.itemsize
+
+
+def test_append_with_records_mapped(tmp_path):
+    path = tmp_path / 'scan.nfsd'
+    dataset = ScanDataset.create(path, 48000, 8, 16, METRICS)
+    _append_points(dataset, 2)
+    assert dataset.order_ids == ['1', '2']  # maps the records
+
+    _append_points(dataset, 1)
+    assert len(dataset) == 3 and dataset.order_ids == ['1', '2', '1']
+    dataset.close()
+    assert dataset._file is None and dataset._mmap is None
+    assert path.stat().st_size == dataset._data_offset + 3 * dataset.records.dtype.itemsize
+
+
+def test_open_or_create_rejects_incompatible_file(tmp_path):
+    path = tmp_path / 'scan.nfsd'
+    ScanDataset.create(path, 48000, 8, 16, METRICS)
+
+    assert ScanDataset.open_or_create(path, 48000, 8, 16, METRICS).path == path
+    with pytest.raises(ValueError, match='ir_linear_len'):
+        ScanDataset.open_or_create(path, 48000, 9, 16, METRICS)
+
+
+def test_open_rejects_other_files(tmp_path):
+    path = tmp_path / 'not_a_dataset.bin'
+    path.write_bytes(b'\0' * 64)
+    with pytest.raises(ValueError):
+        ScanDataset.open(path)
+
+
+def _write_dataset_config(tmp_path, dataset_resume='False'):
+    config = configparser.ConfigParser()
+    config['audio'] = {
+        'mode': 'mock_interface', 'fs': '48000', 'in_dev': '0', 'out_dev': '0', 'in_ch_mic': '1',
+        'in_ch_loop': '0', 'out_ch_spkr': '0', 'out_ch_ref': '1', 'blocksize': '1024',
+        'wasapi_exclusive': 'False', 'output_format': 'dataset', 'dataset_resume': dataset_resume,
+    }
+    config['sweep'] = {
+        'sweep_dur_s': '0.3', 'sweep_level_dbfs': '-10', 'num_sweeps': '1', 'pre_sil_ms': '50',
+        'post_sil_ms': '50', 'mic_tail_taper_ms': '10', 'align_to_first_marker': 'True', 'debug_saves': 'False',
+        'H2_TEST_DB': 'None', 'H3_TEST_DB': 'None', 'PROTECT_HPF_HZ': '0', 'PROTECT_HPF_ORDER': '4',
+        'PROTECT_HPF_PHASE': 'min'
+    }
+    with open(tmp_path / 'config.ini', 'w') as f:
+        config.write(f)
+    return str(tmp_path / 'config.ini')
+
+
+def test_scan_to_dataset_and_wav_export(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    audio = AudioFactory.create(_write_dataset_config(tmp_path))
+    audio.measure_ir(CylindricalPosition(100.0, 0.0, 10.0), "1")
+    audio.measure_ir(CylindricalPosition(100.0, 90.0, 10.0), "2")
+    audio.close()
+
+    assert list((tmp_path / 'Recordings').glob('*.wav')) == []
+    dataset = ScanDataset.open(tmp_path / 'scan.nfsd')
+    assert len(dataset) == 2
+    assert dataset.metric_names == ['snr_db', 'thd_pct', 'psr', 'crest_factor']
+    assert dataset.ir_full.shape[1] > dataset.ir_linear.shape[1]
+
+    dataset.export_wavs(tmp_path / 'export')
+    data, fs = sf.read(tmp_path / 'export' / 'Recordings' / '2_r100p0_ph90p0_z10p0_ir.wav')
+    assert fs == 48000
+    np.testing.assert_allclose(data, dataset.ir_linear[1], atol=1e-7)
+    assert (tmp_path / 'export' / 'Distortion' / '2_r100p0_ph90p0_z10p0_ir_dist.wav').exists()
+
+
+def test_new_scan_refuses_existing_dataset(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    audio = AudioFactory.create(_write_dataset_config(tmp_path))
+    audio.measure_ir(CylindricalPosition(100.0, 0.0, 10.0), "1")
+    audio.close()
+
+    with pytest.raises(FileExistsError, match='dataset_resume'):
+        AudioFactory.create(_write_dataset_config(tmp_path))
+
+    # Opting in continues the interrupted scan
+    audio = AudioFactory.create(_write_dataset_config(tmp_path, dataset_resume='True'))
+    audio.measure_ir(CylindricalPosition(100.0, 90.0, 10.0), "2")
+    audio.close()
+    assert ScanDataset.open(tmp_path / 'scan.nfsd').order_ids == ['1', '2']
@@ -1,9 +1,25 @@
+import configparser
+import time
 import pytest
 import numpy as np
 import os
+import scipy.signal
 import shutil
 from pathlib import Path
-from nfs.audio import DSPVerificationTool, AlignmentEngine, DeconvolutionEngine
+from nfs.audio import AudioFactory, DSPVerificationTool, AlignmentEngine, DeconvolutionEngine
+from nfs.datatypes import CylindricalPosition
+from nfs.utils.fft import FFT
+
+
+def _write_config(path, **overrides):
+    """Writes dsp_test_config.ini to *path* with per-section key overrides, e.g. ``sweep={'num_sweeps': '3'}``."""
+    config = configparser.ConfigParser()
+    config.read(Path(__file__).with_name("dsp_test_config.ini"))
+    for section, values in overrides.items():
+        config[section].update(values)
+    with open(path, "w") as f:
+        config.write(f)
+    return str(path)
 
 
 def test_snr_calculation():
@@ -82,9 +98,6 @@ def test_verification_warnings():
 
 
 def test_integration_with_mock_audio():
-    from nfs.audio import AudioFactory
-    import configparser
-
     config = configparser.ConfigParser()
     config['audio'] = {
         'mode': 'mock_interface',
@@ -128,7 +141,6 @@ def test_integration_with_mock_audio():
 
     try:
         audio = AudioFactory.create(config_path)
-        from nfs.datatypes import CylindricalPosition
         pos = CylindricalPosition(100, 0, 10)
 
         # This will trigger measure_ir -> _run_sweep -> metrics calculation
@@ -142,3 +154,207 @@ def test_integration_with_mock_audio():
 
     finally:
         pass
+
+
+def test_mock_audio_mic_array(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    config_path = _write_config(tmp_path / "config.ini",
+                                audio={'in_ch_mic': '1, 2, 3', 'mic_offsets_mm': '0, 50, 100'},
+                                sweep={'sweep_dur_s': '0.3'})
+
+    audio = AudioFactory.create(config_path)
+    metrics = audio.capture_ir(CylindricalPosition(100.0, 0.0, 10.0), "7")()
+
+    # One point per mic, at the arm position plus the mic's radial offset
+    assert len(metrics) == 3
+    assert all(m['snr_db'] > 30 for m in metrics)
+    for r in ["100p0", "150p0", "200p0"]:
+        assert (tmp_path / "Recordings" / f"7_r{r}_ph0p0_z10p0_ir.wav").exists()
+        assert (tmp_path / "Distortion" / f"7_r{r}_ph0p0_z10p0_ir_dist.wav").exists()
+
+
+def test_mic_array_needs_one_offset_per_mic(tmp_path):
+    config_path = _write_config(tmp_path / "config.ini", audio={'in_ch_mic': '1, 2', 'mic_offsets_mm': '0'})
+    with pytest.raises(ValueError, match="mic_offsets_mm"):
+        AudioFactory.create_components(config_path)
+
+
+def test_mock_audio_streaming_deconvolution(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    config_path = _write_config(tmp_path / "config.ini", sweep={'streaming_deconvolution': 'True'})
+
+    audio = AudioFactory.create(config_path)
+    capture = audio._capture()
+    assert "streamed" in capture
+
+    streamed = audio._process_capture(capture, CylindricalPosition(100.0, 0.0, 10.0), "S")
+    batch = audio._process_capture({k: v for k, v in capture.items() if k != "streamed"},
+                                   CylindricalPosition(100.0, 0.0, 10.0), "B")
+    assert streamed[0]['snr_db'] > 30
+    assert abs(streamed[0]['snr_db'] - batch[0]['snr_db']) < 0.1
+    assert (tmp_path / "Recordings" / "S_r100p0_ph0p0_z10p0_ir.wav").exists()
+
+
+def test_streamed_capture_dumps_alignment(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    config_path = _write_config(tmp_path / "config.ini",
+                                sweep={'streaming_deconvolution': 'True', 'alignment_debug': 'True'})
+
+    audio = AudioFactory.create(config_path)
+    audio.measure_ir(CylindricalPosition(100.0, 0.0, 10.0), "S")
+    audio.close()
+    dumps = tmp_path / "Recordings" / "debug" / "alignment"
+    assert [p.name for p in dumps.iterdir()] == ["S_r100p0_ph0p0_z10p0_first_alignment.npz"]
+
+
+def test_mock_audio_adaptive_averaging(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    config_path = _write_config(tmp_path / "config.ini", sweep={'adaptive_snr_db': '30', 'max_sweeps': '4'})
+
+    audio = AudioFactory.create(config_path)
+    bundle = audio._get_excitation()
+    capture = audio._capture()
+
+    # The -100 dBFS mock noise floor reaches the target long before the ceiling
+    slots, rest = divmod(len(capture["rec_loop"]) - bundle.pre_samps_settle, bundle.slot_len)
+    assert rest == 0 and slots < 4
+    assert capture["sweeps_used"] == slots
+    metrics = audio._process_capture(capture, CylindricalPosition(100.0, 0.0, 10.0), "A")
+    assert metrics[0]['snr_db'] > 30
+    assert (tmp_path / "Recordings" / "A_r100p0_ph0p0_z10p0_ir.wav").exists()
+
+
+def test_adaptive_averaging_excludes_streaming_deconvolution(tmp_path):
+    config_path = _write_config(tmp_path / "config.ini",
+                                sweep={'adaptive_snr_db': '30', 'streaming_deconvolution': 'True'})
+    with pytest.raises(ValueError, match="adaptive_snr_db"):
+        AudioFactory.create_components(config_path)
+
+
+def test_required_flags_are_parsed_as_booleans(tmp_path):
+    config_path = _write_config(tmp_path / "config.ini", sweep={'debug_saves': 'False  # no debug files'})
+    components = AudioFactory.create_components(config_path)
+    assert components['capture_config']['debug_saves'] is False
+    assert components['hw_config']['wasapi_exclusive'] is False
+
+    config_path = _write_config(tmp_path / "config.ini", sweep={'debug_saves': ''})
+    with pytest.raises(ValueError):
+        AudioFactory.create_components(config_path)
+
+
+def test_mock_audio_overlapped_sweeps(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    config_path = _write_config(tmp_path / "config.ini", sweep={
+        'num_sweeps': '3', 'overlapped_sweeps': 'True', 'ir_len_ms': '50', 'max_harmonic': '3'})
+
+    audio = AudioFactory.create(config_path)
+    bundle = audio._get_excitation()
+    assert bundle.slot_len < bundle.sweep_len
+
+    metrics = audio.capture_ir(CylindricalPosition(100.0, 0.0, 10.0), "M")()
+    assert metrics[0]['snr_db'] > 30
+    assert metrics[0]['thd_pct'] < 10
+    assert (tmp_path / "Recordings" / "M_r100p0_ph0p0_z10p0_ir.wav").exists()
+
+
+def test_overlapped_sweeps_need_ir_shorter_than_sweep(tmp_path):
+    config_path = _write_config(tmp_path / "config.ini", sweep={'overlapped_sweeps': 'True', 'ir_len_ms': '5000'})
+    with pytest.raises(ValueError, match="ir_len_ms"):
+        AudioFactory.create_components(config_path)
+
+
+def test_mock_audio_multi_driver_scan(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    config_path = _write_config(tmp_path / "config.ini", audio={'out_ch_spkr': '0, 2'},
+                                sweep={'ir_len_ms': '50', 'max_harmonic': '3'})
+
+    audio = AudioFactory.create(config_path)
+    metrics = audio.capture_ir(CylindricalPosition(100.0, 0.0, 10.0), "D")()
+
+    # One point per driver, each in its own output tree with single driver naming
+    assert len(metrics) == 2
+    assert all(m['snr_db'] > 30 for m in metrics)
+    for driver in ("Driver1", "Driver2"):
+        assert (tmp_path / driver / "Recordings" / "D_r100p0_ph0p0_z10p0_ir.wav").exists()
+        assert (tmp_path / driver / "Distortion" / "D_r100p0_ph0p0_z10p0_ir_dist.wav").exists()
+
+
+def test_multi_driver_needs_distinct_channels(tmp_path):
+    config_path = _write_config(tmp_path / "config.ini", audio={'out_ch_spkr': '0, 1'})
+    with pytest.raises(ValueError, match="out_ch_spkr"):
+        AudioFactory.create_components(config_path)
+
+
+def test_mock_audio_float32_precision(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    audio32 = AudioFactory.create(_write_config(tmp_path / "f32.ini", sweep={'dsp_precision': 'float32'}))
+    assert audio32.deconv_engine.dtype == np.float32
+    capture = audio32._capture()
+    metrics32 = audio32._process_capture(capture, CylindricalPosition(100.0, 0.0, 10.0), "F32")
+    metrics64 = AudioFactory.create(_write_config(tmp_path / "f64.ini"))._process_capture(
+        capture, CylindricalPosition(100.0, 0.0, 10.0), "F64")
+
+    assert metrics32[0]['snr_db'] > 30
+    assert abs(metrics32[0]['snr_db'] - metrics64[0]['snr_db']) < 0.1
+    assert abs(metrics32[0]['thd_pct'] - metrics64[0]['thd_pct']) < 0.01
+
+
+def test_dsp_precision_must_be_float32_or_float64(tmp_path):
+    config_path = _write_config(tmp_path / "config.ini", sweep={'dsp_precision': 'float16'})
+    with pytest.raises(ValueError, match="dsp_precision"):
+        AudioFactory.create_components(config_path)
+
+
+def test_mock_audio_linear_model_matches_filter_chain(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    audio = AudioFactory.create(_write_config(tmp_path / "config.ini"))
+    audio.noise_rms = 0.0
+    fs = audio.hw['fs']
+
+    sig = np.random.default_rng(1).standard_normal(fs // 2)
+    rec_mic, _ = audio._simulate_loopback(sig, np.zeros_like(sig))
+
+    # The hardware chain applied filter by filter: FIR, HPF, 20 ms latency
+    y = scipy.signal.lfilter(scipy.signal.firwin(25, 0.45 * fs, fs=fs), 1.0, sig)
+    y = scipy.signal.sosfilt(scipy.signal.butter(1, 15.0, btype='hp', fs=fs, output='sos'), y)
+    y = np.concatenate([np.zeros(int(0.020 * fs)), y[:-int(0.020 * fs)]])
+    np.testing.assert_allclose(rec_mic, y, atol=1e-6)
+
+
+def test_mock_audio_noise_is_seeded(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    config_path = _write_config(tmp_path / "config.ini", audio={'mock_noise_seed': '7'})
+
+    first, second = AudioFactory.create(config_path), AudioFactory.create(config_path)
+    a1, b1 = first._capture(), second._capture()
+    np.testing.assert_array_equal(a1["rec_mic"], b1["rec_mic"])
+
+    # Consecutive captures still see different noise
+    a2 = first._capture()
+    assert not np.array_equal(a1["rec_mic"], a2["rec_mic"])
+    assert np.std(a1["rec_mic"][:1000]) < 1e-4  # pre-silence holds only the -100 dBFS floor
+
+
+def test_mock_audio_real_time_pacing(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    audio = AudioFactory.create(_write_config(tmp_path / "config.ini", audio={'mock_realtime': 'True'}))
+    assert audio.realtime
+    t0 = time.perf_counter()
+    capture = audio._capture()
+    # A capture takes as long as playing its timeline
+    assert time.perf_counter() - t0 >= len(capture["rec_loop"]) / audio.hw['fs']
+
+
+def test_mock_audio_system_spectra_are_evicted_least_recently_used(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    audio = AudioFactory.create(_write_config(tmp_path / "config.ini"))
+    lengths = [1000, 3000, 5000, 7000, 9000]
+    for n in lengths[:4]:
+        audio._apply_system(np.zeros(n))
+    audio._apply_system(np.zeros(lengths[0]))  # used again
+    audio._apply_system(np.zeros(lengths[4]))
+
+    assert len(audio._system_spectra) == 4
+    cached = list(audio._system_spectra)
+    assert FFT.fast_len(lengths[0] + len(audio._system_ir) - 1) in cached
+    assert FFT.fast_len(lengths[1] + len(audio._system_ir) - 1) not in cached
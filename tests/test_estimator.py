@@ -0,0 +1,65 @@
+from pathlib import Path
+
+import pytest
+
+from nfs.estimator import ScanEstimate, format_duration
+from nfs.instrumentation import ScanTimings
+from nfs.nfs import NearFieldScannerFactory
+from nfs.scanner import ScannerFactory
+
+
+def _write_config(tmp_path):
+    config = (Path(__file__).with_name("full_system_mock_config.ini").read_text()
+              .replace("file = tests/test_scanner.log", "file =")
+              .replace("type = Mock", "type = Simulated\nrealtime = False")
+              .replace("motion_manager = motion_manager", "motion_manager = motion_manager\nestimate_duration = True")
+              .replace("nr_of_angular_points = 1", "nr_of_angular_points = 3")
+              .replace("nr_of_radial_cap_points = 1", "nr_of_radial_cap_points = 2")
+              .replace("nr_of_vertical_points = 1", "nr_of_vertical_points = 3"))
+    path = tmp_path / "config.ini"
+    path.write_text(config)
+    return str(path)
+
+
+def test_estimate_matches_the_simulated_scan(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    config_file = _write_config(tmp_path)
+    scanner = ScannerFactory.create(config_file)
+    nfs = NearFieldScannerFactory.create(scanner, config_file)
+    nfs.take_measurement_set()
+    nfs.shutdown()
+
+    # Every move of the scan, including the way to the start and back, was predicted
+    assert nfs.estimate.points == len(nfs.timings.points) > 1
+    assert nfs.estimate.motion_s == pytest.approx(scanner._grbl_controller.elapsed_s)
+    assert len(set(round(s, 6) for s in nfs.estimate.moves_s)) > 1  # moves differ in cost
+    assert nfs.estimate.capture_s == 0.0  # AudioMock does not know its capture time
+
+
+def _timings(points):
+    """ScanTimings whose points started at the given times after moves of the given durations."""
+    timings = ScanTimings()
+    for started, motion in points:
+        point = timings.new_point()
+        point.started = started
+        point.add('motion', motion)
+    return timings
+
+
+def test_remaining_time_is_corrected_by_observed_timings():
+    estimate = ScanEstimate(start_s=0.0, moves_s=[1.0] * 5, capture_s=2.0, finish_s=1.0)
+    assert estimate.total_s == pytest.approx(16.0)
+
+    # Nothing observed yet: the prediction for points 1-5 and the way back
+    assert estimate.remaining_s(ScanTimings(), 1) == pytest.approx(5 * 2.0 + 4 * 1.0 + 1.0)
+
+    # The moves take twice as long as predicted and a point needs 3 s besides its move
+    timings = _timings([(0.0, 2.0), (5.0, 2.0)])
+    assert estimate.remaining_s(timings, 2) == pytest.approx(4 * 3.0 + 2 * (3 * 1.0 + 1.0))
+
+
+def test_format_duration():
+    assert format_duration(45.2) == '45s'
+    assert format_duration(123) == '2m 03s'
+    assert format_duration(3723) == '1h 02m 03s'
+    assert format_duration(-1) == '0s'
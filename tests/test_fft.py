@@ -0,0 +1,46 @@
+import numpy as np
+import pytest
+
+from nfs.utils.fft import FFT
+
+
+def test_fast_len_is_even_and_5_smooth():
+    for n in [1, 7, 1000, 48000 + 47999, 969_599]:
+        m = FFT.fast_len(n)
+        assert m >= n and m % 2 == 0
+        for p in (2, 3, 5):
+            while m % p == 0:
+                m //= p
+        assert m == 1
+    # Never longer than the power of two it replaces
+    assert FFT.fast_len(969_599) < 2 ** 20
+
+
+def test_padded_rfft_reuses_scratch_without_stale_samples():
+    rng = np.random.default_rng(0)
+    long, short = rng.standard_normal((2, 300)), rng.standard_normal((2, 100))
+
+    np.testing.assert_allclose(FFT.rfft(long, n=512), np.fft.rfft(long, n=512))
+    # Same scratch buffer; the tail written by the longer input must be zero again
+    np.testing.assert_allclose(FFT.rfft(short, n=512), np.fft.rfft(short, n=512))
+
+
+def test_scratch_is_bounded_by_bytes(monkeypatch):
+    monkeypatch.setattr(FFT, 'max_scratch_bytes', (600 + 1024) * 8)
+    monkeypatch.setattr(FFT._local, 'scratch', None, raising=False)
+    rng = np.random.default_rng(1)
+    x = rng.standard_normal(100)
+
+    for n in (512, 600, 1024):
+        np.testing.assert_allclose(FFT.rfft(x, n=n), np.fft.rfft(x, n=n))
+    # The 1024 point buffer only fits after the least recently used one is dropped
+    assert [key[1] for key in FFT._local.scratch] == [600, 1024]
+
+    # Too large for the budget: padded by scipy, not kept
+    np.testing.assert_allclose(FFT.rfft(x, n=4096), np.fft.rfft(x, n=4096))
+    assert [key[1] for key in FFT._local.scratch] == [600, 1024]
+
+
+def test_configure_rejects_zero_workers():
+    with pytest.raises(ValueError, match="fft_workers"):
+        FFT.configure(0)
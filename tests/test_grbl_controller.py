@@ -0,0 +1,82 @@
+import time
+from pathlib import Path
+
+import pytest
+
+from nfs.datatypes import CylindricalPosition, GrblConfig
+from nfs.grbl_controller import GrblControllerFactory, GrblControllerSimulated, GrblMotionModel
+from nfs.scanner import Scanner
+
+
+def _model(rate=6000.0, acceleration=100.0, z_rate=None, z_acceleration=None):
+    axis = GrblConfig(1.0, rate, acceleration, False)
+    z_axis = GrblConfig(1.0, z_rate or rate, z_acceleration or acceleration, False)
+    return GrblMotionModel(axis, axis, z_axis)
+
+
+def test_trapezoid_and_triangle_profiles():
+    # 100 mm/s cruise at 100 mm/s^2: 1 s (50 mm) to accelerate and 1 s to brake
+    assert GrblMotionModel.trapezoid_time(300.0, 100.0, 100.0) == pytest.approx(4.0)
+    # Too short to reach cruise speed: accelerate for half, brake for half
+    assert GrblMotionModel.trapezoid_time(25.0, 100.0, 100.0) == pytest.approx(1.0)
+    assert GrblMotionModel.trapezoid_time(0.0, 100.0, 100.0) == 0.0
+
+
+def test_slowest_axis_limits_a_combined_move():
+    model = _model(rate=6000.0, acceleration=100.0, z_rate=600.0, z_acceleration=10.0)
+    # A pure turntable move runs at the turntable's own limits: 10 deg/s, 10 deg/s^2
+    assert model.linear_move_time([0, 0, 0], [0, 0, 90]) == pytest.approx(90 / 10 + 10 / 10)
+    # Adding a small radial component does not make the turntable faster
+    assert model.linear_move_time([0, 0, 0], [0, 10, 90]) > model.linear_move_time([0, 0, 0], [0, 0, 90])
+    # A G1 feed rate below the axis rate slows the move down
+    assert model.linear_move_time([0, 0, 0], [0, 300, 0], feed_rate=3000) == pytest.approx(300 / 50 + 50 / 100)
+
+
+def test_arc_is_timed_over_its_length():
+    model = _model(rate=60000.0, acceleration=1e6)
+    # Quarter circle of radius 100 at 1000 mm/min, acceleration effectively unlimited
+    quarter = 100 * 3.141592653589793 / 2
+    assert model.arc_move_time([100, 0], [0, 100], 100.0, 1000.0) == pytest.approx(quarter / (1000 / 60), rel=1e-3)
+    # A negative radius asks for the long way round
+    assert model.arc_move_time([100, 0], [0, 100], -100.0, 1000.0) == pytest.approx(3 * quarter / (1000 / 60),
+                                                                                  rel=1e-3)
+
+
+def test_simulated_controller_tracks_scanner_moves():
+    controller = GrblControllerSimulated(_model(), realtime=False)
+    scanner = Scanner(controller, feed_rate=6000)
+
+    scanner.planar_move_to(200.0, 50.0)
+    scanner.angular_move_to(90.0)
+    assert scanner.get_position() == CylindricalPosition(200.0, 90.0, 50.0)
+    moved = controller.elapsed_s
+    assert moved > 0 and controller.moves == 2
+
+    # Already there: the scanner skips the move, and non-motion commands cost nothing
+    scanner.angular_move_to(90.0)
+    controller.send('G04 P0')
+    assert controller.elapsed_s == moved
+
+    scanner.cw_arc_move_to(0.0, 250.0, 250.0)
+    assert scanner.get_position() == CylindricalPosition(0.0, 90.0, 250.0)
+    assert controller.moves == 3
+
+
+def test_simulated_controller_moves_in_real_time():
+    controller = GrblControllerSimulated(_model(rate=60000.0, acceleration=10000.0), realtime=True)
+    expected = controller.move_time('G0 Y100')
+    t0 = time.perf_counter()
+    controller.send_and_wait_for_move_ready('G0 Y100')
+    assert time.perf_counter() - t0 >= expected > 0
+
+
+def test_factory_builds_simulated_controller_from_axis_sections(tmp_path):
+    config_path = tmp_path / "config.ini"
+    config_path.write_text(Path(__file__).with_name("full_system_mock_config.ini").read_text()
+                           .replace("type = Mock", "type = Simulated\nrealtime = False"))
+
+    controller = GrblControllerFactory.create('grbl_mock', str(config_path))
+    assert isinstance(controller, GrblControllerSimulated)
+    assert not controller.realtime
+    assert [axis.maximum_rate for axis in controller.motion_model.axes] == [5000.0, 5000.0, 5000.0]
+    assert [axis.acceleration for axis in controller.motion_model.axes] == [600.0, 600.0, 600.0]
@@ -0,0 +1,81 @@
+import threading
+
+import pytest
+
+from nfs.instrumentation import PointTimings, ScanTimings, current_point, recording, span
+from nfs.result_writer import ResultWriter
+
+
+def test_span_without_point_is_not_timed():
+    assert current_point() is None
+    with span('capture'):
+        pass
+    assert current_point() is None
+
+
+def test_spans_add_up_per_stage():
+    point = PointTimings(1)
+    with recording(point):
+        for _ in range(3):
+            with span('write'):
+                pass
+        with span('capture'):
+            pass
+    assert point.counts == {'write': 3, 'capture': 1}
+    assert set(point.durations) == {'write', 'capture'}
+    assert current_point() is None
+
+
+def test_point_travels_to_worker_threads():
+    point = PointTimings(1)
+
+    def work():
+        assert current_point() is None  # threads do not inherit the point
+        with recording(point), span('process_ir'):
+            pass
+
+    t = threading.Thread(target=work)
+    t.start()
+    t.join()
+    assert point.counts == {'process_ir': 1}
+
+
+@pytest.mark.parametrize("num_threads", [0, 2])
+def test_result_writer_books_writes_on_the_submitting_point(tmp_path, num_threads):
+    writer = ResultWriter(num_threads=num_threads)
+    point = PointTimings(1)
+    with recording(point):
+        writer.write_json(tmp_path / "a.json", {"a": 1})
+        writer.write_json(tmp_path / "b.json", {"b": 2})
+    writer.close()
+    assert point.counts == {'write': 2}
+
+
+def test_rolling_statistics_cover_the_window():
+    timings = ScanTimings(window=4)
+    for i in range(10):
+        point = timings.new_point()
+        point.add('motion', 1.0 if i < 6 else 3.0)
+        point.add('capture', 2.0)
+
+    stats = timings.stage_stats()
+    assert list(stats) == ['motion', 'capture']  # pipeline order
+    assert stats['motion']['mean'] == pytest.approx(3.0)  # only the last four points
+    assert stats['motion']['max'] == pytest.approx(3.0)
+    assert stats['motion']['total'] == pytest.approx(6 * 1.0 + 4 * 3.0)
+    assert stats['capture']['p95'] == pytest.approx(2.0)
+    assert 'last 4 of 10 points' in timings.summary()
+
+
+def test_discard_drops_the_last_point():
+    timings = ScanTimings()
+    first = timings.new_point()
+    extra = timings.new_point()
+    timings.discard(extra)
+    assert timings.points == [first]
+    assert timings.new_point().index == 2
+
+
+def test_window_must_be_positive():
+    with pytest.raises(ValueError):
+        ScanTimings(window=0)
@@ -68,3 +68,83 @@ def test_shutdown(mocks):
         nfs.shutdown()
 
     mocks['scanner'].shutdown.assert_called_once()
+
+
+def test_take_measurement_set_pipelined(mocks):
+    mocks['motion_manager'].ready.side_effect = [False, False, False, True]
+    pos1 = CylindricalPosition(100, 0, 10)
+    mocks['scanner'].get_position.return_value = pos1
+    mocks['motion_manager'].total_points.return_value = 2
+    job = Mock()
+    mocks['audio'].capture_ir.return_value = job
+    executor = Mock()
+
+    with patch("builtins.open", mock_open()):
+        nfs = NearFieldScanner(mocks['scanner'], mocks['audio'], mocks['motion_manager'], executor=executor)
+        nfs.take_measurement_set()
+
+    # Capture happens on the scan thread, processing is handed to the executor
+    mocks['audio'].capture_ir.assert_called_once_with(pos1)
+    mocks['audio'].measure_ir.assert_not_called()
+    executor.submit.assert_called_once_with(job)
+    executor.drain.assert_called_once()
+
+
+def test_scan_error_is_not_replaced_by_drain_error(mocks):
+    mocks['motion_manager'].ready.return_value = False
+    mocks['motion_manager'].total_points.return_value = 2
+    mocks['scanner'].get_position.return_value = CylindricalPosition(100, 0, 10)
+    mocks['audio'].capture_ir.side_effect = RuntimeError("audio stream stopped")
+    executor = Mock()
+    executor.drain.side_effect = IOError("disk full")
+
+    with patch("builtins.open", mock_open()):
+        nfs = NearFieldScanner(mocks['scanner'], mocks['audio'], mocks['motion_manager'], executor=executor)
+        with pytest.raises(RuntimeError, match="audio stream stopped"):
+            nfs.take_measurement_set()
+
+    # The queued work is still waited for and the files flushed
+    executor.drain.assert_called_once()
+    mocks['audio'].flush.assert_called_once()
+
+
+def test_take_measurement_set_runs_planner_first(mocks):
+    mocks['motion_manager'].ready.side_effect = [False, False, False, True]
+    mocks['scanner'].get_position.return_value = CylindricalPosition(100, 0, 10)
+    mocks['motion_manager'].total_points.return_value = 2
+    planner = Mock()
+    calls = []
+    planner.plan.side_effect = lambda audio: calls.append('plan')
+    mocks['audio'].measure_ir.side_effect = lambda position: calls.append('measure')
+
+    with patch("builtins.open", mock_open()):
+        nfs = NearFieldScanner(mocks['scanner'], mocks['audio'], mocks['motion_manager'], planner=planner)
+        nfs.take_measurement_set()
+
+    planner.plan.assert_called_once_with(mocks['audio'])
+    assert calls == ['plan', 'measure']
+
+
+def test_take_measurement_set_records_stage_timings(mocks):
+    mocks['motion_manager'].ready.side_effect = [False, False, False, False, False, True, True]
+    mocks['motion_manager'].total_points.return_value = 2
+    mocks['scanner'].get_position.return_value = CylindricalPosition(100, 0, 10)
+
+    from nfs.instrumentation import current_point
+
+    def measure(position):
+        # Spans inside the audio chain are booked on the point being measured
+        assert current_point() is not None and current_point().position == position
+        current_point().add('capture', 0.5)
+    mocks['audio'].measure_ir.side_effect = measure
+
+    with patch("builtins.open", mock_open()):
+        nfs = NearFieldScanner(mocks['scanner'], mocks['audio'], mocks['motion_manager'])
+        nfs.take_measurement_set()
+
+    # The move past the last point is not a point
+    assert [p.index for p in nfs.timings.points] == [1, 2]
+    stats = nfs.timings.stage_stats()
+    assert set(stats) == {'motion', 'capture'}
+    assert stats['capture']['mean'] == pytest.approx(0.5)
+    assert stats['capture']['total'] == pytest.approx(1.0)
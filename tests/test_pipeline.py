@@ -0,0 +1,86 @@
+import threading
+from concurrent.futures import wait
+
+import pytest
+from loguru import logger
+
+from nfs.pipeline import PipelinedScanExecutor
+
+
+def test_all_jobs_run_before_drain_returns():
+    executor = PipelinedScanExecutor(max_workers=2)
+    done = []
+    for i in range(5):
+        executor.submit(lambda i=i: done.append(i))
+    executor.drain()
+    executor.shutdown()
+
+    assert sorted(done) == [0, 1, 2, 3, 4]
+
+
+def test_submit_blocks_when_queue_is_full():
+    executor = PipelinedScanExecutor(max_workers=1, max_pending=1)
+    release = threading.Event()
+    executor.submit(release.wait)
+    # The running job holds the only slot, so the next submit has to wait for it
+    assert not executor._slots.acquire(blocking=False)
+
+    submitted = threading.Event()
+
+    def submit_second():
+        executor.submit(lambda: None)
+        submitted.set()
+
+    t = threading.Thread(target=submit_second)
+    t.start()
+    assert not submitted.is_set()  # back-pressure: waiting for the first job
+
+    release.set()
+    t.join(timeout=2.0)
+    assert submitted.is_set()
+    executor.drain()
+    executor.shutdown()
+
+
+def test_job_errors_are_reported():
+    executor = PipelinedScanExecutor(max_workers=1)
+
+    def failing_job():
+        raise IOError("disk full")
+
+    executor.submit(failing_job)
+    with pytest.raises(IOError):
+        executor.drain()
+    executor.shutdown()
+
+
+def test_invalid_worker_count():
+    with pytest.raises(ValueError):
+        PipelinedScanExecutor(max_workers=0)
+
+
+def test_every_finished_failure_is_logged():
+    executor = PipelinedScanExecutor(max_workers=2)
+    go = threading.Event()
+
+    def failing_job(error):
+        go.wait()
+        raise error
+
+    executor.submit(lambda: failing_job(IOError("disk full")))
+    executor.submit(lambda: failing_job(ValueError("bad capture")))
+    go.set()
+    wait(list(executor._futures))
+
+    messages = []
+    handler = logger.add(lambda m: messages.append(str(m)), level='ERROR')
+    try:
+        with pytest.raises((IOError, ValueError)):
+            executor.submit(lambda: None)
+    finally:
+        logger.remove(handler)
+    executor.drain()
+    executor.shutdown()
+
+    # Both failures are reported, although only one can be raised
+    assert any('disk full' in m for m in messages) and any('bad capture' in m for m in messages)
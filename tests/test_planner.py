@@ -0,0 +1,106 @@
+from pathlib import Path
+
+import numpy as np
+import pytest
+
+from nfs.audio import AudioFactory, ProtectionFilter
+from nfs.utils.dsp import DSPUtils
+from nfs.datatypes import CylindricalPosition
+from nfs.planner import SweepPlanner
+
+
+def test_solve_lengthens_sweep_at_full_level():
+    planner = SweepPlanner(60.0, min_dur_s=0.5, max_dur_s=10.0, max_level_dbfs=-6.0)
+
+    # 6 dB from the level, 10 dB (10x) from the duration
+    duration, level = planner.solve(44.0, probe_dur_s=0.5, probe_level_dbfs=-12.0)
+    assert duration == pytest.approx(5.0, rel=1e-2)
+    assert level == -6.0
+
+
+def test_solve_counts_averaging_gain():
+    planner = SweepPlanner(60.0, min_dur_s=0.5, max_dur_s=10.0, max_level_dbfs=-6.0)
+
+    single, _ = planner.solve(44.0, 0.5, -12.0, num_sweeps=1)
+    averaged, _ = planner.solve(44.0, 0.5, -12.0, num_sweeps=4)
+    assert averaged == pytest.approx(single / 4, rel=1e-2)
+
+
+def test_solve_lowers_level_at_shortest_sweep():
+    planner = SweepPlanner(60.0, min_dur_s=0.5, max_dur_s=10.0, max_level_dbfs=-6.0)
+
+    duration, level = planner.solve(80.0, probe_dur_s=0.5, probe_level_dbfs=-10.0)
+    assert duration == 0.5
+    assert level == -30.0
+
+
+def test_solve_clamps_unreachable_target():
+    planner = SweepPlanner(100.0, min_dur_s=0.5, max_dur_s=4.0, max_level_dbfs=-6.0)
+
+    assert planner.solve(40.0, probe_dur_s=0.5, probe_level_dbfs=-6.0) == (4.0, -6.0)
+
+
+def test_plan_configures_mock_audio(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    config_path = tmp_path / "config.ini"
+    config_path.write_text(Path(__file__).with_name("dsp_test_config.ini").read_text())
+
+    audio = AudioFactory.create(str(config_path))
+    planner = SweepPlanner(60.0, min_dur_s=0.2, max_dur_s=2.0, probe_dur_s=0.25)
+    plan = planner.plan(audio)
+
+    # The -100 dBFS mock noise floor needs neither a long nor a loud sweep
+    assert plan['probe_snr_db'] > 60
+    assert audio.cap['sweep_dur_s'] == 0.2
+    assert audio.cap['sweep_level_dbfs'] < -10
+    bundle = audio._get_excitation()
+    assert bundle.sweep_len == int(0.2 * audio.hw['fs'])
+    assert plan['capture_s'] == pytest.approx(bundle.total_len / audio.hw['fs'])
+
+    metrics = audio.capture_ir(CylindricalPosition(100.0, 0.0, 10.0), "P")()
+    assert metrics[0]['snr_db'] > 30
+
+
+def _mock_audio(tmp_path, extra_sweep_options=''):
+    config_path = tmp_path / "config.ini"
+    config_path.write_text(Path(__file__).with_name("dsp_test_config.ini").read_text()
+                           .replace("[sweep]\n", "[sweep]\n" + extra_sweep_options))
+    return AudioFactory.create(str(config_path))
+
+
+def test_probe_is_peaked_after_protection_filter(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    audio = _mock_audio(tmp_path)
+    audio.protection_filter = ProtectionFilter(audio.hw['fs'], 200.0, 4, 'min')
+    played = []
+    record = audio.play_and_record
+
+    def play_and_record(out_frames):
+        played.append(out_frames)
+        return record(out_frames)
+    monkeypatch.setattr(audio, 'play_and_record', play_and_record)
+
+    SweepPlanner(60.0, probe_dur_s=0.25).measure_probe_snr(audio, -10.0)
+    probe = played[1][:, audio.hw['ch_out_spkr']]
+    assert np.max(np.abs(probe)) == pytest.approx(DSPUtils.db_to_lin(-10.0), rel=1e-4)
+
+
+def test_plan_rejects_sweep_shorter_than_the_ir(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    audio = _mock_audio(tmp_path, "overlapped_sweeps = True\nir_len_ms = 300\n")
+    planner = SweepPlanner(60.0, min_dur_s=0.2, max_dur_s=2.0, probe_dur_s=0.25)
+
+    with pytest.raises(ValueError, match='ir_len_ms'):
+        planner.plan(audio)
+    # Nothing was applied
+    assert audio.cap['sweep_dur_s'] == 0.5 and audio.sweep_gen.T == 0.5
+
+
+def test_from_config_reads_plan_options(tmp_path):
+    config_path = tmp_path / "config.ini"
+    config_path.write_text("[sweep]\nplan_target_snr_db = 50  # dB\nplan_band_hz = 100, 8000\nplan_max_dur_s = 3\n")
+
+    planner = SweepPlanner.from_config(str(config_path))
+    assert planner.target_snr_db == 50
+    assert planner.band_hz == (100.0, 8000.0)
+    assert planner.max_dur_s == 3
@@ -0,0 +1,155 @@
+import configparser
+
+import numpy as np
+import pytest
+import soundfile as sf
+
+from nfs.audio import AudioFactory
+from nfs.dataset import ScanDataset
+from nfs.datatypes import CylindricalPosition
+from nfs.reprocess import BatchReprocessor, ReprocessError, load_raw_capture
+
+
+def _write_config(path, sweep_dur_s='0.3', output_format='wav', alignment_debug='False', num_sweeps='2'):
+    config = configparser.ConfigParser()
+    config['audio'] = {
+        'mode': 'mock_interface',
+        'fs': '48000',
+        'in_dev': '0',
+        'out_dev': '0',
+        'in_ch_mic': '1',
+        'in_ch_loop': '0',
+        'out_ch_spkr': '0',
+        'out_ch_ref': '1',
+        'blocksize': '1024',
+        'wasapi_exclusive': 'False',
+        'save_raw_measurement': 'True',
+        'output_format': output_format,
+    }
+    config['sweep'] = {
+        'sweep_dur_s': sweep_dur_s,
+        'sweep_level_dbfs': '-10',
+        'num_sweeps': num_sweeps,
+        'pre_sil_ms': '50',
+        'post_sil_ms': '50',
+        'mic_tail_taper_ms': '10',
+        'align_to_first_marker': 'True',
+        'debug_saves': 'False',
+        'H2_TEST_DB': 'None',
+        'H3_TEST_DB': 'None',
+        'PROTECT_HPF_HZ': '0',
+        'PROTECT_HPF_ORDER': '4',
+        'PROTECT_HPF_PHASE': 'min',
+        'alignment_debug': alignment_debug,
+    }
+    with open(path, 'w') as f:
+        config.write(f)
+    return str(path)
+
+
+@pytest.fixture
+def scanned(tmp_path, monkeypatch):
+    """Runs a two point mock scan with raw capture saving enabled."""
+    monkeypatch.chdir(tmp_path)
+    config_path = _write_config(tmp_path / 'config.ini')
+    audio = AudioFactory.create(config_path)
+    audio.measure_ir(CylindricalPosition(100.0, 0.0, 10.0), "1")
+    audio.measure_ir(CylindricalPosition(100.0, 90.0, 10.0), "2")
+    audio.close()
+    return tmp_path, config_path
+
+
+def test_raw_capture_round_trip(scanned):
+    tmp_path, _ = scanned
+    raw_files = BatchReprocessor.find_raw_captures(tmp_path / 'RawRecordings')
+    assert [f.name for f in raw_files] == ['1_r100p0_ph0p0_z10p0_raw.npz', '2_r100p0_ph90p0_z10p0_raw.npz']
+
+    raw = load_raw_capture(raw_files[1])
+    assert raw['order_id'] == '2'
+    assert raw['num_sweeps'] == 2
+    assert raw['position'].t() == 90
+    assert raw['rec_mic'].shape == raw['rec_loop'].shape
+
+
+def test_batch_reprocess_matches_live_results(scanned):
+    tmp_path, config_path = scanned
+    out_dir = tmp_path / 'Reprocessed'
+    reprocessor = BatchReprocessor(config_path, output_dir=out_dir, max_workers=2)
+
+    results = reprocessor.run(BatchReprocessor.find_raw_captures(tmp_path / 'RawRecordings'))
+
+    assert len(results) == 2
+    assert all(len(m) == 1 and m[0]['snr_db'] > 0 for m in results.values())
+    for name in ('1_r100p0_ph0p0_z10p0_ir.wav', '2_r100p0_ph90p0_z10p0_ir.wav'):
+        live, _ = sf.read(tmp_path / 'Recordings' / name)
+        offline, _ = sf.read(out_dir / 'Recordings' / name)
+        np.testing.assert_allclose(offline, live, atol=1e-6)
+    # Raw captures are inputs only, they are not written again
+    assert not (out_dir / 'RawRecordings').exists()
+
+
+def test_batch_reprocess_rejects_changed_excitation(scanned):
+    tmp_path, _ = scanned
+    other_config = _write_config(tmp_path / 'other.ini', num_sweeps='3')
+    reprocessor = BatchReprocessor(other_config, output_dir=tmp_path / 'Reprocessed', max_workers=1)
+
+    with pytest.raises(ReprocessError) as excinfo:
+        reprocessor.run(BatchReprocessor.find_raw_captures(tmp_path / 'RawRecordings'))
+
+    assert len(excinfo.value.failures) == 2
+    assert 'different excitation' in next(iter(excinfo.value.failures.values()))
+
+
+def test_batch_reprocess_uses_the_captured_sweep(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    config_path = _write_config(tmp_path / 'config.ini')
+    audio = AudioFactory.create(config_path)
+    # As the sweep planner does: the scan runs with a sweep that is not in the config file
+    audio.configure_excitation(sweep_dur_s=0.45, sweep_level_dbfs=-14.0)
+    audio.measure_ir(CylindricalPosition(100.0, 0.0, 10.0), "1")
+    audio.close()
+
+    raw_files = BatchReprocessor.find_raw_captures(tmp_path / 'RawRecordings')
+    assert load_raw_capture(raw_files[0])['excitation']['sweep_dur_s'] == 0.45
+    out_dir = tmp_path / 'Reprocessed'
+    BatchReprocessor(config_path, output_dir=out_dir, max_workers=1).run(raw_files)
+
+    live, _ = sf.read(tmp_path / 'Recordings' / '1_r100p0_ph0p0_z10p0_ir.wav')
+    offline, _ = sf.read(out_dir / 'Recordings' / '1_r100p0_ph0p0_z10p0_ir.wav')
+    np.testing.assert_allclose(offline, live, atol=1e-6)
+
+
+def test_batch_reprocess_into_dataset(scanned):
+    tmp_path, _ = scanned
+    config_path = _write_config(tmp_path / 'dataset.ini', output_format='dataset')
+    out_dir = tmp_path / 'Reprocessed'
+
+    BatchReprocessor(config_path, output_dir=out_dir, max_workers=2).run(
+        BatchReprocessor.find_raw_captures(tmp_path / 'RawRecordings'))
+
+    dataset = ScanDataset.open(out_dir / 'scan.nfsd')
+    assert sorted(dataset.order_ids) == ['1', '2']
+    assert list((out_dir / 'Recordings').glob('*.wav')) == []
+    row = dataset.order_ids.index('2')
+    live, _ = sf.read(tmp_path / 'Recordings' / '2_r100p0_ph90p0_z10p0_ir.wav')
+    np.testing.assert_allclose(dataset.ir_linear[row], live, atol=1e-6)
+
+    # A second run does not add its points to the first one's dataset
+    with pytest.raises(FileExistsError):
+        BatchReprocessor(config_path, output_dir=out_dir, max_workers=2).run(
+            BatchReprocessor.find_raw_captures(tmp_path / 'RawRecordings'))
+    assert len(ScanDataset.open(out_dir / 'scan.nfsd')) == 2
+
+
+def test_batch_reprocess_dumps_alignment_into_output(scanned):
+    tmp_path, _ = scanned
+    config_path = _write_config(tmp_path / 'debug.ini', alignment_debug='True')
+    out_dir = tmp_path / 'Reprocessed'
+
+    BatchReprocessor(config_path, output_dir=out_dir, max_workers=1).run(
+        BatchReprocessor.find_raw_captures(tmp_path / 'RawRecordings'))
+
+    dumps = sorted(p.name for p in (out_dir / 'Recordings' / 'debug' / 'alignment').iterdir())
+    assert dumps and all(name.endswith('_alignment.npz') for name in dumps)
+    # Nothing is written relative to the working directory of the reprocessor
+    assert not (tmp_path / 'Recordings' / 'debug' / 'alignment').exists()
@@ -0,0 +1,60 @@
+import json
+import threading
+
+import numpy as np
+import pytest
+import soundfile as sf
+
+from nfs.result_writer import ResultWriter, ResultWriteError
+
+
+@pytest.mark.parametrize("num_threads, fsync", [(0, 'none'), (2, 'file'), (1, 'batch')])
+def test_writes_are_complete_after_flush(tmp_path, num_threads, fsync):
+    writer = ResultWriter(num_threads=num_threads, max_queue=2, fsync=fsync)
+    data = np.linspace(-0.5, 0.5, 480).astype(np.float32)
+
+    for i in range(5):
+        writer.write_wav(tmp_path / f"ir_{i}.wav", data, 48000, f"ir_{i}.wav", subtype='FLOAT')
+    writer.write_json(tmp_path / "metrics.json", {'snr_db': 60.0})
+    writer.flush()
+
+    for i in range(5):
+        read, fs = sf.read(tmp_path / f"ir_{i}.wav", dtype='float32')
+        assert fs == 48000
+        assert np.array_equal(read, data)
+    assert json.loads((tmp_path / "metrics.json").read_text()) == {'snr_db': 60.0}
+    writer.close()
+
+
+def test_write_errors_are_reported_on_flush(tmp_path):
+    writer = ResultWriter(num_threads=1)
+    writer.write_json(tmp_path / "missing_dir" / "metrics.json", {})
+
+    with pytest.raises(ResultWriteError):
+        writer.flush()
+
+    # Errors are reported once
+    writer.flush()
+    writer.close()
+
+
+def test_submit_blocks_on_full_queue(tmp_path):
+    writer = ResultWriter(num_threads=1, max_queue=1)
+    release = threading.Event()
+    writer.submit(tmp_path / "a", lambda p: release.wait())
+    writer.submit(tmp_path / "b", lambda p: None)  # fills the queue
+
+    submitted = threading.Event()
+    t = threading.Thread(target=lambda: (writer.submit(tmp_path / "c", lambda p: None), submitted.set()))
+    t.start()
+    assert not submitted.wait(0.1)
+
+    release.set()
+    t.join(timeout=2.0)
+    assert submitted.is_set()
+    writer.close()
+
+
+def test_unknown_fsync_policy():
+    with pytest.raises(ValueError):
+        ResultWriter(fsync='sometimes')
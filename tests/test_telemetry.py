@@ -0,0 +1,119 @@
+import configparser
+import json
+import socket
+from unittest.mock import Mock
+
+import pytest
+
+from nfs.audio import AudioFactory
+from nfs.datatypes import CylindricalPosition
+from nfs.instrumentation import PointTimings, ScanTimings, recording
+from nfs.nfs import NearFieldScanner
+from nfs.pipeline import PipelinedScanExecutor
+from nfs.telemetry import TelemetrySink
+
+
+def _write_config(tmp_path, writer_threads=0, **nfs):
+    config = configparser.ConfigParser()
+    config['audio'] = {
+        'mode': 'mock_interface', 'fs': '48000', 'in_dev': '0', 'out_dev': '0', 'in_ch_mic': '1',
+        'in_ch_loop': '0', 'out_ch_spkr': '0', 'out_ch_ref': '1', 'blocksize': '1024',
+        'wasapi_exclusive': 'False', 'writer_threads': str(writer_threads),
+    }
+    config['sweep'] = {
+        'sweep_dur_s': '0.3', 'sweep_level_dbfs': '-10', 'num_sweeps': '1', 'pre_sil_ms': '50',
+        'post_sil_ms': '50', 'mic_tail_taper_ms': '10', 'align_to_first_marker': 'True', 'debug_saves': 'False',
+        'H2_TEST_DB': 'None', 'H3_TEST_DB': 'None', 'PROTECT_HPF_HZ': '0', 'PROTECT_HPF_ORDER': '4',
+        'PROTECT_HPF_PHASE': 'min'
+    }
+    config['nfs'] = nfs
+    path = tmp_path / 'config.ini'
+    with open(path, 'w') as f:
+        config.write(f)
+    return str(path)
+
+
+def _motion_manager(scanner, positions):
+    """Steps the scanner through the positions; ready after the last one."""
+    manager = Mock()
+    remaining = list(positions)
+    manager.total_points.return_value = len(positions)
+    manager.ready.side_effect = lambda: not remaining and scanner.get_position.return_value is None
+
+    def next_point():
+        scanner.get_position.return_value = remaining.pop(0) if remaining else None
+    manager.next.side_effect = next_point
+    return manager
+
+
+@pytest.mark.parametrize("pipelined, writer_threads", [(False, 0), (True, 2)])
+def test_scan_writes_one_record_per_point(tmp_path, monkeypatch, pipelined, writer_threads):
+    monkeypatch.chdir(tmp_path)
+    audio = AudioFactory.create(_write_config(tmp_path, writer_threads))
+    scanner = Mock()
+    positions = [CylindricalPosition(100.0, t, 10.0) for t in (0.0, 90.0, 180.0)]
+    sink = TelemetrySink(tmp_path / 'telemetry.ndjson')
+    nfs = NearFieldScanner(scanner, audio, _motion_manager(scanner, positions),
+                           executor=PipelinedScanExecutor(2) if pipelined else None, telemetry=sink)
+    nfs.take_measurement_set()
+    nfs.shutdown()
+
+    lines = (tmp_path / 'telemetry.ndjson').read_text().splitlines()
+    records = sorted((json.loads(line) for line in lines), key=lambda r: r['point'])
+    assert [r['point'] for r in records] == [1, 2, 3]
+    assert [r['t'] for r in records] == [0.0, 90.0, 180.0]
+    for record in records:
+        assert record['finished'] >= record['started']
+        assert {'motion', 'capture', 'process_ir', 'calculate_metrics', 'write'} <= set(record['stages_ms'])
+        assert set(record['metrics'][0]) == {'snr_db', 'thd_pct', 'psr', 'crest_factor'}
+        assert record['xruns'] == 0
+        # The linear and the distortion WAV of the point
+        phi = f"{record['t']:.1f}".replace('.', 'p')
+        linear = tmp_path / 'Recordings' / f'NA_r100p0_ph{phi}_z10p0_ir.wav'
+        distortion = tmp_path / 'Distortion' / f'NA_r100p0_ph{phi}_z10p0_ir_dist.wav'
+        assert record['bytes_written'] == linear.stat().st_size + distortion.stat().st_size
+
+
+def test_point_finishes_after_its_queued_work():
+    finished = []
+    timings = ScanTimings(on_point_finished=finished.append)
+    point = timings.new_point()
+    with recording(point):
+        point.hold()  # e.g. a queued write
+    point.release()  # the measurement loop is done with the point
+    assert finished == [] and point.finished is None
+    point.release()
+    assert finished == [point] and point.finished is not None
+
+
+def test_records_are_published_over_udp():
+    receiver = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+    receiver.bind(('127.0.0.1', 0))
+    receiver.settimeout(5)
+    sink = TelemetrySink(udp_address=receiver.getsockname())
+
+    point = PointTimings(4, CylindricalPosition(200.0, 45.0, -10.0))
+    point.add('capture', 0.25)
+    point.metrics = [{'snr_db': float('inf'), 'thd_pct': 0.5, 'psr': 30.0, 'crest_factor': 4.0}]
+    point.increment('bytes_written', 100)
+    sink.emit(TelemetrySink.record(point, 1000.0))
+    sink.close()
+
+    record = json.loads(receiver.recv(65536))
+    receiver.close()
+    assert record['point'] == 4 and (record['r'], record['t'], record['z']) == (200.0, 45.0, -10.0)
+    assert record['stages_ms'] == {'capture': 250.0}
+    assert record['metrics'][0]['snr_db'] is None  # strict JSON has no inf
+    assert record['bytes_written'] == 100 and record['xruns'] == 0
+
+
+def test_sink_from_config(tmp_path):
+    assert TelemetrySink.from_config(_write_config(tmp_path)) is None
+
+    sink = TelemetrySink.from_config(_write_config(tmp_path, telemetry_file=str(tmp_path / 't.ndjson'),
+                                                   telemetry_udp='127.0.0.1:9870'))
+    assert sink.path == tmp_path / 't.ndjson' and sink.udp_address == ('127.0.0.1', 9870)
+    sink.close()
+
+    with pytest.raises(ValueError):
+        TelemetrySink.from_config(_write_config(tmp_path, telemetry_udp='9870'))